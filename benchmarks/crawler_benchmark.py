@@ -0,0 +1,257 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic_tree import build_synthetic_tree
+from crawler.parameters import CrawlEngineParameters
+from crawler import service
+from crawler.service import ReelCrawler
+
+CENSUS_YEAR = 1960
+SCAN_FOLDER = (3, 2022)
+
+SIZES = {
+    "tiny": (10, 100),
+    "small": (100, 1000),
+    "medium": (1000, 5000),
+    "large": (5000, 20000)
+}
+
+VARIANTS = {
+    "serial": {},
+    "concurrent-8-ordered": {"max_workers": 8},
+    "concurrent-8-unordered": {"max_workers": 8, "ordered_results": False},
+    "concurrent-32-unordered": {"max_workers": 32, "ordered_results": False},
+    "reel-batch-10": {"reel_batch_size": 10},
+    "image-batch-50": {"image_batch_size": 50},
+    "deferred-stat": {"stat_mode": "deferred"},
+    "concurrent-8-deferred-stat": {"max_workers": 8, "ordered_results": False, "stat_mode": "deferred"},
+    "no-stat": {"stat_mode": "none"}
+}
+
+
+class FileSystemCallCounter:
+
+    """
+    Counts os.scandir/os.stat/os.listdir calls and the DirEntry.stat calls the
+    inline stat mode makes through crawler.service.image_stat_size. Deferred
+    stats go through os.stat and land in "stat" with the manifest's fingerprints.
+    """
+
+    def __init__(self) -> None:
+        self.counts = {"scandir": 0, "stat": 0, "listdir": 0, "direntry_stat": 0}
+        self.__originals = []
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        for name in ("scandir", "stat", "listdir"):
+            self.__patch(os, name, name)
+        self.__patch(service, "image_stat_size", "direntry_stat")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for module, name, original in self.__originals:
+            setattr(module, name, original)
+        self.__originals = []
+
+    def __patch(self, module, name, counter):
+        original = getattr(module, name)
+        self.__originals.append((module, name, original))
+        setattr(module, name, self.__wrap(counter, original))
+
+    def __wrap(self, counter, original):
+        def counted(*args, **kwargs):
+            # deferred stats and concurrent listings call in from worker threads
+            with self.__lock:
+                self.counts[counter] += 1
+            return original(*args, **kwargs)
+        return counted
+
+
+def crawl(prms: CrawlEngineParameters) -> Tuple[int, int]:
+
+    reels = 0
+    images = 0
+
+    for result in ReelCrawler(prms).run_crawl():
+        reels = reels + 1
+        images = images + len(result["reel"]["parsed_images"])
+
+    return reels, images
+
+
+def run_case(isilon_root: str, size: str, variant: str, trace_memory: bool = False) -> dict:
+
+    """ Runs one case in a fresh process so max_rss_kb is that case's own high-water mark """
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_case_in_process, isilon_root, size, variant, trace_memory).result()
+
+
+def run_case_in_process(isilon_root: str, size: str, variant: str, trace_memory: bool = False) -> dict:
+
+    prms = CrawlEngineParameters(CENSUS_YEAR, isilon_root, SCAN_FOLDER, **VARIANTS[variant])
+
+    started = time.perf_counter()
+
+    with FileSystemCallCounter() as counter:
+        reels, images = crawl(prms)
+
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "size": size,
+        "variant": variant,
+        "reels": reels,
+        "images": images,
+        "seconds": elapsed,
+        "reels_per_second": reels / elapsed if elapsed else 0.0,
+        "images_per_second": images / elapsed if elapsed else 0.0,
+        "filesystem_calls": dict(counter.counts),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_python_bytes": None
+    }
+
+    # tracemalloc slows the crawl down, so peak memory gets its own untimed pass
+    if trace_memory:
+        tracemalloc.start()
+        crawl(prms)
+        result["peak_python_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+
+def count_syscalls(isilon_root: str, size: str, variant: str) -> dict:
+
+    """ Re-runs one case under strace -c -f and returns the per-syscall counts """
+
+    output_file = os.path.join(isilon_root, f".strace-{size}-{variant}.txt")
+
+    subprocess.run(["strace", "-c", "-f", "-o", output_file, sys.executable, __file__,
+                    "--root", isilon_root, "--sizes", size, "--variants", variant,
+                    "--no-build", "--output", os.devnull],
+                   check=True, stdout=subprocess.DEVNULL)
+
+    result = {}
+
+    with open(output_file, encoding="utf-8") as f:
+        for line in f:
+            match = re.match(r"\s*[\d.]+\s+[\d.]+\s+\d+\s+(\d+)\s+(?:\d+\s+)?(\w+)\s*$", line)
+            if match and match.group(2) != "total":
+                result[match.group(2)] = int(match.group(1))
+
+    os.remove(output_file)
+
+    return result
+
+
+def compare_to_baseline(results: List[dict], baseline_path: str, tolerance: float) -> List[str]:
+
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["size"], r["variant"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+
+    for result in results:
+        previous = baseline.get((result["size"], result["variant"]))
+        if not previous or not previous["images_per_second"]:
+            continue
+
+        change = (result["images_per_second"] - previous["images_per_second"]) / previous["images_per_second"]
+        result["images_per_second_change"] = change
+
+        if change < -tolerance:
+            regressions.append(f"{result['size']}/{result['variant']}: images/s {change:+.1%}")
+
+    return regressions
+
+
+def parse_sizes(values: List[str]) -> List[Tuple[str, Tuple[int, int]]]:
+
+    result = []
+
+    for value in values:
+        if value in SIZES:
+            result.append((value, SIZES[value]))
+        else:
+            reels, frames = value.lower().split("x")
+            result.append((value, (int(reels), int(frames))))
+
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="ReelCrawler throughput benchmark over a synthetic Isilon tree")
+    parser.add_argument("--root", required=True, help="directory the synthetic trees are built under")
+    parser.add_argument("--sizes", nargs="+", default=["tiny", "small"],
+                        help=f"named sizes {list(SIZES)} or <reels>x<frames>")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--output", default="crawler-benchmark.json")
+    parser.add_argument("--baseline", help="previous results file to compare images/s against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed images/s drop against the baseline")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure peak Python heap per case with an extra tracemalloc pass")
+    parser.add_argument("--strace", action="store_true", help="also count syscalls per case with strace -c")
+    parser.add_argument("--no-build", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--cleanup", action="store_true", help="remove the synthetic trees afterwards")
+    args = parser.parse_args()
+
+    results = []
+
+    for size, (reels, frames) in parse_sizes(args.sizes):
+
+        isilon_root = os.path.join(args.root, size)
+
+        if not args.no_build:
+            build_synthetic_tree(isilon_root, CENSUS_YEAR, SCAN_FOLDER, reels, frames)
+
+        for variant in args.variants:
+            result = run_case(isilon_root, size, variant, args.trace_memory)
+
+            if args.strace and shutil.which("strace"):
+                result["syscalls"] = count_syscalls(isilon_root, size, variant)
+
+            results.append(result)
+            print(f"{size:>10} {variant:<26} {result['reels_per_second']:>10.1f} reels/s "
+                  f"{result['images_per_second']:>12.1f} images/s {result['max_rss_kb'] / 1024:>8.1f} MB max rss")
+
+        if args.cleanup:
+            shutil.rmtree(isilon_root)
+
+    regressions = compare_to_baseline(results, args.baseline, args.tolerance) if args.baseline else []
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": str(datetime.now()),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "results": results,
+            "regressions": regressions
+        }, f, indent=2)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
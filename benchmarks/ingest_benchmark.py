@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crawler.models import ParsedImages
+from data import (connection_pool, ensure_scan_partitions, image_columns, image_rows, load_image_rows,
+                  schema_is_partitioned, IMAGE_LOAD_COPY, IMAGE_LOAD_VALUES)
+
+
+def synthetic_reel(frames: int) -> ParsedImages:
+
+    images = ParsedImages("/mnt/isilon/1960/2022/03-Mar-22/1960-R000001/frames")
+
+    for frame_number in range(frames):
+        images.append(f"{frame_number:08d}.jpg", 2 * 1024 * 1024 + frame_number)
+
+    return images
+
+
+def run_case(method: str, frames: int, repeat: int) -> dict:
+
+    """
+    Loads one reel's image rows with the given method inside a transaction that is
+    always rolled back, so the benchmark never leaves rows behind
+    """
+
+    images = synthetic_reel(frames)
+    scan_key = (1960, 2022, 3)
+    timings = []
+
+    ensure_scan_partitions([scan_key])
+
+    con = connection_pool.getconn()
+
+    try:
+        for _ in range(repeat):
+            with con.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO reels
+                    (census_year, month_name_scanned, month_number_scanned, year_scanned, scan_identifier)
+                    VALUES (1960, 'Mar', 3, 2022, 'ingest-benchmark') RETURNING id
+                """)
+                reel_id = cur.fetchone()[0]
+                partitioned = schema_is_partitioned(cur)
+
+                started = time.perf_counter()
+                load_image_rows(cur, image_rows(reel_id, images, scan_key if partitioned else ()), method,
+                                image_columns(partitioned))
+                timings.append(time.perf_counter() - started)
+
+            con.rollback()
+    finally:
+        con.rollback()
+        connection_pool.putconn(con)
+
+    best = min(timings)
+
+    return {
+        "method": method,
+        "frames": frames,
+        "repeat": repeat,
+        "best_seconds": best,
+        "mean_seconds": sum(timings) / len(timings),
+        "rows_per_second": frames / best if best else 0.0
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="COPY vs execute_values image ingest benchmark (rolled back)")
+    parser.add_argument("--frames", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="ingest-benchmark.json")
+    args = parser.parse_args()
+
+    results = []
+
+    for frames in args.frames:
+        for method in (IMAGE_LOAD_VALUES, IMAGE_LOAD_COPY):
+            result = run_case(method, frames, args.repeat)
+            results.append(result)
+            print(f"{frames:>8} frames {method:<7} {result['best_seconds']:>8.3f}s best "
+                  f"{result['rows_per_second']:>12.1f} rows/s")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": str(datetime.now()),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "results": results
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
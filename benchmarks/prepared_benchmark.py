@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import data
+
+from data import (CrawlStatusRepository, ImageRepository, ReelRepository,
+                  SystemEventsRepository)
+
+
+def time_calls(call, calls: int) -> list:
+
+    timings = []
+
+    for _ in range(calls):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+
+    return timings
+
+
+def summarise(name: str, prepared: bool, timings: list) -> dict:
+
+    timings = sorted(timings)
+
+    return {
+        "statement": name,
+        "prepared": prepared,
+        "calls": len(timings),
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95)] * 1000
+    }
+
+
+def run_cases(calls: int, prepared: bool) -> list:
+
+    """
+    Times each hot single-row repository call through getcursor, so the numbers are
+    per-call latency as the crawler sees it. Rows written here are deleted afterwards.
+    """
+
+    data.PREPARED_STATEMENTS_ENABLED = prepared
+
+    # every call has to reach the server for the comparison to mean anything
+    data.lookup_cache.enabled = False
+
+    events = SystemEventsRepository()
+    crawl_status = CrawlStatusRepository()
+    reels = ReelRepository()
+    images = ImageRepository()
+
+    reel_id = reels.add_record({"census_year": 1960, "scan_month_name": "Mar", "scan_month": 3,
+                                "scan_year": 2022, "scan_identifier": "prepared-benchmark"})
+    event_ids = []
+    image_ids = []
+
+    try:
+        cases = {
+            "system_events_add_record": lambda: event_ids.append(
+                events.add_record("benchmark", "INFO", "benchmark", "prepared_benchmark", "")),
+            "crawl_status_get_crawl_status": lambda: crawl_status.get_crawl_status(1960, 3, 2022),
+            "reels_get_reel_by_identifier": lambda: reels.get_reel_by_identifier("prepared-benchmark"),
+            "images_add_record": lambda: image_ids.append(
+                images.add_record(reel_id, "00000001.jpg", 2048, "/benchmark/00000001.jpg"))
+        }
+
+        # the first call on each connection pays for PREPARE; warm every pooled connection first
+        for call in cases.values():
+            time_calls(call, data.connection_pool.maxconn)
+
+        return [summarise(name, prepared, time_calls(call, calls)) for name, call in cases.items()]
+    finally:
+        for image_id in image_ids:
+            images.delete_record(image_id)
+        for event_id in event_ids:
+            events.delete_record(event_id)
+        reels.delete_record(reel_id)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Per-call latency of hot repository statements, plain vs prepared")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--output", default="prepared-benchmark.json")
+    args = parser.parse_args()
+
+    results = run_cases(args.calls, prepared=False) + run_cases(args.calls, prepared=True)
+
+    for result in results:
+        mode = "prepared" if result["prepared"] else "plain"
+        print(f"{result['statement']:<32} {mode:<8} {result['mean_ms']:>8.3f}ms mean "
+              f"{result['p50_ms']:>8.3f}ms p50 {result['p95_ms']:>8.3f}ms p95")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": str(datetime.now()),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "results": results
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
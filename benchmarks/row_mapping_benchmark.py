@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rows import ROW_DICT, ROW_NAMEDTUPLE, ROW_RECORD, ROW_TUPLE, map_rows
+
+# same shape as a reels row
+DESCRIPTION = [(name,) for name in ("id", "census_year", "month_name_scanned", "month_number_scanned",
+                                    "year_scanned", "scan_identifier", "snowball_export_date",
+                                    "move_flag", "target_snowball")]
+
+
+def synthetic_rows(count: int) -> list:
+    return [(i, 1960, "Mar", 3, 2022, f"1960-R{i:06d}", None, False, None) for i in range(count)]
+
+
+def hand_built_dicts(rows: list, description) -> list:
+
+    # what the repositories did before rows.py
+    result = []
+
+    for row in rows:
+        reel = {}
+        reel["id"] = row[0]
+        reel["census_year"] = row[1]
+        reel["month_name_scanned"] = row[2]
+        reel["month_number_scanned"] = row[3]
+        reel["year_scanned"] = row[4]
+        reel["scan_identifier"] = row[5]
+        reel["snowball_export_date"] = row[6]
+        reel["move_flag"] = row[7]
+        reel["target_snowball"] = row[8]
+        result.append(reel)
+
+    return result
+
+
+VARIANTS = {
+    "hand_built": hand_built_dicts,
+    ROW_DICT: lambda rows, description: map_rows(rows, description, ROW_DICT),
+    ROW_RECORD: lambda rows, description: map_rows(rows, description, ROW_RECORD),
+    ROW_NAMEDTUPLE: lambda rows, description: map_rows(rows, description, ROW_NAMEDTUPLE),
+    ROW_TUPLE: lambda rows, description: map_rows(rows, description, ROW_TUPLE)
+}
+
+
+def run_case(name: str, rows: list, repeat: int) -> dict:
+
+    mapper = VARIANTS[name]
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        mapper(rows, DESCRIPTION)
+        timings.append(time.perf_counter() - started)
+
+    # memory is measured on its own pass so tracing doesn't skew the timings
+    tracemalloc.start()
+    mapped = mapper(rows, DESCRIPTION)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del mapped
+
+    best = min(timings)
+
+    return {
+        "variant": name,
+        "rows": len(rows),
+        "best_seconds": best,
+        "ns_per_row": best / len(rows) * 1e9,
+        "bytes_per_row": allocated / len(rows)
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Per-row cost of repository row mapping styles")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="row-mapping-benchmark.json")
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    results = [run_case(name, rows, args.repeat) for name in VARIANTS]
+
+    for result in results:
+        print(f"{result['variant']:<11} {result['ns_per_row']:>8.1f} ns/row {result['bytes_per_row']:>8.1f} bytes/row")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": str(datetime.now()),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "results": results
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from picker import GROUP_CENSUS_YEAR, GROUP_SCAN_MONTH, STRATEGIES, SnowballPacker, np
+
+
+def synthetic_reels(count: int, seed: int) -> list:
+
+    # reels between 5 GB and 120 GB, spread over two census years and a year of scan months
+    generator = random.Random(seed)
+
+    return [{"reel": f"R{i:06d}",
+             "bytes": generator.randint(5 * 10 ** 9, 120 * 10 ** 9),
+             "census_year": generator.choice((1960, 1970)),
+             "year_scanned": 2022,
+             "month_number_scanned": generator.randint(1, 12)} for i in range(count)]
+
+
+def run_case(strategy: str, group_by: str, reels: list, snowballs: list, args) -> dict:
+
+    packer = SnowballPacker(strategy, group_by, storage_tb=args.storage_tb, fill_threshold=args.fill_threshold)
+    timings = []
+
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        plan = packer.plan(reels, snowballs)
+        timings.append(time.perf_counter() - started)
+
+    report = plan["report"]
+    report["best_seconds"] = min(timings)
+
+    return report
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Snowball packing time and fill efficiency on synthetic reels")
+    parser.add_argument("--reels", type=int, default=100000)
+    parser.add_argument("--storage-tb", type=float, default=80)
+    parser.add_argument("--fill-threshold", type=float, default=0.95)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="snowball-benchmark.json")
+    args = parser.parse_args()
+
+    reels = synthetic_reels(args.reels, args.seed)
+    snowballs = [{"snowball": "snowball_0001", "bytes_used": 30 * 10 ** 12}]
+
+    results = [run_case(strategy, group_by, reels, snowballs, args)
+               for strategy in STRATEGIES for group_by in (None, GROUP_CENSUS_YEAR, GROUP_SCAN_MONTH)]
+
+    for result in results:
+        print(f"{result['strategy']} {str(result['group_by']):<11} {result['best_seconds']:>7.3f}s "
+              f"{result['new_snowballs']:>4} snowballs (lower bound {result['new_snowballs_lower_bound']}) "
+              f"efficiency {result['new_snowball_efficiency']:.4f}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": str(datetime.now()),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "numpy": np.__version__ if np is not None else None,
+            "results": results
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
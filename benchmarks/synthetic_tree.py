@@ -0,0 +1,69 @@
+import argparse
+import os
+
+from typing import Tuple
+from crawler.parameters import CrawlEngineParameters
+
+
+def build_synthetic_tree(isilon_root: str,
+                         census_year: int,
+                         scan_folder: Tuple[int, int],
+                         reels: int,
+                         frames: int,
+                         frame_bytes: int = 2 * 1024 * 1024,
+                         extension: str = ".jpg") -> str:
+
+    """
+    Builds <root>/<census_year>/<year>/<MM-Mon-YY>/<reel>/frames/*.jpg with sparse
+    frame files, so a 5k x 20k tree reports realistic sizes without the disk
+    space. Returns the scan directory; an existing tree of the same shape is reused.
+    """
+
+    prms = CrawlEngineParameters(census_year, isilon_root, scan_folder)
+    scan_dir = prms.scan_dir
+
+    # kept outside the scan directory so the crawler never sees it as a reel
+    marker = os.path.join(isilon_root, f".synthetic-{census_year}-{prms.normalized_folder}")
+    shape = f"{reels}x{frames}x{frame_bytes}{extension}"
+
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            if f.read() == shape:
+                return scan_dir
+        raise FileExistsError(f"{scan_dir} already holds a different synthetic tree")
+
+    for reel_number in range(reels):
+
+        frames_dir = os.path.join(scan_dir, f"{census_year}-R{reel_number:06d}", "frames")
+        os.makedirs(frames_dir, exist_ok=True)
+
+        for frame_number in range(frames):
+            with open(os.path.join(frames_dir, f"{frame_number:08d}{extension}"), "wb") as f:
+                f.truncate(frame_bytes)
+
+    os.makedirs(isilon_root, exist_ok=True)
+
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(shape)
+
+    return scan_dir
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Build a synthetic Isilon reel tree")
+    parser.add_argument("root")
+    parser.add_argument("--census-year", type=int, default=1960)
+    parser.add_argument("--scan-month", type=int, default=3)
+    parser.add_argument("--scan-year", type=int, default=2022)
+    parser.add_argument("--reels", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--frame-bytes", type=int, default=2 * 1024 * 1024)
+    args = parser.parse_args()
+
+    print(build_synthetic_tree(args.root, args.census_year, (args.scan_month, args.scan_year),
+                               args.reels, args.frames, args.frame_bytes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+
+from datetime import datetime
+from typing import List, Set, Tuple
+
+
+class CrawlCheckpoint:
+
+    """
+    Append-only, fsync'd log of the reels committed for one census year and
+    scan folder. A restarted crawl with the same parameters loads it and skips
+    those reels without touching their directories.
+    """
+
+    def __init__(self, checkpoint_path: str, census_year: int, scan_folder: Tuple[int, int]) -> None:
+
+        self.__checkpoint_path = checkpoint_path
+        self.__census_year = census_year
+        self.__scan_folder = list(scan_folder)
+        self.__committed: Set[str] = set()
+        self.__skipped: List[str] = []
+        self.__lock = threading.Lock()
+
+        self.__load()
+
+    @staticmethod
+    def checkpoint_file_name(census_year: int, normalized_folder: str) -> str:
+        return f"{census_year}_{normalized_folder}.checkpoint.jsonl"
+
+    @property
+    def checkpoint_path(self) -> str:
+        return self.__checkpoint_path
+
+    @property
+    def committed(self) -> Set[str]:
+        return self.__committed
+
+    @property
+    def skipped_reels(self) -> List[str]:
+        return self.__skipped
+
+    def is_committed(self, scan_identifier: str) -> bool:
+        return scan_identifier in self.__committed
+
+    def skip(self, scan_identifier: str) -> None:
+
+        """ Notes a committed reel the crawl passed over, for the resume summary """
+
+        with self.__lock:
+            self.__skipped.append(scan_identifier)
+
+    def record(self, reels) -> None:
+
+        lines = []
+
+        for reel in reels:
+            lines.append(json.dumps({
+                "census_year": self.__census_year,
+                "scan_folder": self.__scan_folder,
+                "scan_identifier": reel["scan_identifier"],
+                "image_count": len(reel["parsed_images"]),
+                "committed": str(datetime.now())
+            }) + "\n")
+
+        with self.__lock:
+
+            directory = os.path.dirname(self.__checkpoint_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with open(self.__checkpoint_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+            for reel in reels:
+                self.__committed.add(reel["scan_identifier"])
+
+    def clear(self) -> None:
+
+        with self.__lock:
+            if os.path.exists(self.__checkpoint_path):
+                os.remove(self.__checkpoint_path)
+            self.__committed = set()
+            self.__skipped = []
+
+    def __load(self) -> None:
+
+        if not os.path.exists(self.__checkpoint_path):
+            return
+
+        with open(self.__checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a crash mid-append can leave a torn last line
+                    continue
+
+                if entry.get("census_year") == self.__census_year and \
+                        entry.get("scan_folder") == self.__scan_folder:
+                    self.__committed.add(entry["scan_identifier"])
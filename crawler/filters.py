@@ -0,0 +1,101 @@
+import fnmatch
+import re
+import threading
+
+from typing import Iterable
+
+
+class CrawlFilter:
+
+    """
+    Exclusion and extension rules compiled once per crawl. Exact reel names are
+    held in a frozenset, glob/regex rules are folded into a single regex, prefixes
+    and extensions into tuples for str.startswith/str.endswith, so the cost per
+    directory entry doesn't grow with the number of filters.
+
+    Exclusion patterns are strings of the form "glob:<pattern>", "re:<pattern>"
+    or "prefix:<value>".
+    """
+
+    def __init__(self,
+                 exclusion_filters: Iterable[str] = None,
+                 extension_filters: Iterable[str] = None,
+                 exclusion_patterns: Iterable[str] = None) -> None:
+
+        self.__excluded_names = frozenset(exclusion_filters if exclusion_filters else [])
+        self.__extensions = tuple(x.lower() for x in (extension_filters if extension_filters else []))
+
+        prefixes = []
+        expressions = []
+
+        for pattern in (exclusion_patterns if exclusion_patterns else []):
+            kind, _, value = pattern.partition(":")
+            if kind == "glob":
+                expressions.append(fnmatch.translate(value))
+            elif kind == "re":
+                expressions.append(f"(?:{value})")
+            elif kind == "prefix":
+                prefixes.append(value)
+            else:
+                raise ValueError(f"Unknown exclusion pattern type: {pattern}")
+
+        self.__excluded_prefixes = tuple(prefixes)
+        self.__excluded_expression = re.compile("|".join(expressions)) if expressions else None
+
+        self.__lock = threading.Lock()
+        self.__reels_excluded_by_name = 0
+        self.__reels_excluded_by_pattern = 0
+        self.__reels_accepted = 0
+        self.__images_accepted = 0
+        self.__images_rejected = 0
+
+    @classmethod
+    def from_parameters(cls, prms) -> "CrawlFilter":
+        return cls(prms.exclusion_filters, prms.extension_filters, prms.exclusion_patterns)
+
+    @property
+    def extensions(self) -> tuple:
+        return self.__extensions
+
+    def is_excluded(self, name: str) -> bool:
+
+        if name in self.__excluded_names:
+            self.__reels_excluded_by_name += 1
+            return True
+
+        if (self.__excluded_prefixes and name.startswith(self.__excluded_prefixes)) or \
+                (self.__excluded_expression is not None and self.__excluded_expression.match(name)):
+            self.__reels_excluded_by_pattern += 1
+            return True
+
+        self.__reels_accepted += 1
+        return False
+
+    def is_image(self, name: str) -> bool:
+        return name.lower().endswith(self.__extensions)
+
+    def record_images(self, accepted: int, rejected: int) -> None:
+
+        # image matching runs on the reel scanning threads, so tally once per reel
+        with self.__lock:
+            self.__images_accepted += accepted
+            self.__images_rejected += rejected
+
+    @property
+    def counters(self) -> dict:
+        return {
+            "reels_accepted": self.__reels_accepted,
+            "reels_excluded_by_name": self.__reels_excluded_by_name,
+            "reels_excluded_by_pattern": self.__reels_excluded_by_pattern,
+            "images_accepted": self.__images_accepted,
+            "images_rejected": self.__images_rejected
+        }
+
+    def __str__(self) -> str:
+
+        output = f"Excluded Names: {len(self.__excluded_names)}\n"
+        output = output + f"Excluded Prefixes: {list(self.__excluded_prefixes)}\n"
+        output = output + f"Excluded Expression: {self.__excluded_expression.pattern if self.__excluded_expression else None}\n"
+        output = output + f"Extensions: {list(self.__extensions)}\n"
+
+        return output
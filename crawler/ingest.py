@@ -0,0 +1,175 @@
+import queue
+import threading
+
+from logger import CrawlLogger
+from typing import Callable, List
+
+_SHUTDOWN = object()
+
+
+class IngestPipelineError(Exception):
+    pass
+
+
+class ReelIngestPipeline:
+
+    """
+    Producer/consumer stage between ReelCrawler.run_crawl and the reel repository.
+    The crawl thread submits reels into a bounded queue (blocking when it's full)
+    and a writer thread commits them in groups of batch_size per transaction, so
+    NFS latency and database latency overlap instead of adding up.
+
+    A failure on the writer thread is re-raised on the crawl thread from the next
+    submit() or from close().
+    """
+
+    def __init__(self,
+                 repository,
+                 batch_size: int = 25,
+                 queue_size: int = 100,
+                 on_commit: Callable[[List[dict]], None] = None) -> None:
+
+        self.__repository = repository
+        self.__batch_size = batch_size
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__commit_listeners = [on_commit] if on_commit else []
+        self.__error = None
+        self.__thread = None
+        self.__reels_written = 0
+        self.__images_written = 0
+        self.__batches_written = 0
+
+    @property
+    def reels_written(self) -> int:
+        return self.__reels_written
+
+    @property
+    def images_written(self) -> int:
+        return self.__images_written
+
+    @property
+    def batches_written(self) -> int:
+        return self.__batches_written
+
+    def add_commit_listener(self, listener: Callable[[List[dict]], None]) -> None:
+        self.__commit_listeners.append(listener)
+
+    def start(self) -> "ReelIngestPipeline":
+
+        self.__thread = threading.Thread(target=self.__run, name="reel-ingest-writer", daemon=True)
+        self.__thread.start()
+        return self
+
+    def submit(self, reel) -> None:
+
+        while True:
+            self.__raise_if_failed()
+            try:
+                self.__queue.put(reel, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self) -> None:
+
+        if self.__thread is None:
+            return
+
+        while self.__thread.is_alive():
+            try:
+                self.__queue.put(_SHUTDOWN, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+
+        self.__thread.join()
+        self.__thread = None
+        self.__raise_if_failed()
+
+    def __enter__(self) -> "ReelIngestPipeline":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+
+        if exc_type is None:
+            self.close()
+            return
+
+        # the exception already on its way out is the one the caller needs; a writer failure is only logged
+        try:
+            self.close()
+        except IngestPipelineError as ex:
+            CrawlLogger().log_error(f"Reel ingest writer also failed while unwinding {exc_type.__name__}: {ex}")
+
+    def __raise_if_failed(self) -> None:
+        if self.__error is not None:
+            raise IngestPipelineError(f"Reel ingest writer failed: {self.__error}") from self.__error
+
+    def __run(self) -> None:
+
+        shutdown = False
+
+        while not shutdown:
+
+            item = self.__queue.get()
+            if item is _SHUTDOWN:
+                break
+
+            batch = [item]
+
+            # take whatever else is already waiting, up to a full batch
+            while len(batch) < self.__batch_size:
+                try:
+                    item = self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _SHUTDOWN:
+                    shutdown = True
+                    break
+                batch.append(item)
+
+            try:
+                self.__write(batch)
+            except Exception as ex:
+                self.__error = ex
+                CrawlLogger().log_error(f"Error writing batch of {len(batch)} reels: {ex}")
+                self.__discard_remaining()
+                return
+
+    def __write(self, batch) -> None:
+
+        self.__repository.add_reels_and_images(batch)
+
+        self.__batches_written = self.__batches_written + 1
+        self.__reels_written = self.__reels_written + len(batch)
+        self.__images_written = self.__images_written + sum(len(reel["parsed_images"]) for reel in batch)
+
+        for listener in self.__commit_listeners:
+            listener(batch)
+
+    def __discard_remaining(self) -> None:
+
+        # unblock a producer waiting on a full queue; it will see the error on its next submit
+        while True:
+            try:
+                self.__queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+def ingest_crawl(crawler, pipeline: ReelIngestPipeline) -> dict:
+
+    reels_parsed = 0
+    images_parsed = 0
+
+    # reels only reach the checkpoint and manifest once the writer has committed them
+    pipeline.add_commit_listener(crawler.commit_reels)
+
+    with pipeline:
+        for result in crawler.run_crawl():
+            reel = result["reel"]
+            pipeline.submit(reel)
+            reels_parsed = reels_parsed + 1
+            images_parsed = images_parsed + len(reel["parsed_images"])
+
+    return {"reels_parsed": reels_parsed, "images_parsed": images_parsed}
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+
+from typing import Dict, Optional
+
+
+class CrawlManifest:
+
+    """
+    Per scan folder record of the reels a crawl has already committed, keyed by
+    scan identifier. Each entry holds a cheap fingerprint of the reel directory
+    (reel/frames mtimes and the reel directory entry count) plus the image total
+    seen on the last scan, so a re-run can skip reels whose fingerprint is unchanged
+    without listing their frames directory.
+
+    Reels are fingerprinted by observe() when the crawl reaches them but only
+    become entries through record(), which the crawler calls once the reel's
+    rows are saved; record() may run on a different thread from observe().
+    """
+
+    def __init__(self, manifest_path: str) -> None:
+
+        self.__manifest_path = manifest_path
+        self.__entries: Dict[str, dict] = {}
+        self.__observed: Dict[str, dict] = {}
+        self.__skipped = 0
+        self.__dirty = False
+        self.__lock = threading.Lock()
+
+        self.__load()
+
+    @staticmethod
+    def manifest_file_name(census_year: int, normalized_folder: str) -> str:
+        return f"{census_year}_{normalized_folder}.manifest.json"
+
+    @staticmethod
+    def fingerprint(reel_path: str) -> dict:
+
+        reel_stat = os.stat(reel_path)
+
+        try:
+            frames_mtime = os.stat(os.path.join(reel_path, "frames")).st_mtime_ns
+        except FileNotFoundError:
+            frames_mtime = None
+
+        return {
+            "reel_mtime": reel_stat.st_mtime_ns,
+            "frames_mtime": frames_mtime,
+            "entry_count": len(os.listdir(reel_path))
+        }
+
+    @property
+    def manifest_path(self) -> str:
+        return self.__manifest_path
+
+    @property
+    def skipped(self) -> int:
+        return self.__skipped
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, scan_identifier: str) -> Optional[dict]:
+        return self.__entries.get(scan_identifier)
+
+    def observe(self, scan_identifier: str, reel_path: str) -> bool:
+
+        """ Fingerprints the reel and returns True when it needs to be (re)scanned """
+
+        fingerprint = self.fingerprint(reel_path)
+
+        with self.__lock:
+
+            previous = self.__entries.get(scan_identifier)
+
+            if previous is not None and previous["fingerprint"] == fingerprint:
+                self.__skipped = self.__skipped + 1
+                return False
+
+            self.__observed[scan_identifier] = fingerprint
+            return True
+
+    def record(self, scan_identifier: str, image_total: int) -> None:
+
+        with self.__lock:
+
+            fingerprint = self.__observed.pop(scan_identifier, None)
+
+            if fingerprint is None:
+                return
+
+            self.__entries[scan_identifier] = {"fingerprint": fingerprint, "image_total": image_total}
+            self.__dirty = True
+
+    def discard(self, scan_identifier: str) -> None:
+
+        with self.__lock:
+            self.__observed.pop(scan_identifier, None)
+
+    def clear(self) -> None:
+
+        """ Forgets every entry and removes the file, e.g. once the folder's rows have been deleted """
+
+        with self.__lock:
+            if os.path.exists(self.__manifest_path):
+                os.remove(self.__manifest_path)
+            self.__entries = {}
+            self.__observed = {}
+            self.__dirty = False
+
+    def save(self) -> None:
+
+        with self.__lock:
+
+            if not self.__dirty:
+                return
+
+            directory = os.path.dirname(self.__manifest_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # write then swap so an interrupted save never leaves a torn manifest
+            temp_path = self.__manifest_path + ".tmp"
+
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "reels": self.__entries}, f)
+
+            os.replace(temp_path, self.__manifest_path)
+            self.__dirty = False
+
+    def __load(self) -> None:
+
+        if not os.path.exists(self.__manifest_path):
+            return
+
+        with open(self.__manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.__entries = data.get("reels", {})
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+from collections import deque
+from metrics import Counter, Histogram
+from typing import Dict
+
+
+class CrawlMetrics:
+
+    """
+    Per-phase latency histograms and throughput counters for one crawl.
+    Written as a Prometheus text file and a JSON snapshot under metrics_dir,
+    at most every flush_interval seconds while the crawl runs and once when it ends.
+    """
+
+    def __init__(self,
+                 metrics_dir: str,
+                 census_year: int,
+                 normalized_folder: str,
+                 flush_interval: float = 15.0,
+                 rate_window: float = 60.0) -> None:
+
+        self.__metrics_dir = metrics_dir
+        self.__file_stem = f"{census_year}_{normalized_folder}"
+        self.__labels = f'census_year="{census_year}",scan_folder="{normalized_folder}"'
+        self.__flush_interval = flush_interval
+        self.__rate_window = rate_window
+        self.__started = time.monotonic()
+        self.__last_flush = self.__started
+        self.__recent = deque()
+
+        self.reel_scandir_seconds = Histogram("ips_crawler_reel_scandir_seconds",
+                                              "Time spent listing a reel's frames directory, excluding stat and filtering")
+        self.image_stat_seconds = Histogram("ips_crawler_image_stat_seconds",
+                                            "Per image stat latency")
+        self.consumer_wait_seconds = Histogram("ips_crawler_consumer_wait_seconds",
+                                               "Time the crawl spent suspended waiting on its consumer per reel")
+        self.filter_seconds = Counter("ips_crawler_filter_seconds_total",
+                                      "Time spent on exclusion and extension filtering")
+        self.reels_total = Counter("ips_crawler_reels_total", "Reels yielded")
+        self.images_total = Counter("ips_crawler_images_total", "Images yielded")
+        self.reel_errors_total = Counter("ips_crawler_reel_errors_total", "Reels that failed to parse")
+
+    @property
+    def prometheus_path(self) -> str:
+        return os.path.join(self.__metrics_dir, f"{self.__file_stem}.prom")
+
+    @property
+    def json_path(self) -> str:
+        return os.path.join(self.__metrics_dir, f"{self.__file_stem}.json")
+
+    def reel_completed(self, image_count: int) -> None:
+
+        now = time.monotonic()
+
+        self.reels_total.inc()
+        self.images_total.inc(image_count)
+        self.__recent.append((now, image_count))
+
+        while self.__recent and now - self.__recent[0][0] > self.__rate_window:
+            self.__recent.popleft()
+
+    def rolling_rates(self) -> Dict[str, float]:
+
+        if not self.__recent:
+            return {"reels_per_second": 0.0, "images_per_second": 0.0}
+
+        window = max(min(time.monotonic() - self.__started, self.__rate_window), 1e-9)
+
+        return {
+            "reels_per_second": len(self.__recent) / window,
+            "images_per_second": sum(count for _, count in self.__recent) / window
+        }
+
+    def maybe_flush(self) -> None:
+
+        if time.monotonic() - self.__last_flush >= self.__flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+
+        self.__last_flush = time.monotonic()
+        os.makedirs(self.__metrics_dir, exist_ok=True)
+
+        rates = self.rolling_rates()
+        lines = []
+
+        for metric in (self.reel_scandir_seconds, self.image_stat_seconds, self.consumer_wait_seconds,
+                       self.filter_seconds, self.reels_total, self.images_total, self.reel_errors_total):
+            lines.extend(metric.prometheus(self.__labels))
+
+        for name, value in rates.items():
+            lines.append(f"# TYPE ips_crawler_{name} gauge")
+            lines.append(f"ips_crawler_{name}{{{self.__labels}}} {value}")
+
+        self.__write(self.prometheus_path, "\n".join(lines) + "\n")
+
+        snapshot = {
+            "elapsed_seconds": time.monotonic() - self.__started,
+            "reels_total": self.reels_total.value,
+            "images_total": self.images_total.value,
+            "reel_errors_total": self.reel_errors_total.value,
+            "filter_seconds_total": self.filter_seconds.value,
+            "rolling": rates,
+            "histograms": {
+                "reel_scandir_seconds": self.reel_scandir_seconds.snapshot(),
+                "image_stat_seconds": self.image_stat_seconds.snapshot(),
+                "consumer_wait_seconds": self.consumer_wait_seconds.snapshot()
+            }
+        }
+
+        self.__write(self.json_path, json.dumps(snapshot, default=str))
+
+    def __write(self, path: str, content: str) -> None:
+
+        # scrapers and dashboards never see a half written file
+        temp_path = path + ".tmp"
+
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+        os.replace(temp_path, path)
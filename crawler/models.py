@@ -0,0 +1,113 @@
+import os
+
+from array import array
+from itertools import repeat
+from typing import Iterable, Iterator, List, Optional
+
+
+class ImageRecord:
+
+    __slots__ = ("filename", "filepath", "filesize")
+
+    def __init__(self, filename: str, filepath: str, filesize: int) -> None:
+        self.filename = filename
+        self.filepath = filepath
+        self.filesize = filesize
+
+    # repository code reads images as image["filename"], image["filesize"], image["filepath"]
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def to_dict(self) -> dict:
+        return {"filename": self.filename, "filepath": self.filepath, "filesize": self.filesize}
+
+    def __repr__(self) -> str:
+        return f"ImageRecord({self.filename!r}, {self.filepath!r}, {self.filesize})"
+
+
+class ParsedImages:
+
+    """
+    Compact container for the images parsed out of one reel's frames directory.
+    The directory is stored once, filenames in a list and sizes in an array('q');
+    full filepaths and ImageRecord objects are only built while iterating.
+
+    A crawl that skips stat collection leaves sizes_collected False and every
+    filesize reads as None.
+    """
+
+    __slots__ = ("__directory", "__filenames", "__filesizes", "__sizes_collected")
+
+    def __init__(self, directory: str, sizes_collected: bool = True) -> None:
+        self.__directory = directory
+        self.__filenames: List[str] = []
+        self.__filesizes = array('q')
+        self.__sizes_collected = sizes_collected
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def filenames(self) -> List[str]:
+        return self.__filenames
+
+    @property
+    def filesizes(self) -> array:
+        return self.__filesizes
+
+    @property
+    def sizes_collected(self) -> bool:
+        return self.__sizes_collected
+
+    @property
+    def total_bytes(self) -> Optional[int]:
+        return sum(self.__filesizes) if self.__sizes_collected else None
+
+    def append(self, filename: str, filesize: int) -> None:
+        self.__filenames.append(filename)
+        self.__filesizes.append(filesize)
+
+    def extend(self, filenames: List[str], filesizes: Iterable[int] = None) -> None:
+        self.__filenames.extend(filenames)
+        self.__filesizes.extend(filesizes if self.__sizes_collected else [0] * len(filenames))
+
+    def filepath(self, filename: str) -> str:
+        return os.path.join(self.__directory, filename)
+
+    def rows(self, reel_id: int, extra: tuple = ()) -> Iterator[tuple]:
+
+        """ (reel_id, filename, filesize, filepath, *extra) tuples in images column order """
+
+        directory = self.__directory
+        join = os.path.join
+        filesizes = self.__filesizes if self.__sizes_collected else repeat(None)
+
+        for filename, filesize in zip(self.__filenames, filesizes):
+            yield (reel_id, filename, filesize, join(directory, filename)) + extra
+
+    def to_list(self) -> List[dict]:
+        return [image.to_dict() for image in self]
+
+    def __getitem__(self, index: int) -> ImageRecord:
+        filename = self.__filenames[index]
+        filesize = self.__filesizes[index] if self.__sizes_collected else None
+        return ImageRecord(filename, self.filepath(filename), filesize)
+
+    def __iter__(self) -> Iterator[ImageRecord]:
+
+        directory = self.__directory
+        join = os.path.join
+        filesizes = self.__filesizes if self.__sizes_collected else repeat(None)
+
+        for filename, filesize in zip(self.__filenames, filesizes):
+            yield ImageRecord(filename, join(directory, filename), filesize)
+
+    def __len__(self) -> int:
+        return len(self.__filenames)
+
+    def __repr__(self) -> str:
+        return f"ParsedImages({self.__directory!r}, {len(self)} images)"
@@ -0,0 +1,276 @@
+import multiprocessing
+import os
+import time
+
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from logger import CrawlLogger
+from queue import Empty
+from uuid import uuid4
+from crawler.parameters import CrawlEngineParameters, CrawlOrchestratorParameters
+from crawler.planner import CrawlPlanner
+
+
+# worker processes are reused across tasks; the index is loaded once per orchestrator run
+_known_reels = {"run_id": None, "index": None}
+
+
+def known_reel_index(task):
+
+    from crawler.reel_index import KnownReelIndex
+    from crawler.staging import iter_known_reels_snapshot
+
+    if not task.get("known_reel_index"):
+        return None
+
+    if _known_reels["run_id"] != task.get("run_id") or _known_reels["index"] is None:
+        bloom_error_rate = task.get("known_reel_bloom_error_rate")
+        if staging_mode(task):
+            # staged crawls never read Postgres; the index comes from the pre-crawl snapshot
+            _known_reels["index"] = KnownReelIndex((row[3] for row in iter_known_reels_snapshot(task["staging_dir"])),
+                                                   bloom_error_rate=bloom_error_rate)
+        else:
+            _known_reels["index"] = KnownReelIndex.load(bloom_error_rate=bloom_error_rate)
+        _known_reels["run_id"] = task.get("run_id")
+
+    return _known_reels["index"]
+
+
+def staging_mode(task) -> bool:
+    return bool(task["persist_data"] and task.get("staging_dir"))
+
+
+def crawl_scan_folder(task, progress_queue=None):
+
+    from crawler.staging import CrawlStagingStore
+
+    if not staging_mode(task):
+        return _crawl_scan_folder(task, progress_queue, None)
+
+    # staged results go to a local file per scan folder and reach Postgres later via sync_staging_store
+    month, year = task["scan_folder"]
+    normalized_folder = datetime(year, month, 1).strftime("%m-%b-%y")
+    staging_store = CrawlStagingStore(os.path.join(task["staging_dir"],
+        CrawlStagingStore.staging_file_name(task["census_year"], normalized_folder)), task["census_year"], (month, year))
+
+    try:
+        return _crawl_scan_folder(task, progress_queue, staging_store)
+    finally:
+        staging_store.close()
+
+
+def _crawl_scan_folder(task, progress_queue, staging_store):
+
+    # imported here so each worker process opens its own connection pool
+    from config import CrawlerSettings
+    from crawler.ingest import ReelIngestPipeline, ingest_crawl
+    from crawler.service import ReelCrawler
+    from crawler.staging import staged_exclusion_filters
+    from data import CrawlStatusRepository, ReelRepository, lookup_cache
+
+    census_year = task["census_year"]
+    month, year = task["scan_folder"]
+
+    reel_repository = ReelRepository()
+
+    if staging_store is not None:
+        exclusion_filters = staged_exclusion_filters(staging_store, task["staging_dir"])
+    else:
+        exclusion_filters = reel_repository.get_filters_by_scan(month, year, census_year)
+
+    prms = CrawlEngineParameters(census_year, task["isilon_root"], task["scan_folder"],
+                                 exclusion_filters=exclusion_filters,
+                                 extension_filters=CrawlerSettings().getCrawlerDefaultExtensions(census_year),
+                                 max_workers=task["reel_workers"],
+                                 manifest_dir=task["manifest_dir"] if task["persist_data"] else None,
+                                 checkpoint_dir=task["checkpoint_dir"] if task["persist_data"] else None,
+                                 metrics_dir=task.get("metrics_dir"),
+                                 known_reels=known_reel_index(task))
+    crawler = ReelCrawler(prms)
+
+    started = time.monotonic()
+
+    def report_progress(batch):
+        if progress_queue is not None:
+            progress_queue.put((task["isilon_root"], len(batch), sum(len(reel["parsed_images"]) for reel in batch)))
+
+    if task["persist_data"]:
+        totals = ingest_crawl(crawler, ReelIngestPipeline(staging_store or reel_repository, on_commit=report_progress))
+    else:
+        totals = {"reels_parsed": 0, "images_parsed": 0}
+        for result in crawler.run_crawl():
+            report_progress([result["reel"]])
+            totals["reels_parsed"] = totals["reels_parsed"] + 1
+            totals["images_parsed"] = totals["images_parsed"] + len(result["reel"]["parsed_images"])
+
+    reels_parsed = totals["reels_parsed"]
+    images_parsed = totals["images_parsed"]
+
+    crawl_time = timedelta(seconds=time.monotonic() - started)
+
+    if staging_store is not None:
+        staging_store.add_crawl_operation(str(datetime.now()), reels_parsed, images_parsed, str(crawl_time))
+        if crawler.checkpoint is not None:
+            crawler.checkpoint.clear()
+    elif task["persist_data"]:
+        status_repository = CrawlStatusRepository()
+        status_repository.add_crawl_operation(census_year, month, year, str(datetime.now()),
+                                              reels_parsed, images_parsed, str(crawl_time))
+        status_repository.mark_crawl_as_completed(census_year, month, year)
+        if crawler.checkpoint is not None:
+            crawler.checkpoint.clear()
+
+    return {
+        "census_year": census_year,
+        "folder_crawled": (month, year),
+        "reels_parsed": reels_parsed,
+        "images_parsed": images_parsed,
+        "crawl_time": crawl_time.total_seconds(),
+        "known_reels_skipped": len(crawler.known_reel_skips),
+        "lookup_cache": lookup_cache.stats()
+    }
+
+
+class CrawlOrchestrator:
+
+    def __init__(self, prms: CrawlOrchestratorParameters) -> None:
+
+        self._prms = prms
+        self._reels_parsed = 0
+        self._images_parsed = 0
+        self._started = None
+        self._run_id = uuid4().hex
+
+    @property
+    def reels_per_second(self) -> float:
+        return self._reels_parsed / self.__elapsed() if self._started else 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        return self._images_parsed / self.__elapsed() if self._started else 0.0
+
+    def plan(self):
+
+        from config import CrawlerSettings
+
+        prms = self._prms
+        default_root = CrawlerSettings().base_reel_location
+
+        planner = CrawlPlanner(recheck_completed=prms.recheck_completed)
+        isilon_roots = {census_year: prms.isilon_root(census_year, default_root)
+                        for census_year in prms.census_years}
+
+        tasks = []
+
+        for engine_prms in planner.plan(isilon_roots):
+            tasks.append({
+                "census_year": engine_prms.census_year,
+                "isilon_root": engine_prms.isilon_root,
+                "scan_folder": engine_prms.scan_folder,
+                "reel_workers": prms.reel_workers,
+                "manifest_dir": prms.manifest_dir,
+                "checkpoint_dir": prms.checkpoint_dir,
+                "metrics_dir": prms.metrics_dir,
+                "persist_data": prms.persist_data,
+                "known_reel_index": prms.known_reel_index,
+                "known_reel_bloom_error_rate": prms.known_reel_bloom_error_rate,
+                "staging_dir": prms.staging_dir,
+                "run_id": self._run_id
+            })
+
+        CrawlLogger().log_system_message(f"Planned {len(tasks)} scan folders, skipped {len(planner.skipped)}, "
+                                         f"touched {planner.directories_touched} directories")
+
+        return tasks
+
+    def run(self, tasks=None):
+
+        prms = self._prms
+        log = CrawlLogger()
+
+        tasks = self.plan() if tasks is None else tasks
+        pending = deque(tasks)
+        running = {}
+        active_per_root = Counter()
+        results = []
+        errors = []
+
+        log.log_system_message(f"Orchestrating {len(pending)} scan folders\n{prms}")
+
+        # spawn rather than fork so workers never inherit the parent's open db connections
+        context = multiprocessing.get_context("spawn")
+        self._started = time.monotonic()
+        last_report = self._started
+
+        with context.Manager() as manager, \
+                ProcessPoolExecutor(max_workers=prms.max_processes, mp_context=context) as executor:
+
+            progress_queue = manager.Queue()
+
+            while pending or running:
+
+                for task in list(pending):
+                    if len(running) >= prms.max_processes:
+                        break
+                    if active_per_root[task["isilon_root"]] >= prms.mount_limit(task["isilon_root"]):
+                        continue
+
+                    pending.remove(task)
+                    active_per_root[task["isilon_root"]] += 1
+                    running[executor.submit(crawl_scan_folder, task, progress_queue)] = task
+
+                done, _ = wait(list(running), timeout=prms.report_interval, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    task = running.pop(future)
+                    active_per_root[task["isilon_root"]] -= 1
+
+                    try:
+                        result = future.result()
+                        results.append(result)
+                        log.log_system_message(f"Completed {task['census_year']} {task['scan_folder']}: "
+                                               f"{result['reels_parsed']} reels, {result['images_parsed']} images")
+                    except Exception as ex:
+                        errors.append({"task": task, "error": str(ex)})
+                        log.log_error(f"Error crawling {task['census_year']} {task['scan_folder']} "
+                                      f"at {task['isilon_root']}: {ex}")
+
+                self.__drain_progress(progress_queue)
+
+                if time.monotonic() - last_report >= prms.report_interval:
+                    last_report = time.monotonic()
+                    self.__report(log, len(pending), len(running))
+
+            self.__drain_progress(progress_queue)
+
+        self.__report(log, 0, 0)
+
+        return {
+            "folders_crawled": results,
+            "errors_encountered": errors,
+            "reels_parsed": self._reels_parsed,
+            "images_parsed": self._images_parsed,
+            "reels_per_second": self.reels_per_second,
+            "images_per_second": self.images_per_second
+        }
+
+    def __drain_progress(self, progress_queue) -> None:
+
+        while True:
+            try:
+                _, reels, images = progress_queue.get_nowait()
+            except Empty:
+                return
+
+            self._reels_parsed = self._reels_parsed + reels
+            self._images_parsed = self._images_parsed + images
+
+    def __report(self, log, pending: int, running: int) -> None:
+
+        log.log_system_message(f"Orchestrator progress: {self._reels_parsed} reels, {self._images_parsed} images "
+                               f"({self.reels_per_second:.1f} reels/s, {self.images_per_second:.1f} images/s), "
+                               f"{running} running, {pending} pending")
+
+    def __elapsed(self) -> float:
+        return max(time.monotonic() - self._started, 1e-9)
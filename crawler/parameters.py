@@ -1,7 +1,12 @@
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from datetime import date
 import os
 
+STAT_INLINE = "inline"
+STAT_DEFERRED = "deferred"
+STAT_NONE = "none"
+STAT_MODES = (STAT_INLINE, STAT_DEFERRED, STAT_NONE)
+
 class CrawlEngineParameters:
 
     def __init__(self, 
@@ -11,7 +16,19 @@ class CrawlEngineParameters:
                  reel_batch_size: int = None,
                  image_batch_size: int = None, 
                  exclusion_filters = [],
-                 extension_filters = ['.jpg']) -> None:
+                 extension_filters = ['.jpg'],
+                 max_workers: int = None,
+                 ordered_results: bool = True,
+                 manifest_dir: str = None,
+                 exclusion_patterns: List[str] = None,
+                 checkpoint_dir: str = None,
+                 stat_mode: str = STAT_INLINE,
+                 stat_workers: int = 16,
+                 metrics_dir: str = None,
+                 known_reels = None) -> None:
+
+        if stat_mode not in STAT_MODES:
+            raise ValueError(f"Unknown stat mode: {stat_mode}, expected one of {STAT_MODES}")
 
         if not exclusion_filters:
             self.__exclusion_filters = List[str] 
@@ -25,6 +42,15 @@ class CrawlEngineParameters:
         self.__reel_batch_size = reel_batch_size
         self.__image_batch_size = image_batch_size
         self.__extension_filters = extension_filters
+        self.__max_workers = max_workers
+        self.__ordered_results = ordered_results
+        self.__manifest_dir = manifest_dir
+        self.__exclusion_patterns = exclusion_patterns if exclusion_patterns else []
+        self.__checkpoint_dir = checkpoint_dir
+        self.__stat_mode = stat_mode
+        self.__stat_workers = stat_workers
+        self.__metrics_dir = metrics_dir
+        self.__known_reels = known_reels
 
     @property
     def census_year(self) -> int:
@@ -54,6 +80,54 @@ class CrawlEngineParameters:
     def extension_filters(self) -> List[str]:
         return self.__extension_filters
 
+    @property
+    def exclusion_patterns(self) -> List[str]:
+        return self.__exclusion_patterns
+
+    @property
+    def max_workers(self) -> int:
+        return self.__max_workers
+
+    @property
+    def ordered_results(self) -> bool:
+        return self.__ordered_results
+
+    @property
+    def manifest_dir(self) -> str:
+        return self.__manifest_dir
+
+    @property
+    def incremental(self) -> bool:
+        return bool(self.__manifest_dir)
+
+    @property
+    def checkpoint_dir(self) -> str:
+        return self.__checkpoint_dir
+
+    @property
+    def resumable(self) -> bool:
+        return bool(self.__checkpoint_dir)
+
+    @property
+    def stat_mode(self) -> str:
+        return self.__stat_mode
+
+    @property
+    def stat_workers(self) -> int:
+        return self.__stat_workers
+
+    @property
+    def metrics_dir(self) -> str:
+        return self.__metrics_dir
+
+    @property
+    def known_reels(self):
+        return self.__known_reels
+
+    @property
+    def concurrent(self) -> bool:
+        return bool(self.__max_workers and self.__max_workers > 1)
+
     @property
     def normalized_folder(self) -> str:
         return (date(self.scan_folder[1], self.scan_folder[0], 1)
@@ -85,9 +159,18 @@ class CrawlEngineParameters:
         output = output + f"Isilon Root: {self.isilon_root}\n"
         output = output + f"Scan Folder: {self.scan_folder}\n"
         output = output + f"Exclusion Filters: {self.exclusion_filters}\n"
+        output = output + f"Exclusion Patterns: {self.exclusion_patterns}\n"
         output = output + f"Extension Filters: {self.extension_filters}\n"
         output = output + f"Reel Batch Size: {self.reel_batch_size}\n"
         output = output + f"Image Batch Size: {self.image_batch_size}\n"
+        output = output + f"Max Workers: {self.max_workers}\n"
+        output = output + f"Ordered Results: {self.ordered_results}\n"
+        output = output + f"Manifest Dir: {self.manifest_dir}\n"
+        output = output + f"Checkpoint Dir: {self.checkpoint_dir}\n"
+        output = output + f"Stat Mode: {self.stat_mode}\n"
+        output = output + f"Stat Workers: {self.stat_workers}\n"
+        output = output + f"Metrics Dir: {self.metrics_dir}\n"
+        output = output + f"Known Reel Index: {len(self.known_reels) if self.known_reels is not None else None}\n"
 
         return output
 
@@ -124,7 +207,7 @@ class RunRecrawlParameters:
 
     def __str__(self) -> str:
 
-        output = f'Current Crawl Parameters:\n'
+        output = 'Current Crawl Parameters:\n'
         output = output + f'Persist Data (Live-Run): {self.persist_data}\n'
         output = output + f'Census Year: {self.census_year}\n'
         output = output + f'Scan Year: {self.scan_year}\n'
@@ -185,7 +268,7 @@ class RunCrawlParameters:
 
     def __str__(self) -> str:
         
-        output = f'Current Crawl Parameters:\n'
+        output = 'Current Crawl Parameters:\n'
         output = output + f'Persist Data (Live-Run): {self.persist_data}\n'
         output = output + f'Census Year: {self.census_year}\n'
         output = output + f'Scan Year: {self.scan_year}\n'
@@ -195,3 +278,134 @@ class RunCrawlParameters:
 
         return str(output)
 
+
+
+class CrawlOrchestratorParameters:
+
+    def __init__(self,
+                    census_years: List[int] = [1960, 1970, 1980, 1990],
+                    isilon_roots: Dict[int, str] = None,
+                    max_processes: int = 4,
+                    default_mount_limit: int = 2,
+                    mount_limits: Dict[str, int] = None,
+                    reel_workers: int = None,
+                    manifest_dir: str = None,
+                    checkpoint_dir: str = None,
+                    metrics_dir: str = None,
+                    persist_data: bool = True,
+                    recheck_completed: bool = False,
+                    report_interval: float = 30.0,
+                    known_reel_index: bool = True,
+                    known_reel_bloom_error_rate: float = None,
+                    staging_dir: str = None
+        ) -> None:
+
+        # a root allowed no crawls would never have its folders scheduled, and the run would spin waiting on them
+        if max_processes < 1:
+            raise ValueError(f"max_processes must be at least 1, got {max_processes}")
+        if default_mount_limit < 1:
+            raise ValueError(f"default_mount_limit must be at least 1, got {default_mount_limit}")
+        for isilon_root, mount_limit in (mount_limits or {}).items():
+            if mount_limit < 1:
+                raise ValueError(f"Mount limit for {isilon_root} must be at least 1, got {mount_limit}")
+
+        self.__census_years = census_years
+        self.__isilon_roots = isilon_roots if isilon_roots else {}
+        self.__max_processes = max_processes
+        self.__default_mount_limit = default_mount_limit
+        self.__mount_limits = mount_limits if mount_limits else {}
+        self.__reel_workers = reel_workers
+        self.__manifest_dir = manifest_dir
+        self.__checkpoint_dir = checkpoint_dir
+        self.__metrics_dir = metrics_dir
+        self.__persist_data = persist_data
+        self.__recheck_completed = recheck_completed
+        self.__report_interval = report_interval
+        self.__known_reel_index = known_reel_index
+        self.__known_reel_bloom_error_rate = known_reel_bloom_error_rate
+        self.__staging_dir = staging_dir
+
+    @property
+    def census_years(self) -> List[int]:
+        return self.__census_years
+
+    @property
+    def isilon_roots(self) -> Dict[int, str]:
+        return self.__isilon_roots
+
+    @property
+    def max_processes(self) -> int:
+        return self.__max_processes
+
+    @property
+    def default_mount_limit(self) -> int:
+        return self.__default_mount_limit
+
+    @property
+    def mount_limits(self) -> Dict[str, int]:
+        return self.__mount_limits
+
+    @property
+    def reel_workers(self) -> int:
+        return self.__reel_workers
+
+    @property
+    def manifest_dir(self) -> str:
+        return self.__manifest_dir
+
+    @property
+    def checkpoint_dir(self) -> str:
+        return self.__checkpoint_dir
+
+    @property
+    def metrics_dir(self) -> str:
+        return self.__metrics_dir
+
+    @property
+    def persist_data(self) -> bool:
+        return self.__persist_data
+
+    @property
+    def recheck_completed(self) -> bool:
+        return self.__recheck_completed
+
+    @property
+    def report_interval(self) -> float:
+        return self.__report_interval
+
+    @property
+    def known_reel_index(self) -> bool:
+        return self.__known_reel_index
+
+    @property
+    def known_reel_bloom_error_rate(self) -> float:
+        return self.__known_reel_bloom_error_rate
+
+    @property
+    def staging_dir(self) -> str:
+        return self.__staging_dir
+
+    def isilon_root(self, census_year: int, default_root: str) -> str:
+        return self.__isilon_roots.get(census_year, default_root)
+
+    def mount_limit(self, isilon_root: str) -> int:
+        return self.__mount_limits.get(isilon_root, self.__default_mount_limit)
+
+    def __str__(self) -> str:
+
+        output = 'Current Orchestrator Parameters:\n'
+        output = output + f'Persist Data (Live-Run): {self.persist_data}\n'
+        output = output + f'Census Years: {self.census_years}\n'
+        output = output + f'Isilon Roots: {self.isilon_roots}\n'
+        output = output + f'Max Processes: {self.max_processes}\n'
+        output = output + f'Default Mount Limit: {self.default_mount_limit}\n'
+        output = output + f'Mount Limits: {self.mount_limits}\n'
+        output = output + f'Reel Workers: {self.reel_workers}\n'
+        output = output + f'Manifest Dir: {self.manifest_dir}\n'
+        output = output + f'Checkpoint Dir: {self.checkpoint_dir}\n'
+        output = output + f'Metrics Dir: {self.metrics_dir}\n'
+        output = output + f'Recheck Completed: {self.recheck_completed}\n'
+        output = output + f'Known Reel Index: {self.known_reel_index}\n'
+        output = output + f'Staging Dir: {self.staging_dir}\n'
+
+        return str(output)
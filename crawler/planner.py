@@ -0,0 +1,183 @@
+import os
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from crawler.parameters import CrawlEngineParameters
+
+
+def to_timestamp(value) -> Optional[float]:
+
+    if value is None:
+        return None
+
+    # date_completed is written as str(datetime.now()) but may come back as a datetime
+    if isinstance(value, datetime):
+        return value.timestamp()
+
+    return datetime.fromisoformat(str(value)).timestamp()
+
+
+class CrawlPlanner:
+
+    """
+    Date-driven crawl planning: combines crawl_status history with directory
+    mtimes to work out the minimal set of scan folders that can hold new data.
+
+    - years before crawl history starts are never listed
+    - a year whose directory hasn't changed since its last completed crawl, and
+      whose month folders all have a completed crawl, is skipped without
+      statting its month folders (unless recheck_completed is on: reels added to
+      a completed month folder change that folder's mtime, not the year's).
+      December is usually still the current month when a year's last crawl
+      completes, so its folder predates that crawl without being in the history
+    - inside a listed year, folders that were never completed are planned (up to
+      but not including the current month, which is still being filled)
+    - completed folders are only re-planned when recheck_completed is on and the
+      folder's mtime is newer than its completion
+    """
+
+    def __init__(self,
+                 status_repository=None,
+                 today: date = None,
+                 recheck_completed: bool = False) -> None:
+
+        if status_repository is None:
+            from data import CrawlStatusRepository
+            status_repository = CrawlStatusRepository()
+
+        self.__status_repository = status_repository
+        self.__today = today if today else date.today()
+        self.__recheck_completed = recheck_completed
+        self.__skipped: List[dict] = []
+        self.__directories_touched = 0
+
+    @property
+    def skipped(self) -> List[dict]:
+        return self.__skipped
+
+    @property
+    def directories_touched(self) -> int:
+        return self.__directories_touched
+
+    def plan(self, isilon_roots: Dict[int, str]) -> List[CrawlEngineParameters]:
+
+        result = []
+
+        for census_year, isilon_root in isilon_roots.items():
+            result.extend(self.plan_census_year(census_year, isilon_root))
+
+        return result
+
+    def plan_census_year(self, census_year: int, isilon_root: str) -> List[CrawlEngineParameters]:
+
+        result = []
+
+        history = {folder: to_timestamp(value) for folder, value in
+                   self.__status_repository.get_crawl_history(census_year).items()}
+
+        # with no history get_last_crawl returns the backfill starting point
+        history_start = min(((year, month) for month, year in history), default=None)
+        if history_start is None:
+            last_month, last_year = self.__status_repository.get_last_crawl(census_year)
+            history_start = (last_year, last_month)
+
+        census_dir = os.path.join(isilon_root, str(census_year))
+
+        if not os.path.isdir(census_dir):
+            return result
+
+        self.__directories_touched += 1
+
+        for year_name in sorted(os.listdir(census_dir)):
+
+            if not year_name.isdigit():
+                continue
+
+            scan_year = int(year_name)
+            year_dir = os.path.join(census_dir, year_name)
+
+            if scan_year < history_start[0]:
+                self.__skip(census_year, (None, scan_year), "before crawl history")
+                continue
+
+            month_folders = list(self.__month_folders(year_dir, scan_year))
+            crawlable = [scan_folder for scan_folder, _ in month_folders
+                         if (scan_folder[1], scan_folder[0]) > history_start]
+
+            if self.__year_unchanged(scan_year, year_dir, history, crawlable):
+                self.__skip(census_year, (None, scan_year), "year directory unchanged since last completed crawl")
+                continue
+
+            for scan_folder, month_dir in month_folders:
+
+                folder_key = (scan_folder[1], scan_folder[0])
+
+                if folder_key >= (self.__today.year, self.__today.month):
+                    self.__skip(census_year, scan_folder, "current month is still being filled")
+                    continue
+
+                if scan_folder not in history and folder_key <= history_start:
+                    self.__skip(census_year, scan_folder, "before crawl history")
+                    continue
+
+                completed_at = history.get(scan_folder)
+
+                if completed_at is not None and \
+                        (not self.__recheck_completed or not self.__modified_since(month_dir, completed_at)):
+                    self.__skip(census_year, scan_folder, "completed and unchanged")
+                    continue
+
+                result.append(CrawlEngineParameters(census_year, isilon_root, scan_folder))
+
+        return result
+
+    def __year_unchanged(self,
+                         scan_year: int,
+                         year_dir: str,
+                         history: Dict[Tuple[int, int], float],
+                         month_folders: List[Tuple[int, int]]) -> bool:
+
+        if self.__recheck_completed or scan_year >= self.__today.year:
+            return False
+
+        if any(scan_folder not in history for scan_folder in month_folders):
+            return False
+
+        completions = []
+
+        for (month, year), completed_at in history.items():
+            if year != scan_year:
+                continue
+            if completed_at is None:
+                return False
+            completions.append(completed_at)
+
+        # no month folder can have been added since the last completion in that year
+        return bool(completions) and not self.__modified_since(year_dir, max(completions))
+
+    def __month_folders(self, year_dir: str, scan_year: int):
+
+        self.__directories_touched += 1
+
+        for entry in sorted(os.scandir(year_dir), key=lambda e: e.name):
+
+            if not entry.is_dir():
+                continue
+
+            try:
+                folder_date = datetime.strptime(entry.name, "%m-%b-%y")
+            except ValueError:
+                continue
+
+            if folder_date.year != scan_year:
+                continue
+
+            yield (folder_date.month, folder_date.year), entry.path
+
+    def __modified_since(self, path: str, timestamp: float) -> bool:
+
+        self.__directories_touched += 1
+        return os.stat(path).st_mtime > timestamp
+
+    def __skip(self, census_year: int, scan_folder, reason: str) -> None:
+        self.__skipped.append({"census_year": census_year, "scan_folder": scan_folder, "reason": reason})
@@ -0,0 +1,251 @@
+import hashlib
+import heapq
+import math
+import threading
+
+from array import array
+from typing import Iterable, Iterator, Union
+
+# additions to a sorted index are held in a set until there are this many, then merged
+SORTED_MERGE_THRESHOLD = 4096
+
+# unsorted input is sorted this many identifiers at a time, then the runs are merged
+SORTED_RUN_SIZE = 65536
+
+
+class BloomFilter:
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+
+        capacity = max(capacity, 1)
+
+        self.__size = max(int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))), 8)
+        self.__hash_count = max(int(round(self.__size / capacity * math.log(2))), 1)
+        self.__bits = bytearray((self.__size + 7) // 8)
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.__bits)
+
+    @property
+    def hash_count(self) -> int:
+        return self.__hash_count
+
+    def __positions(self, value: Union[str, bytes]):
+
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+
+        # double hashing: k positions from one 128 bit digest
+        digest = hashlib.blake2b(value, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+
+        return ((first + i * second) % self.__size for i in range(self.__hash_count))
+
+    def add(self, value: Union[str, bytes]) -> None:
+        for position in self.__positions(value):
+            self.__bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: Union[str, bytes]) -> bool:
+        return all(self.__bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(value))
+
+
+class SortedIdentifiers:
+
+    """
+    Immutable, de-duplicated identifiers in ascending order, packed as UTF-8 into
+    one bytes blob with an array of end offsets: about len(identifier) + 8 bytes
+    each, where a str in a list or set costs 50+ bytes plus its pointer.
+    Lookups are a binary search over the offsets.
+    """
+
+    __slots__ = ("__blob", "__ends")
+
+    def __init__(self, blob: bytes = b"", ends: array = None) -> None:
+        self.__blob = blob
+        self.__ends = ends if ends is not None else array("Q")
+
+    @classmethod
+    def from_sorted(cls, values: Iterable[bytes]) -> "SortedIdentifiers":
+
+        """ values must already be in ascending order; repeats are dropped """
+
+        blob = bytearray()
+        ends = array("Q")
+        previous = None
+
+        for value in values:
+            if value != previous:
+                blob += value
+                ends.append(len(blob))
+                previous = value
+
+        return cls(bytes(blob), ends)
+
+    @classmethod
+    def build(cls, identifiers: Iterable[str], run_size: int = SORTED_RUN_SIZE) -> "SortedIdentifiers":
+
+        # only one run of identifiers is ever held as Python objects; each is packed once sorted
+        runs = []
+        chunk = []
+
+        for identifier in identifiers:
+            chunk.append(identifier.encode("utf-8"))
+            if len(chunk) == run_size:
+                runs.append(cls.from_sorted(sorted(chunk)))
+                chunk = []
+
+        if chunk or not runs:
+            runs.append(cls.from_sorted(sorted(chunk)))
+
+        return runs[0] if len(runs) == 1 else cls.from_sorted(heapq.merge(*runs))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.__blob) + self.__ends.itemsize * len(self.__ends)
+
+    def merge(self, values: Iterable[bytes]) -> "SortedIdentifiers":
+        return SortedIdentifiers.from_sorted(heapq.merge(self, sorted(values)))
+
+    def __contains__(self, value: bytes) -> bool:
+
+        blob = self.__blob
+        ends = self.__ends
+        low, high = 0, len(ends)
+
+        while low < high:
+            middle = (low + high) // 2
+            candidate = blob[ends[middle - 1] if middle else 0:ends[middle]]
+            if candidate < value:
+                low = middle + 1
+            elif candidate > value:
+                high = middle
+            else:
+                return True
+
+        return False
+
+    def __iter__(self) -> Iterator[bytes]:
+
+        blob = self.__blob
+        start = 0
+
+        for end in self.__ends:
+            yield blob[start:end]
+            start = end
+
+    def __len__(self) -> int:
+        return len(self.__ends)
+
+
+class KnownReelIndex:
+
+    """
+    In-memory index of every scan_identifier already in the reels table, so a reel
+    re-delivered into another month folder is skipped before its frames are listed.
+
+    Identifiers are built straight from the iterable (one streaming query when
+    loaded), never collected into a list first. By default they are packed into
+    SortedIdentifiers; sorted_storage=False keeps a hash set instead, which is
+    faster to probe but several times larger. An optional Bloom filter in front
+    answers most "never seen" lookups without a search; a Bloom hit is always
+    confirmed against the exact storage, so no new reel is ever skipped.
+    """
+
+    def __init__(self,
+                 identifiers: Iterable[str] = (),
+                 sorted_storage: bool = True,
+                 bloom_error_rate: float = None,
+                 expected_size: int = 0) -> None:
+
+        self.__sorted_storage = sorted_storage
+        self.__lock = threading.Lock()
+        self.__pending = set()
+        self.__set = None
+        self.__sorted = None
+        self.__bloom = None
+
+        if sorted_storage:
+            self.__sorted = SortedIdentifiers.build(identifiers)
+        else:
+            self.__set = set(identifiers)
+
+        if bloom_error_rate:
+            # filled from the stored identifiers, sized with headroom for the reels this run will add
+            stored = self.__sorted if self.__sorted is not None else self.__set
+            self.__bloom = BloomFilter(max(expected_size, len(stored)) * 2, bloom_error_rate)
+            for identifier in stored:
+                self.__bloom.add(identifier)
+
+    @classmethod
+    def load(cls, repository=None, sorted_storage: bool = True, bloom_error_rate: float = None) -> "KnownReelIndex":
+
+        # one streaming query over reels; rows arrive in itersize chunks
+        if repository is None:
+            from data import ReelRepository
+            repository = ReelRepository()
+
+        return cls(repository.iter_scan_identifiers(), sorted_storage, bloom_error_rate)
+
+    @property
+    def sorted_storage(self) -> bool:
+        return self.__sorted_storage
+
+    @property
+    def bloom_filter(self) -> BloomFilter:
+        return self.__bloom
+
+    @property
+    def size_bytes(self) -> int:
+
+        """ Bytes held by the sorted storage and Bloom filter (None for hash set storage) """
+
+        if self.__sorted is None:
+            return None
+
+        return self.__sorted.size_bytes + (self.__bloom.size_bytes if self.__bloom is not None else 0)
+
+    def add(self, identifier: str) -> None:
+        self.add_many([identifier])
+
+    def add_many(self, identifiers: Iterable[str]) -> None:
+
+        with self.__lock:
+
+            for identifier in identifiers:
+                if self.__bloom is not None:
+                    self.__bloom.add(identifier)
+                if self.__set is not None:
+                    self.__set.add(identifier)
+                else:
+                    self.__pending.add(identifier)
+
+            if len(self.__pending) >= SORTED_MERGE_THRESHOLD:
+                self.__sorted = self.__sorted.merge(identifier.encode("utf-8") for identifier in self.__pending)
+                self.__pending = set()
+
+    def __contains__(self, identifier: str) -> bool:
+
+        if self.__bloom is not None and identifier not in self.__bloom:
+            return False
+
+        if self.__set is not None:
+            return identifier in self.__set
+
+        if identifier in self.__pending:
+            return True
+
+        return identifier.encode("utf-8") in self.__sorted
+
+    def __len__(self) -> int:
+
+        # add_many runs on the ingest writer thread and may swap or grow these mid-count
+        with self.__lock:
+
+            if self.__set is not None:
+                return len(self.__set)
+
+            # an identifier committed again after a reset can be pending and stored at once
+            return len(self.__sorted) + sum(1 for identifier in self.__pending
+                                            if identifier.encode("utf-8") not in self.__sorted)
@@ -1,10 +1,16 @@
 import os
+import time
 
-from config import CrawlerSettings
-from datetime import date
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from logger import CrawlLogger
-from typing import List, Tuple
-from crawler.parameters import CrawlEngineParameters
+from typing import List
+from crawler.checkpoint import CrawlCheckpoint
+from crawler.filters import CrawlFilter
+from crawler.manifest import CrawlManifest
+from crawler.metrics import CrawlMetrics
+from crawler.models import ParsedImages
+from crawler.parameters import CrawlEngineParameters, STAT_INLINE, STAT_DEFERRED, STAT_NONE
 
 
 """
@@ -22,76 +28,402 @@ from crawler.parameters import CrawlEngineParameters
     #Done - Beef up logging to support production runtime (rolling file appender)
     #Done - Add reel batch size to allow smaller runs (quicker runs on multiple test scenarios)
     - Add Image Batch Size to allow full test runs across multiple scan efforts
+    #Done - Concurrent crawl mode (max_workers) to overlap NFS metadata round-trips across reels
+    #Done - Compiled exclusion/extension filters built once per crawl
+    #Done - Incremental crawl (manifest_dir) that skips reels whose directory fingerprint is unchanged (recorded by commit_reels)
+    #Done - Compact ParsedImages container in place of a dict per image
+    #Done - Deferred/batched stat stage (stat_mode) so listing and GETATTR latencies overlap
+    #Done - Per-phase latency metrics (metrics_dir) as Prometheus text and JSON snapshots
+    #Done - Resumable crawls (checkpoint_dir); consumers call commit_reels once reels are persisted
+    #Done - Cross-month dedupe against a known reel index (known_reels), kept current by commit_reels
     - 
 
 """
+
+STAT_CHUNK_SIZE = 256
+
+def image_stat_size(image_entry) -> int:
+    return image_entry.stat().st_size
+
+def stat_sizes(names: List[str], directory: str, dir_fd: int = None) -> List[int]:
+
+    if dir_fd is not None:
+        return [os.stat(name, dir_fd=dir_fd).st_size for name in names]
+
+    return [os.stat(os.path.join(directory, name)).st_size for name in names]
+
+
 class ReelCrawler:
 
     def __init__(self, 
                  prms: CrawlEngineParameters) -> None:
 
         self._prms = prms       
+        self._manifest = None
+        self._filter = None
+        self._checkpoint = None
+        self._stat_executor = None
+        self._metrics = None
+        self._known_reel_skips = []
+
+        if prms.resumable:
+            self._checkpoint = CrawlCheckpoint(os.path.join(prms.checkpoint_dir,
+                CrawlCheckpoint.checkpoint_file_name(prms.census_year, prms.normalized_folder)),
+                prms.census_year, prms.scan_folder)
+
+    @property
+    def manifest(self) -> CrawlManifest:
+        return self._manifest
+
+    @property
+    def crawl_filter(self) -> CrawlFilter:
+        return self._filter
+
+    @property
+    def checkpoint(self) -> CrawlCheckpoint:
+        return self._checkpoint
+
+    @property
+    def metrics(self) -> CrawlMetrics:
+        return self._metrics
+
+    @property
+    def known_reel_skips(self) -> List[str]:
+        return self._known_reel_skips
+
+    def commit_reels(self, reels) -> None:
+
+        if self._checkpoint is not None:
+            self._checkpoint.record(reels)
+
+        # a reel only joins the manifest once its rows are saved, so a crawl whose
+        # consumer dies before committing picks the reel up again on the next run
+        if self._manifest is not None:
+            for reel in reels:
+                self._manifest.record(reel["scan_identifier"], len(reel["parsed_images"]))
+            self._manifest.save()
+
+        if self._prms.known_reels is not None:
+            self._prms.known_reels.add_many(reel["scan_identifier"] for reel in reels)
 
     def run_crawl(self):
 
+        prms = self._prms
+        log = CrawlLogger()
+
+        self._filter = CrawlFilter.from_parameters(prms)
+
+        if prms.incremental:
+            self._manifest = CrawlManifest(os.path.join(prms.manifest_dir,
+                CrawlManifest.manifest_file_name(prms.census_year, prms.normalized_folder)))
+
+        if prms.metrics_dir:
+            self._metrics = CrawlMetrics(prms.metrics_dir, prms.census_year, prms.normalized_folder)
+
+        if prms.stat_mode == STAT_DEFERRED:
+            self._stat_executor = ThreadPoolExecutor(max_workers=prms.stat_workers,
+                                                     thread_name_prefix="image-stat")
+
+        try:
+            if prms.concurrent:
+                yield from self._run_concurrent_crawl(log)
+            else:
+                yield from self._run_serial_crawl(log)
+        finally:
+            if self._stat_executor is not None:
+                self._stat_executor.shutdown(wait=True, cancel_futures=True)
+                self._stat_executor = None
+            if self._metrics is not None:
+                self._metrics.flush()
+            log.log_system_message(f"Crawl filter counters: {self._filter.counters}")
+            if self._checkpoint is not None and self._checkpoint.skipped_reels:
+                log.log_system_message(f"Resumed from checkpoint {self._checkpoint.checkpoint_path}, "
+                                       f"skipped {len(self._checkpoint.skipped_reels)} committed reels: "
+                                       f"{self._checkpoint.skipped_reels}")
+            if self._known_reel_skips:
+                log.log_system_message(f"Skipped {len(self._known_reel_skips)} reels already ingested "
+                                       f"from another scan folder: {self._known_reel_skips}")
+            if self._manifest is not None:
+                self._manifest.save()
+                log.log_system_message(f"Skipped {self._manifest.skipped} unchanged reels per manifest: {self._manifest.manifest_path}")
+
+    def _run_serial_crawl(self, log):
+
         prms = self._prms
         reel_counter = 0
-        image_counter = 0
 
-        log = CrawlLogger()
+        for scan_entry in self._reel_entries(log):
+
+            try:
+                result, truncated = self._parse_reel(scan_entry)
+            except Exception as ex:
+                self._log_reel_error(log, scan_entry, ex)
+                continue
+
+            reel_counter = reel_counter + 1
+
+            yield from self._emit_reel(log, result, truncated)
+
+            if prms.reel_batch_size:
+                if prms.reel_batch_size == reel_counter:
+                    log.log_system_message(f"Exiting crawler per batch setting of {prms.reel_batch_size}")
+                    break
+
+    def _run_concurrent_crawl(self, log):
+
+        prms = self._prms
+        reel_counter = 0
+
+        # keep a bounded window of reels in flight so a month with thousands
+        # of reels doesn't queue every scandir up front
+        window = prms.max_workers * 2
+        entries = self._reel_entries(log)
+        in_flight = deque()
+
+        executor = ThreadPoolExecutor(max_workers=prms.max_workers,
+                                      thread_name_prefix="reel-crawler")
+
+        def submit_next() -> bool:
+            scan_entry = next(entries, None)
+            if scan_entry is None:
+                return False
+            in_flight.append((executor.submit(self._parse_reel, scan_entry), scan_entry))
+            return True
+
+        try:
+            while len(in_flight) < window and submit_next():
+                pass
+
+            while in_flight:
+
+                if prms.ordered_results:
+                    future, scan_entry = in_flight.popleft()
+                else:
+                    done, _ = wait([f for f, _ in in_flight], return_when=FIRST_COMPLETED)
+                    future, scan_entry = next(item for item in in_flight if item[0] in done)
+                    in_flight.remove((future, scan_entry))
+
+                try:
+                    result, truncated = future.result()
+                except Exception as ex:
+                    self._log_reel_error(log, scan_entry, ex)
+                    submit_next()
+                    continue
+
+                reel_counter = reel_counter + 1
+
+                yield from self._emit_reel(log, result, truncated)
+
+                if prms.reel_batch_size:
+                    if prms.reel_batch_size == reel_counter:
+                        log.log_system_message(f"Exiting crawler per batch setting of {prms.reel_batch_size}")
+                        break
+
+                submit_next()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _emit_reel(self, log, result, truncated: bool):
+
+        metrics = self._metrics
+
+        self._log_reel(log, result["reel"], truncated)
+
+        # a reel cut short by image_batch_size hasn't been fully seen yet
+        if truncated and self._manifest is not None:
+            self._manifest.discard(result["reel"]["scan_identifier"])
+
+        if metrics is None:
+            yield result
+        else:
+            # time suspended at the yield is time spent in the consumer
+            suspended = time.perf_counter()
+            yield result
+            metrics.consumer_wait_seconds.observe(time.perf_counter() - suspended)
+            metrics.reel_completed(len(result["reel"]["parsed_images"]))
+            metrics.maybe_flush()
+
+    def _reel_entries(self, log):
+
+        prms = self._prms
+        is_excluded = self._filter.is_excluded
+        checkpoint = self._checkpoint
+        metrics = self._metrics
+        known_reels = prms.known_reels
+
+        if metrics is not None:
+            is_excluded = self._timed(is_excluded, metrics.filter_seconds.inc)
 
         for scan_entry in os.scandir(prms.scan_dir):
 
             if scan_entry.name is not prms.scan_dir and scan_entry.name.find("frames") == -1:
 
                 try:
-                   
-                    if len([filter for filter in prms.exclusion_filters if
-                            filter == scan_entry.name]) == 0:
-
-                        reel = {"census_year": prms.census_year,"scan_identifier": scan_entry.name, 
-                                "scan_month": prms.scan_month,"scan_year": prms.scan_year, "scan_month_name": prms.scan_month_name,
-                                "reel_filepath": scan_entry.path,"parsed_images": []}
-
-                        result = {
-                            "census_year" : prms.census_year,
-                            "parsed_reel" : reel,
-                            "folder_crawled" : (prms.scan_month, prms.scan_year)
-                        }
-
-                        # parse the images
-                        images_path = os.path.join(scan_entry.path, "frames")
-
-                        for image_entry in os.scandir(images_path):
-                            if image_entry.is_file() and \
-                                    len([x for x in prms.extension_filters if image_entry.name.endswith(x)]) > 0:
-                                parsed_image = {"filename": str(image_entry.name), "filepath": image_entry.path,
-                                        "filesize": image_entry.stat().st_size}
-
-                                reel["parsed_images"].append(parsed_image)
-                                image_counter = image_counter + 1
-
-                                if prms.image_batch_size:
-                                    if prms.image_batch_size == image_counter:
-                                        image_counter = 0
-                                        log.log_system_message(f"Stopping parsing of images for {reel['scan_identifier']} per image batch setting of: {prms.image_batch_size}")         
-                                        break
-
-                        reel_counter = reel_counter + 1
-                        
-                        #append the reel
-                        result["reel"] = reel
-                        
-                        log.log_reel_parse(reel)
-                        log.log_total_images_parsed(len(reel["parsed_images"]), reel["scan_identifier"])
-                        yield result
-
-                        if prms.reel_batch_size:
-                            if prms.reel_batch_size == reel_counter:
-                                log.log_system_message(f"Exiting crawler per batch setting of {prms.reel_batch_size}")
-                                break
+
+                    if not is_excluded(scan_entry.name):
+
+                        # already ingested under another month folder; never list its frames
+                        if known_reels is not None and scan_entry.name in known_reels:
+                            self._known_reel_skips.append(scan_entry.name)
+                            continue
+
+                        if checkpoint is not None and checkpoint.is_committed(scan_entry.name):
+                            checkpoint.skip(scan_entry.name)
+                            continue
+
+                        if self._manifest is not None and \
+                                not self._manifest.observe(scan_entry.name, scan_entry.path):
+                            continue
+
+                        yield scan_entry
 
                 except Exception as ex:
-                    exmessage = f'Error in reel parsing operation at location: {scan_entry.path}'
-                    exmessage += f'Error: {ex}'
-                    log.log_error(exmessage)
+                    self._log_reel_error(log, scan_entry, ex)
+
+    def _parse_reel(self, scan_entry):
+
+        prms = self._prms
+        metrics = self._metrics
+        image_batch_size = prms.image_batch_size
+        is_image = self._filter.is_image
+        stat_size = image_stat_size
+        stat_chunk = stat_sizes
+        image_counter = 0
+        rejected_counter = 0
+        truncated = False
+
+        reel = {"census_year": prms.census_year,"scan_identifier": scan_entry.name, 
+                "scan_month": prms.scan_month,"scan_year": prms.scan_year, "scan_month_name": prms.scan_month_name,
+                "reel_filepath": scan_entry.path,"parsed_images": None}
+
+        result = {
+            "census_year" : prms.census_year,
+            "parsed_reel" : reel,
+            "folder_crawled" : (prms.scan_month, prms.scan_year)
+        }
+
+        # parse the images
+        images_path = os.path.join(scan_entry.path, "frames")
+
+        stat_inline = prms.stat_mode == STAT_INLINE
+        stat_executor = self._stat_executor
+
+        parsed_images = ParsedImages(images_path, sizes_collected=prms.stat_mode != STAT_NONE)
+        reel["parsed_images"] = parsed_images
+
+        if metrics is not None:
+            filter_seconds = []
+            stat_seconds = []
+            is_image = self._timed(is_image, filter_seconds.append)
+            stat_size = self._timed(stat_size, stat_seconds.append)
+            stat_chunk = self._timed_chunk(stat_chunk, metrics)
+            listing_started = time.perf_counter()
+
+        # deferred/none modes only collect names here; sizes are looked up in
+        # chunks on the stat pool while the listing carries on
+        names = []
+        submitted = 0
+        stat_futures = []
+        dir_fd = None
+
+        try:
+            for image_entry in os.scandir(images_path):
+                if image_entry.is_file() and is_image(image_entry.name):
+                    if stat_inline:
+                        parsed_images.append(image_entry.name, stat_size(image_entry))
+                    else:
+                        names.append(image_entry.name)
+
+                        if stat_executor is not None and len(names) - submitted == STAT_CHUNK_SIZE:
+                            if dir_fd is None:
+                                dir_fd = self._open_dir_fd(images_path)
+                            stat_futures.append(stat_executor.submit(stat_chunk, names[submitted:], images_path, dir_fd))
+                            submitted = len(names)
+
+                    image_counter = image_counter + 1
+
+                    if image_batch_size:
+                        if image_batch_size == image_counter:
+                            truncated = True
+                            break
+                else:
+                    rejected_counter = rejected_counter + 1
+
+            if metrics is not None:
+                listing_seconds = time.perf_counter() - listing_started
+                metrics.filter_seconds.inc(sum(filter_seconds))
+                metrics.image_stat_seconds.observe_many(stat_seconds)
+                metrics.reel_scandir_seconds.observe(listing_seconds - sum(filter_seconds) - sum(stat_seconds))
+
+            if not stat_inline:
+                if stat_executor is not None:
+                    if submitted < len(names):
+                        if dir_fd is None:
+                            dir_fd = self._open_dir_fd(images_path)
+                        stat_futures.append(stat_executor.submit(stat_chunk, names[submitted:], images_path, dir_fd))
+
+                    sizes = []
+                    for future in stat_futures:
+                        sizes.extend(future.result())
+
+                    parsed_images.extend(names, sizes)
+                else:
+                    parsed_images.extend(names)
+        finally:
+            if dir_fd is not None:
+                # stat workers may still hold the fd if the listing failed part way
+                wait(stat_futures)
+                os.close(dir_fd)
+
+        self._filter.record_images(image_counter, rejected_counter)
+
+        #append the reel
+        result["reel"] = reel
+
+        return result, truncated
+
+    def _timed(self, function, record):
+
+        def timed(*args):
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                record(time.perf_counter() - started)
+
+        return timed
+
+    def _timed_chunk(self, function, metrics):
+
+        def timed(names, *args):
+            started = time.perf_counter()
+            result = function(names, *args)
+            if names:
+                metrics.image_stat_seconds.observe((time.perf_counter() - started) / len(names), len(names))
+            return result
+
+        return timed
+
+    def _open_dir_fd(self, path: str):
+
+        if os.stat in os.supports_dir_fd:
+            return os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+
+        return None
+
+    def _log_reel(self, log, reel, truncated: bool) -> None:
+
+        if truncated:
+            log.log_system_message(f"Stopping parsing of images for {reel['scan_identifier']} per image batch setting of: {self._prms.image_batch_size}")
+
+        log.log_reel_parse(reel)
+        log.log_total_images_parsed(len(reel["parsed_images"]), reel["scan_identifier"])
+
+    def _log_reel_error(self, log, scan_entry, ex) -> None:
+
+        exmessage = f'Error in reel parsing operation at location: {scan_entry.path}'
+        exmessage += f'Error: {ex}'
+        log.log_error(exmessage)
+
+        if self._metrics is not None:
+            self._metrics.reel_errors_total.inc()
@@ -0,0 +1,381 @@
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+
+from datetime import datetime
+from itertools import repeat
+from typing import Iterator, List, Tuple
+from crawler.models import ParsedImages
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS reels (
+        scan_identifier TEXT PRIMARY KEY,
+        census_year INTEGER NOT NULL,
+        scan_month INTEGER NOT NULL,
+        scan_month_name TEXT NOT NULL,
+        scan_year INTEGER NOT NULL,
+        reel_filepath TEXT,
+        frames_dir TEXT NOT NULL,
+        sizes_collected INTEGER NOT NULL,
+        synced INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS images (
+        scan_identifier TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        filesize INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS images_scan_identifier_idx ON images (scan_identifier);
+    CREATE TABLE IF NOT EXISTS crawl_operations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_crawled TEXT NOT NULL,
+        reels_parsed INTEGER NOT NULL,
+        images_parsed INTEGER NOT NULL,
+        crawl_time TEXT NOT NULL,
+        completed INTEGER NOT NULL DEFAULT 0,
+        synced INTEGER NOT NULL DEFAULT 0
+    );
+"""
+
+# every scan_identifier in Postgres with its scan folder, written while Postgres is reachable
+KNOWN_REELS_SNAPSHOT = "known_reels.snapshot.tsv"
+
+
+class CrawlStagingStore:
+
+    """
+    On-disk SQLite staging area for one census year and scan folder.
+
+    Quacks like ReelRepository.add_reels_and_images, so ReelIngestPipeline can
+    write to it at local disk speed while Postgres is slow or unreachable.
+    sync_staging_store() later bulk loads it into reels/images/crawl_operations.
+    Staging a reel twice is a no-op.
+    """
+
+    def __init__(self, staging_path: str, census_year: int, scan_folder: Tuple[int, int]) -> None:
+
+        self.__staging_path = staging_path
+        self.__census_year = census_year
+        self.__scan_folder = tuple(scan_folder)
+        self.__lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(staging_path) or ".", exist_ok=True)
+
+        # written from the ingest writer thread, read from the crawl thread; the lock serialises both
+        self.__connection = sqlite3.connect(staging_path, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+
+        with self.__connection:
+            self.__connection.executescript(SCHEMA)
+            self.__connection.executemany("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                                          [("census_year", str(census_year)),
+                                           ("scan_month", str(self.__scan_folder[0])),
+                                           ("scan_year", str(self.__scan_folder[1]))])
+
+    @staticmethod
+    def staging_file_name(census_year: int, normalized_folder: str) -> str:
+        return f"{census_year}_{normalized_folder}.staging.sqlite3"
+
+    @classmethod
+    def open(cls, staging_path: str) -> "CrawlStagingStore":
+
+        # census year and scan folder come back from the file's own meta table
+        with sqlite3.connect(staging_path) as connection:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+
+        return cls(staging_path, int(meta["census_year"]), (int(meta["scan_month"]), int(meta["scan_year"])))
+
+    @property
+    def staging_path(self) -> str:
+        return self.__staging_path
+
+    @property
+    def census_year(self) -> int:
+        return self.__census_year
+
+    @property
+    def scan_folder(self) -> Tuple[int, int]:
+        return self.__scan_folder
+
+    def staged_identifiers(self) -> List[str]:
+
+        with self.__lock:
+            return [row[0] for row in self.__connection.execute("SELECT scan_identifier FROM reels")]
+
+    def add_reels_and_images(self, reels) -> None:
+
+        reel_rows = []
+        image_rows = []
+
+        for reel in reels:
+
+            images = reel["parsed_images"] or []
+            frames_dir = getattr(images, "directory", None) or os.path.join(reel["reel_filepath"], "frames")
+            sizes_collected = getattr(images, "sizes_collected", True)
+
+            reel_rows.append((reel["scan_identifier"], reel["census_year"], reel["scan_month"],
+                              reel["scan_month_name"], reel["scan_year"], reel.get("reel_filepath"),
+                              frames_dir, int(sizes_collected)))
+
+            if isinstance(images, ParsedImages):
+                filesizes = images.filesizes if sizes_collected else repeat(None)
+                image_rows.extend(zip(repeat(reel["scan_identifier"]), images.filenames, filesizes))
+            else:
+                image_rows.extend((reel["scan_identifier"], image["filename"], image["filesize"]) for image in images)
+
+        with self.__lock, self.__connection:
+
+            already_staged = self.__existing([row[0] for row in reel_rows])
+
+            self.__connection.executemany("""
+                INSERT INTO reels (scan_identifier, census_year, scan_month, scan_month_name, scan_year,
+                                   reel_filepath, frames_dir, sizes_collected)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [row for row in reel_rows if row[0] not in already_staged])
+
+            self.__connection.executemany("INSERT INTO images (scan_identifier, filename, filesize) VALUES (?, ?, ?)",
+                                          [row for row in image_rows if row[0] not in already_staged])
+
+    def add_crawl_operation(self, date_crawled: str, reels_parsed: int, images_parsed: int,
+                            crawl_time: str, completed: bool = True) -> None:
+
+        with self.__lock, self.__connection:
+            self.__connection.execute("""
+                INSERT INTO crawl_operations (date_crawled, reels_parsed, images_parsed, crawl_time, completed)
+                VALUES (?, ?, ?, ?, ?)
+            """, (date_crawled, reels_parsed, images_parsed, crawl_time, int(completed)))
+
+    def iter_unsynced_reels(self, batch_size: int) -> Iterator[List[dict]]:
+
+        """ Batches of reel dicts shaped like the crawler's, with ParsedImages rebuilt from the staged rows """
+
+        last_identifier = ""
+
+        while True:
+
+            with self.__lock:
+                rows = self.__connection.execute("""
+                    SELECT scan_identifier, census_year, scan_month, scan_month_name, scan_year,
+                           reel_filepath, frames_dir, sizes_collected
+                    FROM reels
+                    WHERE synced = 0 AND scan_identifier > ?
+                    ORDER BY scan_identifier
+                    LIMIT ?
+                """, (last_identifier, batch_size)).fetchall()
+
+            if not rows:
+                return
+
+            batch = []
+
+            for identifier, census_year, month, month_name, year, reel_filepath, frames_dir, sizes_collected in rows:
+
+                images = ParsedImages(frames_dir, bool(sizes_collected))
+
+                with self.__lock:
+                    image_rows = self.__connection.execute(
+                        "SELECT filename, filesize FROM images WHERE scan_identifier = ? ORDER BY rowid",
+                        (identifier,)).fetchall()
+
+                if image_rows:
+                    filenames, filesizes = zip(*image_rows)
+                    images.extend(list(filenames), filesizes if sizes_collected else None)
+
+                batch.append({"census_year": census_year, "scan_identifier": identifier,
+                              "scan_month": month, "scan_year": year, "scan_month_name": month_name,
+                              "reel_filepath": reel_filepath, "parsed_images": images})
+
+            last_identifier = rows[-1][0]
+
+            yield batch
+
+    def mark_reels_synced(self, identifiers: List[str]) -> None:
+
+        with self.__lock, self.__connection:
+            self.__connection.executemany("UPDATE reels SET synced = 1 WHERE scan_identifier = ?",
+                                          [(identifier,) for identifier in identifiers])
+
+    def unsynced_operations(self) -> List[tuple]:
+
+        with self.__lock:
+            return self.__connection.execute("""
+                SELECT id, date_crawled, reels_parsed, images_parsed, crawl_time, completed
+                FROM crawl_operations WHERE synced = 0 ORDER BY id
+            """).fetchall()
+
+    def mark_operation_synced(self, operation_id: int) -> None:
+
+        with self.__lock, self.__connection:
+            self.__connection.execute("UPDATE crawl_operations SET synced = 1 WHERE id = ?", (operation_id,))
+
+    def pending_counts(self) -> dict:
+
+        with self.__lock:
+            reels = self.__connection.execute("SELECT count(*) FROM reels WHERE synced = 0").fetchone()[0]
+            operations = self.__connection.execute("SELECT count(*) FROM crawl_operations WHERE synced = 0").fetchone()[0]
+
+        return {"reels": reels, "crawl_operations": operations}
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+    def __existing(self, identifiers: List[str]) -> set:
+
+        existing = set()
+
+        # sqlite caps bound parameters per statement
+        for start in range(0, len(identifiers), 500):
+            chunk = identifiers[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            existing.update(row[0] for row in self.__connection.execute(
+                f"SELECT scan_identifier FROM reels WHERE scan_identifier IN ({placeholders})", chunk))
+
+        return existing
+
+
+def write_known_reels_snapshot(staging_dir: str, reel_repository=None) -> int:
+
+    """
+    Streams every reel's census year, scan folder and scan_identifier out of Postgres
+    into the staging directory, so staged crawls can filter against it offline.
+    Returns the number of reels written.
+    """
+
+    if reel_repository is None:
+        from data import ReelRepository
+        reel_repository = ReelRepository()
+
+    os.makedirs(staging_dir, exist_ok=True)
+    snapshot_path = os.path.join(staging_dir, KNOWN_REELS_SNAPSHOT)
+    written = 0
+
+    # written aside and swapped in, so a crawl never reads half a snapshot
+    with open(snapshot_path + ".tmp", "w", encoding="utf-8") as f:
+        for census_year, month, year, scan_identifier in reel_repository.iter_scan_folder_identifiers():
+            f.write(f"{census_year}\t{month}\t{year}\t{scan_identifier}\n")
+            written = written + 1
+
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+
+    return written
+
+
+def iter_known_reels_snapshot(staging_dir: str) -> Iterator[Tuple[int, int, int, str]]:
+
+    """ (census_year, month, year, scan_identifier) rows; nothing if no snapshot was taken """
+
+    snapshot_path = os.path.join(staging_dir, KNOWN_REELS_SNAPSHOT)
+
+    if not os.path.exists(snapshot_path):
+        return
+
+    with open(snapshot_path, encoding="utf-8") as f:
+        for line in f:
+            census_year, month, year, scan_identifier = line.rstrip("\n").split("\t", 3)
+            yield int(census_year), int(month), int(year), scan_identifier
+
+
+def staged_exclusion_filters(store: CrawlStagingStore, staging_dir: str) -> List[str]:
+
+    """ The staging-mode stand-in for get_filters_by_scan: the snapshot's reels for the folder plus the staged ones """
+
+    month, year = store.scan_folder
+
+    filters = [scan_identifier for census_year, snapshot_month, snapshot_year, scan_identifier
+               in iter_known_reels_snapshot(staging_dir)
+               if (census_year, snapshot_month, snapshot_year) == (store.census_year, month, year)]
+
+    return filters + store.staged_identifiers()
+
+
+def sync_staging_store(store: CrawlStagingStore,
+                       reel_repository=None,
+                       status_repository=None,
+                       batch_size: int = 500) -> dict:
+
+    """
+    Loads everything staged but not yet synced into Postgres through the repositories.
+
+    Safe to re-run: reels already in reels for the scan folder are skipped rather than
+    inserted twice, so a sync that died between the Postgres commit and marking the
+    local rows synced just picks up where it left off.
+    """
+
+    if reel_repository is None or status_repository is None:
+        from data import CrawlStatusRepository, ReelRepository
+        reel_repository = reel_repository or ReelRepository()
+        status_repository = status_repository or CrawlStatusRepository()
+
+    census_year = store.census_year
+    month, year = store.scan_folder
+
+    existing = set(reel_repository.get_filters_by_scan(month, year, census_year))
+
+    reels_synced = 0
+    images_synced = 0
+    reels_skipped = 0
+
+    for batch in store.iter_unsynced_reels(batch_size):
+
+        new_reels = [reel for reel in batch if reel["scan_identifier"] not in existing]
+
+        if new_reels:
+            reel_repository.add_reels_and_images(new_reels)
+            existing.update(reel["scan_identifier"] for reel in new_reels)
+
+        store.mark_reels_synced([reel["scan_identifier"] for reel in batch])
+
+        reels_synced = reels_synced + len(new_reels)
+        images_synced = images_synced + sum(len(reel["parsed_images"]) for reel in new_reels)
+        reels_skipped = reels_skipped + len(batch) - len(new_reels)
+
+    operations_synced = 0
+
+    for operation_id, date_crawled, reels_parsed, images_parsed, crawl_time, completed in store.unsynced_operations():
+
+        status_repository.add_crawl_operation(census_year, month, year, date_crawled,
+                                              reels_parsed, images_parsed, crawl_time)
+        if completed:
+            status_repository.mark_crawl_as_completed(census_year, month, year)
+
+        store.mark_operation_synced(operation_id)
+        operations_synced = operations_synced + 1
+
+    return {
+        "staging_path": store.staging_path,
+        "census_year": census_year,
+        "scan_folder": (month, year),
+        "reels_synced": reels_synced,
+        "images_synced": images_synced,
+        "reels_skipped": reels_skipped,
+        "crawl_operations_synced": operations_synced,
+        "date_synced": str(datetime.now())
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Bulk load staged crawl results into Postgres")
+    parser.add_argument("--staging-dir", required=True)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--snapshot-only", action="store_true",
+                        help="only refresh the known reels snapshot staged crawls filter against")
+    args = parser.parse_args()
+
+    if not args.snapshot_only:
+        for staging_path in sorted(glob.glob(os.path.join(args.staging_dir, "*.staging.sqlite3"))):
+            store = CrawlStagingStore.open(staging_path)
+            try:
+                print(sync_staging_store(store, batch_size=args.batch_size))
+            finally:
+                store.close()
+
+    # taken after the sync so it includes what was just loaded
+    print(f"Known reels snapshot: {write_known_reels_snapshot(args.staging_dir)} reels")
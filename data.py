@@ -1,10 +1,25 @@
+import os
+import re
 import socket
+import threading
+import copy
+import time
+import weakref
 from ast import List
+from tempfile import SpooledTemporaryFile
 from config import DatabaseSettings
 from datetime import datetime
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.errorcodes import INVALID_SQL_STATEMENT_NAME
+from psycopg2.extensions import STATUS_READY
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from psycopg2 import sql as pgsql
 from psycopg2.extras import execute_values
+from instrumentation import query_instrumentation
+from rows import ROW_DICT, ROW_NAMEDTUPLE, ROW_SCALAR, ROW_TUPLE, fetch_all, fetch_one, iter_rows
+from collections import OrderedDict
 from contextlib import contextmanager
+from itertools import chain
+from uuid import uuid4
 
 
 db_settings = DatabaseSettings()
@@ -16,43 +31,715 @@ PG_PORT = db_settings.port
 PG_SCHEMA = db_settings.schema
 
 DEFAULT_EXECUTION_PAGE_SIZE=1000
+DEFAULT_REEL_INSERT_BATCH_SIZE = 500
+DEFAULT_STREAMING_ITERSIZE = 5000
 
-# pool defined with 15 live connections
-connection_pool = SimpleConnectionPool(1, 15,  user=PG_USER, database=PG_DATABASE,
-                                    host=PG_HOST, port=PG_PORT, options=f"-c search_path={PG_SCHEMA}")
+# image rows are spooled in memory up to this size before COPY, then to disk
+DEFAULT_COPY_SPOOL_SIZE = 16 * 1024 * 1024
+
+IMAGE_LOAD_COPY = "copy"
+IMAGE_LOAD_VALUES = "values"
+
+# explicit column lists rather than SELECT *, so rows map by name whatever the table's column order
+REEL_COLUMNS = """id, census_year, month_name_scanned, month_number_scanned, year_scanned,
+            scan_identifier, snowball_export_date, move_flag, target_snowball"""
+
+# once schema.PartitionMigration has run, reels and images are range partitioned on
+# (census_year, year_scanned, month_number_scanned) and images carries its reel's scan key
+SCAN_PARTITION_KEY = ("census_year", "year_scanned", "month_number_scanned")
+
+IMAGE_COLUMNS = ("reel_id", "filename", "filesize", "image_filepath")
+
+DEFAULT_POOL_MIN_CONNECTIONS = 1
+DEFAULT_POOL_MAX_CONNECTIONS = 15
+
+# connections idle longer than this are pinged before reuse, older than max age are replaced
+DEFAULT_POOL_HEALTH_CHECK_INTERVAL = 60.0
+DEFAULT_POOL_MAX_CONNECTION_AGE = 3600.0
+
+
+class ConnectionPool:
+
+    """
+    Thread-safe pool that opens nothing until the first getconn().
+
+    Callers block (up to timeout) for a free slot instead of getting a PoolError,
+    stale connections are validated or recycled on checkout, and connections are
+    handed back rolled back so no transaction leaks into the next caller.
+
+    A forked child starts from an empty pool: its lock, slots and counters are
+    reset by an os.register_at_fork hook, and the connections inherited from the
+    parent are left open (and referenced) so the child never closes the parent's
+    sessions.
+    """
+
+    # every pool in the process, so the fork hook can reset them
+    _instances = weakref.WeakSet()
+
+    # pools inherited across fork; kept alive so their connections are never finalised in the child
+    _inherited_pools = []
+
+    def __init__(self,
+                 minconn: int,
+                 maxconn: int,
+                 health_check_interval: float = DEFAULT_POOL_HEALTH_CHECK_INTERVAL,
+                 max_connection_age: float = DEFAULT_POOL_MAX_CONNECTION_AGE,
+                 **connect_kwargs) -> None:
+
+        self.__minconn = minconn
+        self.__maxconn = maxconn
+        self.__health_check_interval = health_check_interval
+        self.__max_connection_age = max_connection_age
+        self.__connect_kwargs = connect_kwargs
+        self.__pool = None
+
+        self.__reset()
+
+        ConnectionPool._instances.add(self)
+
+    @classmethod
+    def _after_fork_in_child(cls) -> None:
+
+        for pool in list(cls._instances):
+            pool.__reset()
+
+    def __reset(self) -> None:
+
+        # in a forked child the lock may have been held by a parent thread that no longer exists
+        if self.__pool is not None:
+            ConnectionPool._inherited_pools.append(self.__pool)
+
+        self.__lock = threading.Lock()
+        self.__slots = threading.BoundedSemaphore(self.__maxconn)
+        self.__pool = None
+        self.__created = {}
+        self.__last_used = {}
+
+        self.__checkouts = 0
+        self.__in_use = 0
+        self.__peak_in_use = 0
+        self.__wait_seconds = 0.0
+        self.__max_wait_seconds = 0.0
+        self.__connections_opened = 0
+        self.__connections_recycled = 0
+        self.__health_check_failures = 0
+
+    @property
+    def maxconn(self) -> int:
+        return self.__maxconn
+
+    @property
+    def in_use(self) -> int:
+        return self.__in_use
+
+    @property
+    def utilisation(self) -> float:
+        return self.__in_use / self.__maxconn
+
+    def stats(self) -> dict:
+
+        with self.__lock:
+            return {
+                "initialised": self.__pool is not None,
+                "maxconn": self.__maxconn,
+                "in_use": self.__in_use,
+                "peak_in_use": self.__peak_in_use,
+                "utilisation": self.__in_use / self.__maxconn,
+                "checkouts": self.__checkouts,
+                "wait_seconds_total": self.__wait_seconds,
+                "wait_seconds_max": self.__max_wait_seconds,
+                "wait_seconds_mean": self.__wait_seconds / self.__checkouts if self.__checkouts else 0.0,
+                "connections_opened": self.__connections_opened,
+                "connections_recycled": self.__connections_recycled,
+                "health_check_failures": self.__health_check_failures
+            }
+
+    def getconn(self, timeout: float = None):
+
+        started = time.perf_counter()
+
+        if not self.__slots.acquire(timeout=timeout if timeout is not None else -1):
+            raise PoolError(f"No connection available within {timeout}s ({self.__maxconn} in use)")
+
+        try:
+            con = self.__checkout()
+        except Exception:
+            self.__slots.release()
+            raise
+
+        waited = time.perf_counter() - started
+
+        with self.__lock:
+            self.__checkouts += 1
+            self.__in_use += 1
+            self.__peak_in_use = max(self.__peak_in_use, self.__in_use)
+            self.__wait_seconds += waited
+            self.__max_wait_seconds = max(self.__max_wait_seconds, waited)
+
+        return con
+
+    def putconn(self, con, close: bool = False) -> None:
+
+        try:
+            if not close and not con.closed:
+                try:
+                    # never hand a half finished transaction to the next caller
+                    if con.status != STATUS_READY:
+                        con.rollback()
+                except Exception:
+                    close = True
+
+            with self.__lock:
+                if close or con.closed:
+                    self.__forget(con)
+                else:
+                    self.__last_used[id(con)] = time.monotonic()
+
+                self.__in_use -= 1
+                pool = self.__pool
+
+            if pool is not None:
+                pool.putconn(con, close=close or bool(con.closed))
+        finally:
+            self.__slots.release()
+
+    def closeall(self) -> None:
+
+        with self.__lock:
+            if self.__pool is not None and not self.__pool.closed:
+                self.__pool.closeall()
+            self.__pool = None
+            self.__created.clear()
+            self.__last_used.clear()
+
+    def __ensure_pool(self):
+
+        with self.__lock:
+
+            if self.__pool is None:
+                self.__pool = ThreadedConnectionPool(self.__minconn, self.__maxconn, **self.__connect_kwargs)
+
+            return self.__pool
+
+    def __checkout(self):
+
+        pool = self.__ensure_pool()
+
+        while True:
+
+            con = pool.getconn()
+            now = time.monotonic()
+
+            with self.__lock:
+                if id(con) not in self.__created:
+                    self.__created[id(con)] = now
+                    self.__last_used[id(con)] = now
+                    self.__connections_opened += 1
+                    return con
+
+                created = self.__created[id(con)]
+                last_used = self.__last_used.get(id(con), created)
+
+            if con.closed or now - created > self.__max_connection_age:
+                self.__discard(pool, con, recycled=True)
+                continue
+
+            if now - last_used > self.__health_check_interval and not self.__healthy(con):
+                self.__discard(pool, con, recycled=False)
+                continue
+
+            return con
+
+    def __healthy(self, con) -> bool:
+
+        try:
+            with con.cursor() as cur:
+                cur.execute("SELECT 1")
+            con.rollback()
+            return True
+        except Exception:
+            return False
+
+    def __discard(self, pool, con, recycled: bool) -> None:
+
+        with self.__lock:
+            self.__forget(con)
+            if recycled:
+                self.__connections_recycled += 1
+            else:
+                self.__health_check_failures += 1
+
+        pool.putconn(con, close=True)
+
+    def __forget(self, con) -> None:
+        self.__created.pop(id(con), None)
+        self.__last_used.pop(id(con), None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ConnectionPool._after_fork_in_child)
+
+
+connection_pool = ConnectionPool(DEFAULT_POOL_MIN_CONNECTIONS, DEFAULT_POOL_MAX_CONNECTIONS,
+                                 user=PG_USER, database=PG_DATABASE, host=PG_HOST, port=PG_PORT,
+                                 options=f"-c search_path={PG_SCHEMA}")
 
 
 @contextmanager
 def getcursor():
+
+    # commits when the block completes, rolls back when it raises
+    cursor_factory = query_instrumentation.cursor_factory
+    started = time.perf_counter()
     con = connection_pool.getconn()
     try:
-        yield con.cursor()
+        with con.cursor(cursor_factory=cursor_factory) as cur:
+            if cursor_factory is not None:
+                cur.pool_wait = time.perf_counter() - started
+            yield cur
+        con.commit()
+    except BaseException:
+        if not con.closed:
+            con.rollback()
+        raise
     finally:
+        connection_pool.putconn(con)
+
+
+@contextmanager
+def getstreamingcursor(name: str, itersize: int = DEFAULT_STREAMING_ITERSIZE):
+
+    # named cursors live server side; rows arrive itersize at a time as they're iterated
+    cursor_factory = query_instrumentation.cursor_factory
+    started = time.perf_counter()
+    con = connection_pool.getconn()
+    try:
+        cur = con.cursor(name=f"{name}_{uuid4().hex}", cursor_factory=cursor_factory)
+        cur.itersize = itersize
+        if cursor_factory is not None:
+            cur.pool_wait = time.perf_counter() - started
+        try:
+            yield cur
+        finally:
+            if not con.closed:
+                cur.close()
         con.commit()
+    except BaseException:
+        if not con.closed:
+            con.rollback()
+        raise
+    finally:
         connection_pool.putconn(con)
 
 
+# statement names already PREPAREd on each live connection; entries go with the connection
+_prepared_statements = weakref.WeakKeyDictionary()
+_prepared_statements_lock = threading.Lock()
+
+# off runs the same SQL through a plain execute (used by benchmarks/prepared_benchmark.py)
+PREPARED_STATEMENTS_ENABLED = True
+
+
+def numbered_placeholders(sql: str) -> str:
+
+    """
+    Rewrites psycopg2 style SQL for PREPARE: each %s becomes $1, $2, ... and %% a literal %.
+    Any other % is rejected, as cur.execute would reject it once parameters are bound.
+    """
+
+    parts = []
+    count = 0
+
+    for token in re.split(r"(%%|%s|%)", sql):
+        if token == "%s":
+            count = count + 1
+            parts.append(f"${count}")
+        elif token == "%%":
+            parts.append("%")
+        elif token == "%":
+            raise ValueError(f"Unsupported % in prepared statement (write a literal % as %%): {sql}")
+        else:
+            parts.append(token)
+
+    return "".join(parts)
+
+
+def execute_prepared(cur, name: str, sql: str, params: tuple) -> None:
+
+    """
+    Runs sql (written with %s placeholders, %% for a literal %) as a server side
+    prepared statement: PREPARE once per connection, then EXECUTE with the bound parameters
+    """
+
+    if not PREPARED_STATEMENTS_ENABLED:
+        cur.execute(sql, params)
+        return
+
+    con = cur.connection
+
+    with _prepared_statements_lock:
+        prepared = _prepared_statements.setdefault(con, set())
+
+    # a connection is only checked out to one thread at a time, so the set itself needs no lock
+    if name not in prepared:
+        cur.execute(f"PREPARE {name} AS " + numbered_placeholders(sql))
+        prepared.add(name)
+
+    try:
+        cur.execute(f"EXECUTE {name} (" + ", ".join(["%s"] * len(params)) + ")", params)
+    except Exception as e:
+        # the server lost the statement (e.g. DISCARD ALL); prepare again on the next call
+        if getattr(e, "pgcode", None) == INVALID_SQL_STATEMENT_NAME:
+            prepared.clear()
+        raise
+
+
+def image_rows(reel_id: int, images, scan_key: tuple):
+
+    # ParsedImages builds its own tuples without materialising an ImageRecord per frame
+    if hasattr(images, "rows"):
+        return images.rows(reel_id, scan_key)
+
+    return ((reel_id, str(image["filename"]), int(image["filesize"]), str(image["filepath"])) + scan_key
+            for image in images)
+
+
+def reel_scan_key(reel) -> tuple:
+    return (reel["census_year"], reel["scan_year"], reel["scan_month"])
+
+
+def scan_partition_name(table: str, census_year: int, year_scanned: int, month_scanned: int) -> str:
+    return f"{table}_{census_year}_{year_scanned}_{month_scanned:02d}"
+
+
+_partitioned_schema = None
+_known_partitions = set()
+
+
+def schema_is_partitioned(cur) -> bool:
+
+    global _partitioned_schema
+
+    if _partitioned_schema is None:
+        cur.execute("""
+            SELECT count(*) FROM pg_partitioned_table
+            WHERE partrelid = to_regclass('reels') OR partrelid = to_regclass('images')
+        """)
+        _partitioned_schema = cur.fetchone()[0] == 2
+
+    return _partitioned_schema
+
+
+def ensure_scan_partitions(scan_keys) -> None:
+
+    """ Creates the reels/images partitions for each (census_year, year_scanned, month_scanned) """
+
+    missing = [key for key in set(scan_keys) if key not in _known_partitions]
+
+    if not missing:
+        return
+
+    # separate short transaction so partition DDL never holds locks for the length of an ingest
+    with getcursor() as cur:
+
+        if not schema_is_partitioned(cur):
+            _known_partitions.update(missing)
+            return
+
+        for census_year, year_scanned, month_scanned in missing:
+
+            for table in ("reels", "images"):
+
+                partition = scan_partition_name(table, census_year, year_scanned, month_scanned)
+
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (partition,))
+                create_scan_partition(cur, table, census_year, year_scanned, month_scanned)
+
+            _known_partitions.add((census_year, year_scanned, month_scanned))
+
+
+def create_scan_partition(cur, table: str, census_year: int, year_scanned: int, month_scanned: int) -> None:
+
+    cur.execute(pgsql.SQL("""
+        CREATE TABLE IF NOT EXISTS {} PARTITION OF {}
+        FOR VALUES FROM (%s, %s, %s) TO (%s, %s, %s)
+    """).format(pgsql.Identifier(scan_partition_name(table, census_year, year_scanned, month_scanned)),
+                pgsql.Identifier(table)),
+        (census_year, year_scanned, month_scanned, census_year, year_scanned, month_scanned + 1))
+
+
+def image_columns(partitioned: bool) -> tuple:
+
+    # an unmigrated images table has no scan key columns
+    return IMAGE_COLUMNS + SCAN_PARTITION_KEY if partitioned else IMAGE_COLUMNS
+
+
+def create_image_counts_dirty_table(cur) -> None:
+
+    # writers in several processes can get here first; the lock keeps CREATE IF NOT EXISTS from racing
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('crawl_image_counts_dirty'))")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_image_counts_dirty (
+            census_year integer NOT NULL,
+            year_scanned integer NOT NULL,
+            month_number_scanned integer NOT NULL,
+            PRIMARY KEY (census_year, year_scanned, month_number_scanned)
+        )
+    """)
+
+
+def mark_image_counts_dirty(cur, census_year: int, year_scanned: int, month_scanned: int) -> None:
+
+    """
+    Queues a scan folder for the next incremental crawl_image_counts refresh. Call it on
+    the cursor of the transaction that changes the folder, so the mark commits with the change.
+    """
+
+    # an already queued folder is still updated: the row lock makes a refresh that would
+    # take the older mark wait for this transaction, instead of missing its change
+
+    cur.execute("SELECT to_regclass('crawl_image_counts_dirty')")
+    if cur.fetchone()[0] is None:
+        create_image_counts_dirty_table(cur)
+
+    cur.execute("""
+        INSERT INTO crawl_image_counts_dirty (census_year, year_scanned, month_number_scanned)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (census_year, year_scanned, month_number_scanned)
+        DO UPDATE SET census_year = EXCLUDED.census_year
+    """, (census_year, year_scanned, month_scanned))
+
+
+def _copy_text(value) -> str:
+
+    if value is None:
+        return "\\N"
+
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+                      .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def copy_image_rows(cur, rows, columns: tuple = IMAGE_COLUMNS, spool_size: int = DEFAULT_COPY_SPOOL_SIZE) -> int:
+
+    count = 0
+
+    with SpooledTemporaryFile(max_size=spool_size, mode="w+", encoding="utf-8") as buffer:
+
+        for row in rows:
+            buffer.write("\t".join([_copy_text(value) for value in row]))
+            buffer.write("\n")
+            count = count + 1
+
+        if count:
+            buffer.seek(0)
+            # copy_expert takes a plain string, so the column list is rendered against the connection
+            cur.copy_expert(pgsql.SQL("COPY images ({}) FROM STDIN").format(
+                pgsql.SQL(", ").join(pgsql.Identifier(name) for name in columns)).as_string(cur), buffer)
+
+    return count
+
+
+def insert_image_rows(cur, rows, columns: tuple = IMAGE_COLUMNS) -> int:
+
+    sql = pgsql.SQL("INSERT INTO images ({}) VALUES %s").format(
+        pgsql.SQL(", ").join(pgsql.Identifier(name) for name in columns))
+
+    rows = list(rows)
+
+    if rows:
+        execute_values (cur, sql, rows, template=None, page_size=DEFAULT_EXECUTION_PAGE_SIZE)
+
+    return len(rows)
+
+
+def load_image_rows(cur, rows, method: str = IMAGE_LOAD_COPY, columns: tuple = IMAGE_COLUMNS) -> int:
+
+    if method == IMAGE_LOAD_COPY:
+        return copy_image_rows(cur, rows, columns)
+
+    return insert_image_rows(cur, rows, columns)
+
+
+DEFAULT_LOOKUP_CACHE_SIZE = 4096
+
+# other processes write too; this bounds how long they can go unnoticed
+DEFAULT_LOOKUP_CACHE_TTL = 300.0
+
+_ABSENT = object()
+
+
+class LookupCache:
+
+    """
+    In-process LRU cache with TTL for repeated repository lookups.
+    Keys are tuples whose first item is a namespace ("crawl_status", "reel_by_identifier", ...)
+    so write methods can drop one key or a whole namespace.
+
+    A load that overlaps an invalidation isn't cached, so a slow read can't
+    put back a value a concurrent write just made stale. A None result is
+    cached too unless cache_absent is off, which lookups that decide whether
+    to insert use: another process's insert never invalidates this cache.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_LOOKUP_CACHE_SIZE, ttl: float = DEFAULT_LOOKUP_CACHE_TTL,
+                 enabled: bool = True) -> None:
+
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__enabled = enabled
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__generation = 0
+
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__expirations = 0
+        self.__invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    @enabled.setter
+    def enabled(self, value: bool) -> None:
+        self.__enabled = value
+        if not value:
+            self.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.__hits + self.__misses
+        return self.__hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+
+        with self.__lock:
+            return {
+                "entries": len(self.__entries),
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "hit_rate": self.hit_rate,
+                "evictions": self.__evictions,
+                "expirations": self.__expirations,
+                "invalidations": self.__invalidations
+            }
+
+    def get_or_load(self, key: tuple, loader, cache_absent: bool = True):
+
+        if not self.__enabled:
+            return loader()
+
+        now = time.monotonic()
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self.__entries.move_to_end(key)
+                    self.__hits += 1
+                    return None if value is _ABSENT else value
+                del self.__entries[key]
+                self.__expirations += 1
+
+            self.__misses += 1
+            generation = self.__generation
+
+        value = loader()
+
+        if value is None and not cache_absent:
+            return value
+
+        with self.__lock:
+            if generation == self.__generation:
+                self.__entries[key] = (_ABSENT if value is None else value,
+                                       now + self.__ttl if self.__ttl is not None else None)
+                self.__entries.move_to_end(key)
+                while len(self.__entries) > self.__max_entries:
+                    self.__entries.popitem(last=False)
+                    self.__evictions += 1
+
+        return value
+
+    def invalidate(self, namespace: str, *key) -> None:
+
+        """ Drops (namespace, *key), or every entry in namespace when no key is given """
+
+        with self.__lock:
+            self.__generation += 1
+            self.__invalidations += 1
+
+            if key:
+                self.__entries.pop((namespace,) + key, None)
+                return
+
+            for cached_key in [k for k in self.__entries if k[0] == namespace]:
+                del self.__entries[cached_key]
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.clear()
+
+
+lookup_cache = LookupCache()
+
+
+def invalidate_reel_lookups(reels) -> None:
+
+    for reel in reels:
+        lookup_cache.invalidate("reel_by_identifier", reel["scan_identifier"])
+        lookup_cache.invalidate("filters_by_scan", *reel_scan_key(reel))
+
+
+def invalidate_scan_lookups(census_year: int, year_scanned: int, month_scanned: int) -> None:
+
+    # identifiers of the reels in a scan folder aren't known without a query
+    lookup_cache.invalidate("reel_by_identifier")
+    lookup_cache.invalidate("filters_by_scan", census_year, year_scanned, month_scanned)
+
+
+def system_event_row(message: str, severity: str, event_type: str, process: str, detail: str,
+                     success: bool = True) -> tuple:
+
+    # host and date are taken when the event happens, not when a buffered batch is written
+    return (message, socket.gethostname(), severity, event_type, str(datetime.now()), success, process, detail)
+
+
 class SystemEventsRepository:
 
+    row_style = ROW_DICT
 
     def add_record(self, message:str, severity: str, event_type: str, process:str, detail:str, 
                   success: bool=True) -> int:
 
-        host = socket.gethostname()
-        event_date = str(datetime.now())
-
         sql = """
             INSERT INTO system_events
             (message, host, severity, type, date, success, process, detail)
             VALUES
             (%s, %s, %s, %s, %s,%s, %s, %s) RETURNING id           
         """
-        prms = (message,host,severity,event_type, event_date, success,process, detail,)
+        prms = system_event_row(message, severity, event_type, process, detail, success)
 
         with getcursor() as cur:
-            cur.execute(sql, prms)
+            execute_prepared(cur, "system_events_add_record", sql, prms)
             return cur.fetchone()[0]
 
+    def add_records(self, rows: List) -> None:
+
+        """ rows are system_event_row tuples; all of them go in one statement and one commit """
+
+        sql = """
+            INSERT INTO system_events
+            (message, host, severity, type, date, success, process, detail)
+            VALUES %s
+        """
+
+        with getcursor() as cur:
+            execute_values(cur, sql, rows, template=None, page_size=DEFAULT_EXECUTION_PAGE_SIZE)
+
 
     def delete_record(self, id:int):
 
@@ -68,40 +755,25 @@ class SystemEventsRepository:
 
     def get_all_records(self):
 
-        result = []
-
         sql = """
-           SELECT  id, host, message, severity, type,
+           SELECT  id, host, message, severity, type AS event_type,
             date, success, process, detail   
            FROM system_events     
         """
         
         with getcursor() as cur:
             cur.execute(sql)
-            rows = cur.fetchall()
-
-        for row in rows:
-
-            record = {}
-
-            record["id"] = row[0]
-            record["host"] = row[1] 
-            record["message"] = row[2]
-            record["severity"] = row[3] 
-            record["event_type"] = row[4]
-            record["date"] = row[5] 
-            record["success"] = row[6] 
-            record["process"] = row[7] 
-            record["detail"] = row[8]   
-
-            result.append(record)
-
-        return result
+            return fetch_all(cur, self.row_style)
 
 
 class CrawlStatusRepository:
 
+    row_style = ROW_DICT
+
     def get_last_crawl(self, census_year):
+        return lookup_cache.get_or_load(("last_crawl", census_year), lambda: self.__load_last_crawl(census_year))
+
+    def __load_last_crawl(self, census_year):
 
         sql = """
             SELECT max(month_scanned), year_scanned
@@ -121,7 +793,7 @@ class CrawlStatusRepository:
 
         with getcursor() as cur:
             cur.execute(sql, prms)
-            row = cur.fetchone()            
+            row = fetch_one(cur, ROW_TUPLE)
 
         if row and row[0]:
             result = (row[0], row[1])
@@ -140,6 +812,22 @@ class CrawlStatusRepository:
         return result
         
     
+    def get_crawl_history(self, census_year: int):
+
+        sql = """
+            SELECT month_scanned, year_scanned, date_completed
+            FROM crawl_status
+            WHERE census_year = %s
+        """
+
+        prms = (census_year,)
+
+        with getcursor() as cur:
+            cur.execute(sql, prms)
+            rows = fetch_all(cur, ROW_TUPLE)
+
+        return {(month, year): date_completed for month, year, date_completed in rows}
+
     def add_crawl_operation(self, 
                             census_year: int, 
                             month_scanned: int,
@@ -168,11 +856,24 @@ class CrawlStatusRepository:
 
         with getcursor() as cur:
             cur.execute(sql, prms)
-            return cur.fetchone()[0]    
+            crawl_operation_id = cur.fetchone()[0]
+            mark_image_counts_dirty(cur, census_year, year_scanned, month_scanned)
+
+        return crawl_operation_id
 
 
     def get_crawl_status(self, census_year: int, month_scanned: int, year_scanned: int):
 
+        # a missing status makes add_crawl_operation insert one, so absence is always read fresh
+        crawl_status = lookup_cache.get_or_load(("crawl_status", census_year, month_scanned, year_scanned),
+                                                lambda: self.__load_crawl_status(census_year, month_scanned, year_scanned),
+                                                cache_absent=False)
+
+        # callers get their own copy of the cached record
+        return copy.copy(crawl_status)
+
+    def __load_crawl_status(self, census_year: int, month_scanned: int, year_scanned: int):
+
         sql = """
             SELECT id,census_year,month_scanned, year_scanned,date_completed
             FROM crawl_status
@@ -181,20 +882,10 @@ class CrawlStatusRepository:
 
         prms = (census_year, month_scanned, year_scanned,)
 
+        # always a dict: add_crawl_operation and reset_crawl read it as crawl_status["id"]
         with getcursor() as cur:
-            cur.execute(sql, prms)
-            row = cur.fetchone()    
-
-        if row is not None:
-            return {
-                "id": row[0],
-                "census_year": row[1],
-                "month_scanned": row[2],
-                "year_scanned": row[3],
-                "date_completed": row[4]
-            }
-        else:
-            return None
+            execute_prepared(cur, "crawl_status_get_crawl_status", sql, prms)
+            return fetch_one(cur, ROW_DICT)
 
 
     def mark_crawl_as_completed(self, census_year: int, month_scanned: int, year_scanned: int) -> None:
@@ -210,6 +901,9 @@ class CrawlStatusRepository:
         with getcursor() as cur:
             cur.execute(sql, prms)    
 
+        lookup_cache.invalidate("crawl_status", census_year, month_scanned, year_scanned)
+        lookup_cache.invalidate("last_crawl", census_year)
+
     def delete_crawl_status(self, id: int) -> None:
 
         crawl_delete_sql = """
@@ -227,6 +921,10 @@ class CrawlStatusRepository:
             cur.execute(operations_delete_sql, prms)
             cur.execute(crawl_delete_sql, prms)
 
+        # only the id is known here
+        lookup_cache.invalidate("crawl_status")
+        lookup_cache.invalidate("last_crawl")
+
     def add_crawl_status(self, census_year, month_scanned, year_scanned) -> int:
 
         sql = """
@@ -240,12 +938,15 @@ class CrawlStatusRepository:
 
         with getcursor() as cur:
             cur.execute(sql, prms)    
-            return cur.fetchone()[0]
+            crawl_status_id = cur.fetchone()[0]
+
+        lookup_cache.invalidate("crawl_status", census_year, month_scanned, year_scanned)
+        lookup_cache.invalidate("last_crawl", census_year)
+
+        return crawl_status_id
                 
     def get_crawl_status_operations(self, census_year, month_scanned, year_scanned):
 
-        result = []
-
         sql = """
             SELECT
                 crawl_status.id,
@@ -267,28 +968,10 @@ class CrawlStatusRepository:
 
         with getcursor() as cur:
             cur.execute(sql, prms)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:           
-                result.append({
-                    "id": row[0],
-                    "census_year": row[1],
-                    "year_scanned": row[2],
-                    "month_scanned": row[3],
-                    "date_completed": row[4],
-                    "date_crawled": row[5],
-                    "reels_parsed": row[6],
-                    "images_parsed": row[7],
-                    "crawl_time": row[8],
-                })
-
-        return result
+            return fetch_all(cur, self.row_style)
 
     def get_all_records(self):
 
-        result = []
-
         sql = """
             SELECT
                 crawl_status.id,
@@ -307,29 +990,72 @@ class CrawlStatusRepository:
 
         with getcursor() as cur:
             cur.execute(sql)
-            rows = cur.fetchall()
-
-        if rows:
-
-            for row in rows:
-            
-                result.append({
-                    "id": row[0],
-                    "census_year": row[1],
-                    "year_scanned": row[2],
-                    "month_scanned": row[3],
-                    "date_completed": row[4],
-                    "date_crawled": row[5],
-                    "reels_parsed": row[6],
-                    "images_parsed": row[7],
-                    "crawl_time": row[8],
-                })
+            return fetch_all(cur, self.row_style)
 
-        return result
+    def reset_crawl(self, scan_month, scan_year, census_year, manifest_dir: str = None, checkpoint_dir: str = None):
+
+        """
+        Deletes the scan folder's reels, images and crawl status so it can be crawled again.
+        Pass the crawl's manifest_dir and checkpoint_dir too: the manifest and an interrupted
+        crawl's checkpoint still list the deleted reels as committed, and a re-crawl would
+        otherwise skip every one of them.
+        """
 
-    def reset_crawl(self, scan_month, scan_year, census_year):
+        with getcursor() as cur:
+            partitioned = schema_is_partitioned(cur)
+
+        if partitioned:
+            self.__replace_scan_partitions(scan_month, scan_year, census_year)
+        else:
+            self.__delete_scan_rows(scan_month, scan_year, census_year)
 
-        reel_ids = []
+        invalidate_scan_lookups(census_year, scan_year, scan_month)
+
+        crawl_status = self.get_crawl_status(census_year, scan_month, scan_year)
+
+        if crawl_status:
+            self.delete_crawl_status(crawl_status["id"])
+
+        normalized_folder = datetime(scan_year, scan_month, 1).strftime("%m-%b-%y")
+
+        # imported here so the data layer only touches crawler state when asked to
+        if manifest_dir:
+            from crawler.manifest import CrawlManifest
+            CrawlManifest(os.path.join(manifest_dir,
+                CrawlManifest.manifest_file_name(census_year, normalized_folder))).clear()
+
+        if checkpoint_dir:
+            from crawler.checkpoint import CrawlCheckpoint
+            CrawlCheckpoint(os.path.join(checkpoint_dir,
+                CrawlCheckpoint.checkpoint_file_name(census_year, normalized_folder)),
+                census_year, (scan_month, scan_year)).clear()
+
+    def __replace_scan_partitions(self, scan_month, scan_year, census_year):
+
+        # the month's rows live in their own partitions, so this never touches the rest of the table.
+        # TRUNCATE of a reels partition is refused while images' foreign key references the
+        # partitioned reels table, so the pair is detached, dropped and recreated empty instead
+        with getcursor() as cur:
+
+            for table in ("reels", "images"):
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))",
+                            (scan_partition_name(table, census_year, scan_year, scan_month),))
+
+            for table in ("images", "reels"):
+                partition = scan_partition_name(table, census_year, scan_year, scan_month)
+                cur.execute("SELECT to_regclass(%s)", (partition,))
+                if cur.fetchone()[0] is not None:
+                    cur.execute(pgsql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                        pgsql.Identifier(table), pgsql.Identifier(partition)))
+                    cur.execute(pgsql.SQL("DROP TABLE {}").format(pgsql.Identifier(partition)))
+
+            # other processes may still hold this scan folder in _known_partitions
+            for table in ("reels", "images"):
+                create_scan_partition(cur, table, census_year, scan_year, scan_month)
+
+            mark_image_counts_dirty(cur, census_year, scan_year, scan_month)
+
+    def __delete_scan_rows(self, scan_month, scan_year, census_year):
 
         base_sql = """
             SELECT id FROM reels 
@@ -341,11 +1067,7 @@ class CrawlStatusRepository:
 
         with getcursor() as cur:
             cur.execute(base_sql, base_params)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                reel_ids.append(int(row[0]))
+            reel_ids = fetch_all(cur, ROW_SCALAR)
 
         if reel_ids:
 
@@ -375,13 +1097,14 @@ class CrawlStatusRepository:
 
                 execute_values (cur, reel_delete_sql, reel_delete_params, template=None, page_size=DEFAULT_EXECUTION_PAGE_SIZE)                   
 
-        crawl_status = self.get_crawl_status(census_year, scan_month, scan_year)
-
-        if crawl_status:
-            self.delete_crawl_status(crawl_status["id"])
+                mark_image_counts_dirty(cur, census_year, scan_year, scan_month)
 
 
 class ImageRepository:
+
+    row_style = ROW_DICT
+
+    image_load_method = IMAGE_LOAD_COPY
     
     def record_count(self) -> int:
 
@@ -396,24 +1119,20 @@ class ImageRepository:
 
     def add_records(self, reel_id: int, images: List):
 
-        sql = """
-            INSERT INTO images
-            (
-               reel_id, filename, filesize,image_filepath  
-            )
-            VALUES %s
-                  
-        """
+        with getcursor() as cur:
 
-        sql_params = []
+            partitioned = schema_is_partitioned(cur)
+            scan_key = ()
 
-        for image in images:
-            sql_params.append(
-                (reel_id, str(image["filename"]), int(image["filesize"]), str(image["filepath"]),)
-            )
+            if partitioned:
+                cur.execute("""
+                    SELECT census_year, year_scanned, month_number_scanned
+                    FROM reels WHERE id = %s
+                """, (reel_id,))
+                scan_key = tuple(cur.fetchone())
 
-        with getcursor() as cur:
-            execute_values (cur, sql, sql_params, template=None, page_size=DEFAULT_EXECUTION_PAGE_SIZE)            
+            load_image_rows(cur, image_rows(reel_id, images, scan_key), self.image_load_method,
+                            image_columns(partitioned))
 
 
     def add_record(self, reel_id: int, filename: str, filesize: int,
@@ -422,16 +1141,30 @@ class ImageRepository:
         sql = """
             INSERT INTO images
             (
-               reel_id, filename, filesize,image_filepath  
+               reel_id, filename, filesize,image_filepath
             )
-            VALUES
-            (%s, %s, %s, %s) RETURNING id            
+            VALUES (%s, %s, %s, %s)
+            RETURNING id            
+        """
+
+        partitioned_sql = """
+            INSERT INTO images
+            (
+               reel_id, filename, filesize,image_filepath,
+               census_year, year_scanned, month_number_scanned
+            )
+            SELECT %s, %s, %s, %s, census_year, year_scanned, month_number_scanned
+            FROM reels WHERE id = %s
+            RETURNING id            
         """
 
         prms = (reel_id, filename, filesize, image_filepath,)
 
         with getcursor() as cur:
-            cur.execute(sql, prms)    
+            if schema_is_partitioned(cur):
+                execute_prepared(cur, "images_add_partitioned_record", partitioned_sql, prms + (reel_id,))
+            else:
+                execute_prepared(cur, "images_add_record", sql, prms)
             return cur.fetchone()[0]    
 
 
@@ -448,37 +1181,37 @@ class ImageRepository:
             cur.execute(sql, prms)    
 
     def get_all_records(self):
+        return list(self.iter_all_records())
 
-        result = []
+    def iter_all_records(self, itersize: int = DEFAULT_STREAMING_ITERSIZE):
 
         sql = """
            SELECT id, reel_id, filename, filesize, image_filepath
            FROM images    
         """
 
-        with getcursor() as cur:
-            cur.execute(sql)    
-            rows = cur.fetchall()
+        with getstreamingcursor("images_all", itersize) as cur:
+            cur.execute(sql)
+            yield from iter_rows(cur, self.row_style)
+
+class ReelRepository:
 
-        if rows:
+    image_load_method = IMAGE_LOAD_COPY
+    row_style = ROW_DICT
 
-            for row in rows:
+    def add_reel_and_images(self, reel) -> None:
 
-                image = {}
+        ensure_scan_partitions([reel_scan_key(reel)])
 
-                image["id"] = row[0]
-                image["reel_id"] = row[1]
-                image["filename"] = row[2]
-                image["filesize"] = row[3]
-                image["image_filepath"] = row[4]
+        with getcursor() as cur:
+            reel_id = self.__insert_reel_and_images(cur, reel)
 
-                result.append(image)
-        
-        return result
+        invalidate_reel_lookups([reel])
 
-class ReelRepository:
+        #Return the Id
+        return reel_id
 
-    def add_reel_and_images(self, reel) -> None:
+    def add_reels_and_images(self, reels, batch_size: int = DEFAULT_REEL_INSERT_BATCH_SIZE) -> List:
 
         reel_insert_sql = """
                 INSERT INTO reels
@@ -486,42 +1219,78 @@ class ReelRepository:
                     census_year, month_name_scanned, month_number_scanned,
                     year_scanned, scan_identifier  
                 )
-                VALUES
-                (%s, %s, %s, %s, %s) RETURNING id           
-        """ 
-
-        image_insert_sql = """
-                INSERT INTO images
-                (
-                    reel_id, filename, filesize,image_filepath  
-                )
                 VALUES %s
-                  
+                RETURNING id, scan_identifier
         """
 
-        reel_sql_params = (reel["census_year"], reel["scan_month_name"],
-            reel["scan_month"], reel["scan_year"], reel["scan_identifier"])
+        reels = list(reels)
+        identifiers = [reel["scan_identifier"] for reel in reels]
+
+        # ids are mapped back by scan_identifier, so it has to be unique within the call
+        if len(set(identifiers)) != len(identifiers):
+            raise ValueError("Duplicate scan_identifier in reel batch")
+
+        ensure_scan_partitions([reel_scan_key(reel) for reel in reels])
 
+        reel_ids = {}
 
+        # one transaction for the whole call; each batch is one reel statement and one COPY
         with getcursor() as cur:
-            cur.execute(reel_insert_sql, reel_sql_params)    
-            reel_id = cur.fetchone()[0]            
 
-            #add the associated images (if any)
-            if reel["parsed_images"]:
-            
-                image_sql_params = []        
+            partitioned = schema_is_partitioned(cur)
+            columns = image_columns(partitioned)
 
-                for image in reel["parsed_images"]:
+            for start in range(0, len(reels), batch_size):
 
-                    image_sql_params.append(
-                        (reel_id, str(image["filename"]), int(image["filesize"]), str(image["filepath"]),)
-                    )
+                batch = reels[start:start + batch_size]
 
-                execute_values (cur, image_insert_sql, image_sql_params, template=None, page_size=DEFAULT_EXECUTION_PAGE_SIZE)           
+                reel_sql_params = [(reel["census_year"], reel["scan_month_name"], reel["scan_month"],
+                                    reel["scan_year"], reel["scan_identifier"]) for reel in batch]
 
+                rows = execute_values(cur, reel_insert_sql, reel_sql_params, template=None,
+                                      page_size=len(batch), fetch=True)
+
+                for reel_id, scan_identifier in rows:
+                    reel_ids[scan_identifier] = reel_id
+
+                load_image_rows(cur, chain.from_iterable(
+                    image_rows(reel_ids[reel["scan_identifier"]], reel["parsed_images"],
+                               reel_scan_key(reel) if partitioned else ())
+                    for reel in batch if reel["parsed_images"]), self.image_load_method, columns)
+
+            # sorted, so writers covering the same folders take the dirty row locks in one order
+            for scan_key in sorted({reel_scan_key(reel) for reel in reels if reel["parsed_images"]}):
+                mark_image_counts_dirty(cur, *scan_key)
+
+        invalidate_reel_lookups(reels)
+
+        return [reel_ids[identifier] for identifier in identifiers]
+
+    def __insert_reel_and_images(self, cur, reel) -> int:
+
+        reel_insert_sql = """
+                INSERT INTO reels
+                (
+                    census_year, month_name_scanned, month_number_scanned,
+                    year_scanned, scan_identifier  
+                )
+                VALUES
+                (%s, %s, %s, %s, %s) RETURNING id           
+        """ 
+
+        reel_sql_params = (reel["census_year"], reel["scan_month_name"],
+            reel["scan_month"], reel["scan_year"], reel["scan_identifier"])
+
+        cur.execute(reel_insert_sql, reel_sql_params)    
+        reel_id = cur.fetchone()[0]            
+
+        #add the associated images (if any), in the same transaction as the reel
+        if reel["parsed_images"]:
+            partitioned = schema_is_partitioned(cur)
+            load_image_rows(cur, image_rows(reel_id, reel["parsed_images"], reel_scan_key(reel) if partitioned else ()),
+                            self.image_load_method, image_columns(partitioned))
+            mark_image_counts_dirty(cur, *reel_scan_key(reel))
 
-        #Return the Id
         return reel_id
         
     def record_count(self) -> int:
@@ -537,22 +1306,29 @@ class ReelRepository:
 
 
     def get_reel_by_identifier(self, scan_identifier):
+        return list(lookup_cache.get_or_load(("reel_by_identifier", scan_identifier),
+                                             lambda: self.__load_reel_by_identifier(scan_identifier)))
 
-        sql = """
-           SELECT * FROM reels 
+    def __load_reel_by_identifier(self, scan_identifier):
+
+        sql = f"""
+           SELECT {REEL_COLUMNS} FROM reels 
            WHERE scan_identifier = %s 
         """
 
         prms = (scan_identifier,)
 
-
+        # these used to be raw rows; named tuples keep positional access working
         with getcursor() as cur:
-            cur.execute(sql, prms)
-            return cur.fetchall()
+            execute_prepared(cur, "reels_get_reel_by_identifier", sql, prms)
+            return tuple(fetch_all(cur, ROW_NAMEDTUPLE))
               
     def get_filters_by_scan(self, month_number_scanned: int, year_scanned: int, census_year: int):
+        return list(lookup_cache.get_or_load(
+            ("filters_by_scan", census_year, year_scanned, month_number_scanned),
+            lambda: tuple(self.__load_filters_by_scan(month_number_scanned, year_scanned, census_year))))
 
-        result: List[str] = []
+    def __load_filters_by_scan(self, month_number_scanned: int, year_scanned: int, census_year: int):
 
         sql = """
            SELECT scan_identifier FROM reels 
@@ -564,20 +1340,12 @@ class ReelRepository:
 
         with getcursor() as cur:
             cur.execute(sql, prms)
-            rows = cur.fetchall()    
-
-        if rows:
-            for row in rows:
-                result.append(row[0])
-
-        return result
+            return fetch_all(cur, ROW_SCALAR)
 
     def get_records_by_scan_date(self, month_number_scanned: int, year_scanned: int, census_year: int):
 
-        result = []
-
-        sql = """
-           SELECT * FROM reels 
+        sql = f"""
+           SELECT {REEL_COLUMNS} FROM reels 
            WHERE month_number_scanned = %s AND
               year_scanned = %s AND census_year = %s
         """
@@ -586,28 +1354,13 @@ class ReelRepository:
 
         with getcursor() as cur:
             cur.execute(sql, prms)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                reel = {}
-                reel["id"] = row[0]
-                reel["census_year"] = row[1]
-                reel["month_name_scanned"] = row[2]
-                reel["month_number_scanned"] = row[3]
-                reel["year_scanned"] = row[4]
-                reel["scan_identifier"] = row[5]
-                reel["snowball_export_date"] = row[6]
-                reel["move_flag"] = row[7]
-                reel["target_snowball"] = row[8]
-
-                result.append(reel)
-
-        return result
+            return fetch_all(cur, self.row_style)
 
         
     def add_record(self, values:{}):
 
+        ensure_scan_partitions([reel_scan_key(values)])
+
         sql = """
             INSERT INTO reels
             (
@@ -624,7 +1377,11 @@ class ReelRepository:
 
         with getcursor() as cur:
             cur.execute(sql, sql_params)
-            return cur.fetchone()[0]            
+            reel_id = cur.fetchone()[0]
+
+        invalidate_reel_lookups([values])
+
+        return reel_id
 
     def delete_record(self, id: int):
         
@@ -637,46 +1394,49 @@ class ReelRepository:
         with getcursor() as cur:
             cur.execute(sql, prms)    
 
+        lookup_cache.invalidate("reel_by_identifier")
+        lookup_cache.invalidate("filters_by_scan")
+
     def get_all_records(self):
+        return list(self.iter_all_records())
 
-        result = []
+    def iter_all_records(self, itersize: int = DEFAULT_STREAMING_ITERSIZE):
 
-        sql = """
-           SELECT id, census_year, month_name_scanned,
-            month_number_scanned, year_scanned, scan_identifier,        
-            snowball_export_date, move_flag,target_snowball
+        sql = f"""
+           SELECT {REEL_COLUMNS}
             FROM reels     
         """
 
-        with getcursor() as cur:
+        with getstreamingcursor("reels_all", itersize) as cur:
             cur.execute(sql)
-            rows = cur.fetchall()
+            yield from iter_rows(cur, self.row_style)
 
-        if rows:
-            for row in rows:
-                reel = {}
+    def iter_scan_identifiers(self, itersize: int = DEFAULT_STREAMING_ITERSIZE):
 
-                reel["id"] = row[0]
-                reel["census_year"] = row[1]
-                reel["month_name_scanned"] = row[2]
-                reel["month_number_scanned"] = row[3]
-                reel["year_scanned"] = row[4]
-                reel["scan_identifier"] = row[5]
-                reel["snowball_export_date"] = row[6]
-                reel["move_flag"] = row[7]
-                reel["target_snowball"] = row[8]
+        sql = """
+           SELECT scan_identifier FROM reels
+        """
 
-                result.append(reel)
+        with getstreamingcursor("reels_scan_identifiers", itersize) as cur:
+            cur.execute(sql)
+            yield from iter_rows(cur, ROW_SCALAR)
 
-        return result
+    def iter_scan_folder_identifiers(self, itersize: int = DEFAULT_STREAMING_ITERSIZE):
+
+        sql = """
+           SELECT census_year, month_number_scanned, year_scanned, scan_identifier FROM reels
+        """
+
+        with getstreamingcursor("reels_scan_folder_identifiers", itersize) as cur:
+            cur.execute(sql)
+            yield from iter_rows(cur, ROW_TUPLE)
 
 class SnowballRepository:
 
+    row_style = ROW_DICT
 
     def get_unique_snowballs(self):
 
-        result = []
-
         sql = """
             SELECT DISTINCT reels.target_snowball
             FROM reels
@@ -686,64 +1446,66 @@ class SnowballRepository:
         
         with getcursor() as cur:
             cur.execute(sql)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                if row:
-                    result.append(row[0])
-
-        return result
+            return fetch_all(cur, ROW_SCALAR)
 
     def get_snowballs(self):
 
-        result = []
-
         sql = """
-            SELECT DISTINCT reels.target_snowball, sum(images.filesize) "TOTAL_SNOWBALL_BYTES" 
+            SELECT DISTINCT reels.target_snowball AS snowball, sum(images.filesize) AS bytes_used
             FROM reels LEFT outer join images ON
             reels.id = images.reel_id
             WHERE reels.target_snowball IS NOT NULL
-            GROUP BY reels.target_snowball;
+            GROUP BY reels.target_snowball
+            HAVING sum(images.filesize) IS NOT NULL;
         """
 
         with getcursor() as cur:
             cur.execute(sql)
-            rows = cur.fetchall()
+            return fetch_all(cur, self.row_style)
 
-        if rows:
-            for row in rows:
-                if row[0] is not None and row[1] is not None:
-                    record = {"snowball": row[0], "bytes_used": row[1]}
-                    result.append(record)
-        
-        return result
-
-    def get_unassigned_reels(self):
-
-        result = []
+    def get_unassigned_reels(self, with_scan_key: bool = False):
 
         sql = """
             SELECT
-            scan_identifier,
-            total_image_bytes
+            scan_identifier AS reel,
+            total_image_bytes AS bytes
             FROM 
             mvw_snowballreadyreels     
+            WHERE scan_identifier IS NOT NULL AND total_image_bytes IS NOT NULL
         """
 
+        # the scan key lets the packer keep census years or scan months together
+        if with_scan_key:
+            # the view is one row per scan_identifier; DISTINCT ON keeps a re-delivered reel,
+            # which has a reels row per scan folder, from being packed once per row
+            sql = """
+                SELECT DISTINCT ON (ready.scan_identifier)
+                ready.scan_identifier AS reel,
+                ready.total_image_bytes AS bytes,
+                reels.census_year,
+                reels.year_scanned,
+                reels.month_number_scanned
+                FROM mvw_snowballreadyreels AS ready
+                INNER JOIN reels ON reels.scan_identifier = ready.scan_identifier
+                WHERE ready.scan_identifier IS NOT NULL AND ready.total_image_bytes IS NOT NULL
+                ORDER BY ready.scan_identifier, reels.id
+            """
+
         with getcursor() as cur:
             cur.execute(sql)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                if row[0] is not None and row[1] is not None:
-                    result.append({
-                        "reel": row[0],
-                        "bytes": row[1]
-                    })        
-   
-        return result
+            return fetch_all(cur, self.row_style)
+
+    def get_snowball_scan_keys(self):
+
+        sql = """
+            SELECT DISTINCT target_snowball AS snowball, census_year, year_scanned, month_number_scanned
+            FROM reels
+            WHERE target_snowball IS NOT NULL
+        """
+
+        with getcursor() as cur:
+            cur.execute(sql)
+            return fetch_all(cur, self.row_style)
 
         
     def assign_reels_to_snowball(self, snowball_assignment) -> None:
@@ -756,6 +1518,12 @@ class SnowballRepository:
             }
 
         """
+        self.assign_reels_to_snowballs([snowball_assignment])
+
+    def assign_reels_to_snowballs(self, snowball_assignments) -> None:
+
+        """ Writes every assignment in one transaction, so a failure leaves none of them applied """
+
         sql = """
             UPDATE reels AS t 
             SET target_snowball = e.snowball
@@ -764,17 +1532,24 @@ class SnowballRepository:
         """
         sql_params = []
 
-        target_snowball = snowball_assignment["snowball"]
+        for snowball_assignment in snowball_assignments:
+            target_snowball = snowball_assignment["snowball"]
+            for reel in snowball_assignment["reels"]:
+                sql_params.append((target_snowball, reel))
 
-        for reel in snowball_assignment["reels"]: 
-            sql_params.append((target_snowball, reel))
+        if not sql_params:
+            return
 
         with getcursor() as cur:
             execute_values (cur, sql, sql_params, template=None, page_size=DEFAULT_EXECUTION_PAGE_SIZE)
 
+        # cached reels carry target_snowball
+        lookup_cache.invalidate("reel_by_identifier")
+
     def get_snowball_image_paths(self, snowball):
+        return list(self.iter_snowball_image_paths(snowball))
 
-        result = []
+    def iter_snowball_image_paths(self, snowball, itersize: int = DEFAULT_STREAMING_ITERSIZE):
 
         sql = """
             SELECT DISTINCT image_filepath
@@ -784,24 +1559,16 @@ class SnowballRepository:
         """
         sql_params = (snowball, )
 
-        with getcursor() as cur:
+        with getstreamingcursor("snowball_image_paths", itersize) as cur:
             cur.execute(sql, sql_params)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                result.append(row[0])
-
-        return result
+            yield from iter_rows(cur, ROW_SCALAR)
 
     def get_snowball_reels(self, snowball):
 
-        result = []
-
         sql = """
             SELECT DISTINCT 
                 census_year,
-                year_scanned,
+                year_scanned AS scan_year,
                 month_number_scanned,
                 month_name_scanned,
                 year_scanned,
@@ -813,177 +1580,216 @@ class SnowballRepository:
 
         with getcursor() as cur:
             cur.execute(sql, sql_params)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                result.append(
-                    {
-                        'census_year': row[0],
-                        'scan_year': row[1],
-                        'month_number_scanned': row[2],
-                        'month_name_scanned': row[3],
-                        'year_scanned': row[4],
-                        'scan_identifier': row[5]
-                    }
-                )
-
-        return result
+            return fetch_all(cur, self.row_style)
 
 class ReportRepository:
 
-   def get_1960_manifest_data(self):
+   row_style = ROW_DICT
 
-        result = []
+   # the views' own column names aren't ours to rely on
+   MANIFEST_COLUMNS = ("scan_identifier", "scanned_period", "reel_location", "image_count")
 
-        sql = """
-            SELECT * from vw_1960scanmanifest
-        """
+   MANIFEST_VIEWS = {
+       1960: "vw_1960scanmanifest",
+       1970: "vw_1970scanmanifest",
+       1980: "vw_1980scanmanifest",
+       1990: "vw_1990scanmanifest"
+   }
 
-        with getcursor() as cur:
-            cur.execute(sql)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                result.append(
-                    {
-                        "scan_identifier": row[0],
-                        "scanned_period": row[1],
-                        "reel_location": row[2],
-                        "image_count": row[3]
-                    }
-                )            
-
-        return result
-        
+   def iter_manifest_data(self, census_year: int, itersize: int = DEFAULT_STREAMING_ITERSIZE):
 
-   def get_1970_manifest_data(self):
-    
-        result = []
+        # view names can't be bound parameters, so only the known views are allowed
+        view = self.MANIFEST_VIEWS[census_year]
 
-        sql = """
-            SELECT * from vw_1970scanmanifest
+        sql = f"""
+            SELECT * from {view}
         """
 
-        with getcursor() as cur:
+        with getstreamingcursor(f"manifest_{census_year}", itersize) as cur:
             cur.execute(sql)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                result.append(
-                    {
-                        "scan_identifier": row[0],
-                        "scanned_period": row[1],
-                        "reel_location": row[2],
-                        "image_count": row[3]
-                    }
-                )            
+            yield from iter_rows(cur, self.row_style, self.MANIFEST_COLUMNS)
 
-        return result
+   def get_1960_manifest_data(self):
+        return list(self.iter_manifest_data(1960))
 
+   def get_1970_manifest_data(self):
+        return list(self.iter_manifest_data(1970))
 
    def get_1980_manifest_data(self):
-        
+        return list(self.iter_manifest_data(1980))
 
-        result = []
+   def get_1990_manifest_data(self):
+        return list(self.iter_manifest_data(1990))
 
-        sql = """
-            SELECT * from vw_1980scanmanifest
-        """
 
-        with getcursor() as cur:
-            cur.execute(sql)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                result.append(
-                    {
-                        "scan_identifier": row[0],
-                        "scanned_period": row[1],
-                        "reel_location": row[2],
-                        "image_count": row[3]
-                    }
-                )            
+SNAPSHOT_INCREMENTAL = "incremental"
+SNAPSHOT_FULL = "full"
 
-        return result
 
+class SnapshotRepository:
 
-   def get_1990_manifest_data(self):
-    
-        result = []
+    row_style = ROW_DICT
+
+    def populate_crawl_image_counts(self, mode: str = SNAPSHOT_INCREMENTAL) -> dict:
 
-        sql = """
-            SELECT * from vw_1990scanmanifest
         """
+        Refreshes crawl_image_counts in place, in one transaction, so readers see either
+        the previous counts or the new ones and never an empty table.
+
+        incremental recomputes only the (census_year, year_scanned, month_number_scanned)
+        groups queued in crawl_image_counts_dirty, plus groups whose crawl_status has since
+        been deleted. ReelRepository's reel inserts, add_crawl_operation and reset_crawl queue
+        a group in the same transaction as their change, so a write that commits late is
+        still picked up by the next refresh. full recomputes every group; use it after
+        changes that bypass those (e.g. ImageRepository.add_records, or deleting images by hand).
+        """
+
+        if mode not in (SNAPSHOT_INCREMENTAL, SNAPSHOT_FULL):
+            raise ValueError(f"Unknown snapshot mode: {mode}")
 
         with getcursor() as cur:
-            cur.execute(sql)
-            rows = cur.fetchall()
-
-        if rows:
-            for row in rows:
-                result.append(
-                    {
-                        "scan_identifier": row[0],
-                        "scanned_period": row[1],
-                        "reel_location": row[2],
-                        "image_count": row[3]
-                    }
-                )            
 
-        return result
+            self.__ensure_snapshot_tables(cur)
 
+            # the row lock serialises concurrent refreshes
+            cur.execute("SELECT refreshed_at FROM crawl_image_counts_refresh WHERE id = 1 FOR UPDATE")
+            refreshed_at = cur.fetchone()[0]
 
-class SnapshotRepository:
+            # nothing was queued before the first refresh
+            if refreshed_at is None:
+                mode = SNAPSHOT_FULL
 
-    def populate_crawl_image_counts(self):
-        
-        with getcursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE touched_groups (
+                    census_year integer, year_scanned integer, month_number_scanned integer,
+                    PRIMARY KEY (census_year, year_scanned, month_number_scanned)
+                ) ON COMMIT DROP
+            """)
 
-            cur.execute("DROP TABLE IF EXISTS crawl_image_counts")     
+            # only committed marks are taken; marks still in flight stay queued for the next refresh
+            cur.execute("""
+                WITH queued AS (
+                    DELETE FROM crawl_image_counts_dirty
+                    RETURNING census_year, year_scanned, month_number_scanned
+                )
+                INSERT INTO touched_groups
+                SELECT census_year, year_scanned, month_number_scanned FROM queued
+                UNION
+                SELECT counts.census_year, counts.year_scanned, counts.month_number_scanned
+                FROM crawl_image_counts counts
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM crawl_status
+                    WHERE crawl_status.census_year = counts.census_year
+                    AND crawl_status.year_scanned = counts.year_scanned
+                    AND crawl_status.month_scanned = counts.month_number_scanned
+                )
+                ON CONFLICT DO NOTHING
+            """)
+
+            if mode == SNAPSHOT_FULL:
+                cur.execute("""
+                    INSERT INTO touched_groups
+                    SELECT DISTINCT census_year, year_scanned, month_number_scanned FROM reels
+                    UNION
+                    SELECT census_year, year_scanned, month_number_scanned FROM crawl_image_counts
+                    ON CONFLICT DO NOTHING
+                """)
+
+            # on a partitioned schema, joining on the full partition key keeps each
+            # group's count to its own partitions
+            image_scan_key = """
+                    AND images.census_year = reels.census_year
+                    AND images.year_scanned = reels.year_scanned
+                    AND images.month_number_scanned = reels.month_number_scanned
+            """ if schema_is_partitioned(cur) else ""
 
             cur.execute("""
-                CREATE TABLE crawl_image_counts AS
-                    SELECT count(images.id) crawl_count, reels.census_year, reels.year_scanned,
-                    reels.month_number_scanned 
-                    FROM ips_live.reels INNER JOIN ips_live.images
-                    ON reels.id = images.reel_id
-                    GROUP BY reels.census_year, reels.year_scanned,
-                    reels.month_number_scanned         
+                CREATE TEMP TABLE group_counts ON COMMIT DROP AS
+                SELECT count(images.id) crawl_count, touched_groups.census_year,
+                    touched_groups.year_scanned, touched_groups.month_number_scanned
+                FROM touched_groups
+                INNER JOIN reels
+                    ON reels.census_year = touched_groups.census_year
+                    AND reels.year_scanned = touched_groups.year_scanned
+                    AND reels.month_number_scanned = touched_groups.month_number_scanned
+                INNER JOIN images
+                    ON images.reel_id = reels.id
+                    """ + image_scan_key + """
+                GROUP BY touched_groups.census_year, touched_groups.year_scanned,
+                    touched_groups.month_number_scanned
             """)
 
+            cur.execute("""
+                INSERT INTO crawl_image_counts (crawl_count, census_year, year_scanned, month_number_scanned)
+                SELECT crawl_count, census_year, year_scanned, month_number_scanned FROM group_counts
+                ON CONFLICT (census_year, year_scanned, month_number_scanned)
+                DO UPDATE SET crawl_count = EXCLUDED.crawl_count
+            """)
+            groups_updated = cur.rowcount
 
+            # touched groups with no images left (e.g. after reset_crawl)
+            cur.execute("""
+                DELETE FROM crawl_image_counts counts
+                USING touched_groups
+                WHERE counts.census_year = touched_groups.census_year
+                AND counts.year_scanned = touched_groups.year_scanned
+                AND counts.month_number_scanned = touched_groups.month_number_scanned
+                AND NOT EXISTS (
+                    SELECT 1 FROM group_counts
+                    WHERE group_counts.census_year = counts.census_year
+                    AND group_counts.year_scanned = counts.year_scanned
+                    AND group_counts.month_number_scanned = counts.month_number_scanned
+                )
+            """)
+            groups_deleted = cur.rowcount
 
+            cur.execute("""
+                UPDATE crawl_image_counts_refresh
+                SET refreshed_at = now()
+                WHERE id = 1
+            """)
 
-    def get_crawl_counts(self):
+        return {"mode": mode, "groups_updated": groups_updated, "groups_deleted": groups_deleted}
+
+    def __ensure_snapshot_tables(self, cur) -> None:
+
+        # tables unqualified so they resolve through the connection's search_path (PG_SCHEMA)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_image_counts (
+                crawl_count bigint NOT NULL,
+                census_year integer NOT NULL,
+                year_scanned integer NOT NULL,
+                month_number_scanned integer NOT NULL
+            )
+        """)
+
+        # also upgrades a table left behind by the old drop-and-rebuild, which had no key
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS crawl_image_counts_group_idx
+            ON crawl_image_counts (census_year, year_scanned, month_number_scanned)
+        """)
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_image_counts_refresh (
+                id integer PRIMARY KEY,
+                refreshed_at timestamp
+            )
+        """)
+
+        create_image_counts_dirty_table(cur)
 
-        result = []
+        cur.execute("INSERT INTO crawl_image_counts_refresh (id) VALUES (1) ON CONFLICT (id) DO NOTHING")
+
+    def get_crawl_counts(self):
 
         with getcursor() as cur:
 
             cur.execute(
                 """
-                    SELECT crawl_count, census_year, year_scanned, month_number_scanned
+                    SELECT crawl_count, census_year, year_scanned, month_number_scanned AS month_scanned
                     FROM crawl_image_counts        
                 """
             )
 
-            rows = cur.fetchall()
-
-        if rows:
-
-            for row in rows:
-                result.append(
-                    {
-                        "crawl_count": row[0],
-                        "census_year": row[1],
-                        "year_scanned": row[2],
-                        "month_scanned": row[3]
-                    }
-                )
-
-        return result
+            return fetch_all(cur, self.row_style)
 
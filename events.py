@@ -0,0 +1,240 @@
+import atexit
+import threading
+import time
+
+from collections import deque
+from data import SystemEventsRepository, system_event_row
+from typing import Optional
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK)
+
+
+class SystemEventSink:
+
+    """
+    Buffers system events in memory and writes them to system_events from a
+    background thread, one multi-row INSERT per batch. A batch goes out when
+    batch_size events are waiting or flush_interval seconds have passed.
+
+    The buffer holds at most buffer_size events. When it is full, overflow decides
+    what happens: drop_oldest (default) discards the oldest buffered event,
+    drop_newest discards the event being emitted, block waits for the writer.
+
+    emit(..., sync=True) flushes the buffer and writes the event before returning,
+    for fatal errors that must be on record even if the process dies next.
+    Buffered events are flushed at interpreter exit.
+    """
+
+    def __init__(self,
+                 repository=None,
+                 batch_size: int = 100,
+                 flush_interval: float = 2.0,
+                 buffer_size: int = 10000,
+                 overflow: str = OVERFLOW_DROP_OLDEST) -> None:
+
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+
+        self.__repository = repository
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__buffer_size = buffer_size
+        self.__overflow = overflow
+
+        self.__buffer = deque()
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__closed = False
+        self.__flush_requested = False
+        self.__in_flight = 0
+
+        self.__events_written = 0
+        self.__events_dropped = 0
+        self.__batches_written = 0
+        self.__write_errors = 0
+        self.__last_error = None
+
+    @property
+    def events_written(self) -> int:
+        return self.__events_written
+
+    @property
+    def events_dropped(self) -> int:
+        return self.__events_dropped
+
+    @property
+    def batches_written(self) -> int:
+        return self.__batches_written
+
+    @property
+    def write_errors(self) -> int:
+        return self.__write_errors
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        return self.__last_error
+
+    @property
+    def pending(self) -> int:
+        return len(self.__buffer) + self.__in_flight
+
+    def emit(self, message: str, severity: str, event_type: str, process: str, detail: str,
+             success: bool = True, sync: bool = False) -> Optional[int]:
+
+        if sync:
+            return self.__write_now(message, severity, event_type, process, detail, success)
+
+        row = system_event_row(message, severity, event_type, process, detail, success)
+
+        with self.__condition:
+
+            # once closed (e.g. during exit) nothing will drain the buffer, so write directly
+            if self.__closed:
+                self.__repository_instance().add_records([row])
+                return None
+
+            while len(self.__buffer) >= self.__buffer_size:
+
+                if self.__overflow == OVERFLOW_DROP_NEWEST:
+                    self.__events_dropped += 1
+                    return None
+
+                if self.__overflow == OVERFLOW_DROP_OLDEST:
+                    self.__buffer.popleft()
+                    self.__events_dropped += 1
+                    break
+
+                self.__condition.wait()
+
+            self.__buffer.append(row)
+
+            if len(self.__buffer) >= self.__batch_size:
+                self.__condition.notify_all()
+
+            if self.__thread is None:
+                self.__start()
+
+        return None
+
+    def flush(self, timeout: float = 10.0) -> bool:
+
+        """ Waits until everything emitted so far is written; False if timeout passed first """
+
+        deadline = time.monotonic() + timeout
+
+        with self.__condition:
+
+            self.__flush_requested = True
+            self.__condition.notify_all()
+
+            while self.__buffer or self.__in_flight:
+
+                if self.__thread is None or not self.__thread.is_alive():
+                    return False
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+
+                self.__condition.wait(remaining)
+
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+            thread = self.__thread
+
+        if thread is not None:
+            thread.join(timeout)
+
+        atexit.unregister(self.close)
+
+    def __repository_instance(self):
+
+        if self.__repository is None:
+            self.__repository = SystemEventsRepository()
+
+        return self.__repository
+
+    def __write_now(self, message, severity, event_type, process, detail, success) -> int:
+
+        # keep the fatal event after whatever led up to it
+        self.flush()
+
+        return self.__repository_instance().add_record(message, severity, event_type, process, detail, success)
+
+    def __start(self) -> None:
+
+        self.__thread = threading.Thread(target=self.__run, name="system-event-writer", daemon=True)
+        self.__thread.start()
+        atexit.register(self.close)
+
+    def __next_batch(self) -> list:
+
+        with self.__condition:
+
+            deadline = time.monotonic() + self.__flush_interval
+
+            while not self.__closed and not self.__flush_requested and len(self.__buffer) < self.__batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.__condition.wait(remaining)
+
+            batch = [self.__buffer.popleft() for _ in range(min(self.__batch_size, len(self.__buffer)))]
+            self.__in_flight = len(batch)
+
+            if not self.__buffer:
+                self.__flush_requested = False
+
+            return batch
+
+    def __run(self) -> None:
+
+        while True:
+
+            batch = self.__next_batch()
+
+            if not batch:
+                if self.__closed:
+                    return
+                continue
+
+            try:
+                self.__repository_instance().add_records(batch)
+                self.__events_written += len(batch)
+                self.__batches_written += 1
+            except Exception as ex:
+                self.__write_errors += 1
+                self.__last_error = ex
+                self.__requeue(batch)
+            finally:
+                with self.__condition:
+                    self.__in_flight = 0
+                    self.__condition.notify_all()
+
+    def __requeue(self, batch: list) -> None:
+
+        with self.__condition:
+
+            # a failing database must not stall exit; what's left is given up on close
+            if self.__closed:
+                self.__events_dropped += len(batch) + len(self.__buffer)
+                self.__buffer.clear()
+                return
+
+            room = self.__buffer_size - len(self.__buffer)
+            self.__events_dropped += max(len(batch) - room, 0)
+            self.__buffer.extendleft(reversed(batch[:max(room, 0)]))
+
+            # back off for an interval before trying the database again
+            self.__condition.wait(self.__flush_interval)
+
+
+system_event_sink = SystemEventSink()
@@ -1,6 +1,5 @@
 import os
 import smtplib
-from datetime import date
 from email import encoders
 from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
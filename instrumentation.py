@@ -0,0 +1,365 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from collections import deque
+from datetime import datetime
+from metrics import Histogram
+from psycopg2.extensions import cursor as pg_cursor
+
+# frames from these modules are plumbing, not the caller a statement is charged to
+PLUMBING_MODULES = ("instrumentation", "data", "rows", "contextlib", "psycopg2.extras")
+
+DEFAULT_SLOW_QUERY_SECONDS = 1.0
+DEFAULT_SNAPSHOT_INTERVAL = 30.0
+DEFAULT_SLOW_QUERY_HISTORY = 100
+
+# statement text and parameters are cut to this many characters in the slow query log
+MAX_LOGGED_TEXT = 4000
+
+EXPLAIN_SAVEPOINT = "ips_explain_capture"
+
+
+class InstrumentedCursor(pg_cursor):
+
+    """
+    Cursor handed out by getcursor()/getstreamingcursor() while instrumentation is
+    enabled. Times every execute, executemany and copy_expert and reports it,
+    with the rows it touched, to query_instrumentation.
+
+    A named (streaming) cursor's rows only arrive as it is iterated, after execute
+    returns, so they are reported when the cursor is closed.
+    """
+
+    # seconds getcursor() waited on the pool for this cursor's connection, charged to its first statement
+    pool_wait = 0.0
+
+    # the caller a named cursor's rows are charged to on close, and how many it has handed out
+    streamed_by = None
+    rows_fetched = 0
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except BaseException:
+            query_instrumentation.record(self, query, vars, time.perf_counter() - started, failed=True)
+            raise
+        query_instrumentation.record(self, query, vars, time.perf_counter() - started)
+        return result
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            result = super().executemany(query, vars_list)
+        except BaseException:
+            query_instrumentation.record(self, query, None, time.perf_counter() - started, failed=True)
+            raise
+        query_instrumentation.record(self, query, None, time.perf_counter() - started)
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            result = super().copy_expert(sql, file, size)
+        except BaseException:
+            query_instrumentation.record(self, sql, None, time.perf_counter() - started, failed=True)
+            raise
+        query_instrumentation.record(self, sql, None, time.perf_counter() - started)
+        return result
+
+    def __next__(self):
+        row = super().__next__()
+        self.rows_fetched += 1
+        return row
+
+    def fetchone(self):
+        row = super().fetchone()
+        self.rows_fetched += row is not None
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        self.rows_fetched += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self.rows_fetched += len(rows)
+        return rows
+
+    def close(self):
+        # rownumber only covers a named cursor's last FETCH, so its rows are counted as they are handed out
+        if self.streamed_by is not None:
+            query_instrumentation.record_rows(self.streamed_by, self.rows_fetched)
+            self.streamed_by = None
+        return super().close()
+
+
+class QueryInstrumentation:
+
+    """
+    Opt-in per statement timing for everything that goes through data.getcursor().
+
+    Each statement is charged to the repository method that issued it (the first
+    frame outside data.py's helpers) and aggregated per caller: calls, errors,
+    rows returned or affected, pool wait and a latency histogram. snapshot()
+    returns the aggregates; with snapshot_path set they are also written there as
+    JSON at most every snapshot_interval seconds.
+
+    Statements slower than slow_query_seconds are logged with their parameters.
+    With explain_slow, a slow SELECT is run again under EXPLAIN (ANALYZE, BUFFERS)
+    inside a savepoint and the plan is logged alongside it; other statements are
+    never re-run.
+
+    Off by default; enabling it only affects cursors checked out afterwards.
+    """
+
+    def __init__(self,
+                 enabled: bool = False,
+                 slow_query_seconds: float = DEFAULT_SLOW_QUERY_SECONDS,
+                 explain_slow: bool = False,
+                 snapshot_path: str = None,
+                 snapshot_interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+                 slow_query_history: int = DEFAULT_SLOW_QUERY_HISTORY) -> None:
+
+        self.__enabled = enabled
+        self.__slow_query_seconds = slow_query_seconds
+        self.__explain_slow = explain_slow
+        self.__snapshot_path = snapshot_path
+        self.__snapshot_interval = snapshot_interval
+
+        self.__lock = threading.Lock()
+        self.__callers = {}
+        self.__slow_queries = deque(maxlen=slow_query_history)
+        self.__slow_query_count = 0
+        self.__started = time.monotonic()
+        self.__last_snapshot = self.__started
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    @property
+    def slow_query_seconds(self) -> float:
+        return self.__slow_query_seconds
+
+    @property
+    def explain_slow(self) -> bool:
+        return self.__explain_slow
+
+    @property
+    def snapshot_path(self) -> str:
+        return self.__snapshot_path
+
+    @property
+    def cursor_factory(self):
+        # None leaves psycopg2's default cursor in place
+        return InstrumentedCursor if self.__enabled else None
+
+    def enable(self,
+               slow_query_seconds: float = None,
+               explain_slow: bool = None,
+               snapshot_path: str = None,
+               snapshot_interval: float = None) -> None:
+
+        if slow_query_seconds is not None:
+            self.__slow_query_seconds = slow_query_seconds
+        if explain_slow is not None:
+            self.__explain_slow = explain_slow
+        if snapshot_path is not None:
+            self.__snapshot_path = snapshot_path
+        if snapshot_interval is not None:
+            self.__snapshot_interval = snapshot_interval
+
+        self.__enabled = True
+
+    def disable(self) -> None:
+        self.__enabled = False
+
+    def reset(self) -> None:
+
+        with self.__lock:
+            self.__callers = {}
+            self.__slow_queries.clear()
+            self.__slow_query_count = 0
+            self.__started = time.monotonic()
+
+    def record(self, cur, query, params, elapsed: float, failed: bool = False) -> None:
+
+        caller = calling_method()
+
+        # the checkout wait belongs to the block, so only its first statement carries it
+        pool_wait = cur.pool_wait
+        cur.pool_wait = 0.0
+
+        rows = cur.rowcount if not failed and cur.rowcount > 0 else 0
+
+        if cur.name is not None and not failed:
+            rows = 0
+            cur.streamed_by = caller
+
+        with self.__lock:
+
+            stats = self.__callers.get(caller)
+
+            if stats is None:
+                stats = {"calls": 0, "errors": 0, "rows": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                         "pool_wait_seconds": 0.0, "slow_queries": 0,
+                         "latency": Histogram("ips_sql_statement_seconds", "Statement latency")}
+                self.__callers[caller] = stats
+
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["rows"] += rows
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            stats["pool_wait_seconds"] += pool_wait
+
+            slow = elapsed >= self.__slow_query_seconds
+
+            if slow:
+                stats["slow_queries"] += 1
+                self.__slow_query_count += 1
+
+        stats["latency"].observe(elapsed)
+
+        if slow:
+            self.__log_slow_query(cur, caller, query, params, elapsed, rows, pool_wait, failed)
+
+        if self.__snapshot_path and time.monotonic() - self.__last_snapshot >= self.__snapshot_interval:
+            self.write_snapshot()
+
+    def record_rows(self, caller: str, rows: int) -> None:
+
+        with self.__lock:
+            stats = self.__callers.get(caller)
+            if stats is not None:
+                stats["rows"] += rows
+
+    def snapshot(self) -> dict:
+
+        with self.__lock:
+            callers = {caller: dict(stats) for caller, stats in self.__callers.items()}
+            slow_queries = list(self.__slow_queries)
+            slow_query_count = self.__slow_query_count
+
+        for stats in callers.values():
+            stats["mean_seconds"] = stats["total_seconds"] / stats["calls"]
+            stats["latency"] = stats["latency"].snapshot()
+
+        return {
+            "created": str(datetime.now()),
+            "elapsed_seconds": time.monotonic() - self.__started,
+            "slow_query_seconds": self.__slow_query_seconds,
+            "statements": sum(stats["calls"] for stats in callers.values()),
+            "slow_query_count": slow_query_count,
+            "callers": dict(sorted(callers.items(), key=lambda item: item[1]["total_seconds"], reverse=True)),
+            "slow_queries": slow_queries
+        }
+
+    def write_snapshot(self, path: str = None) -> str:
+
+        path = path or self.__snapshot_path
+        self.__last_snapshot = time.monotonic()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        # readers never see a half written file
+        temp_path = path + ".tmp"
+
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, default=str, indent=2)
+
+        os.replace(temp_path, path)
+
+        return path
+
+    def __log_slow_query(self, cur, caller: str, query, params, elapsed: float,
+                         rows: int, pool_wait: float, failed: bool) -> None:
+
+        statement = statement_text(query)
+
+        entry = {
+            "date": str(datetime.now()),
+            "caller": caller,
+            "seconds": elapsed,
+            "rows": rows,
+            "pool_wait_seconds": pool_wait,
+            "failed": failed,
+            "statement": statement[:MAX_LOGGED_TEXT],
+            "params": repr(params)[:MAX_LOGGED_TEXT] if params is not None else None,
+            "plan": None
+        }
+
+        if self.__explain_slow and not failed and is_select(statement):
+            entry["plan"] = explain_analyze(cur, query, params)
+
+        with self.__lock:
+            self.__slow_queries.append(entry)
+
+        # imported here: logger writes to system_events through data, which imports this module
+        from logger import CrawlLogger
+        CrawlLogger().log_system_message(f"Slow query ({elapsed:.3f}s) from {caller}: {json.dumps(entry, default=str)}")
+
+
+def calling_method() -> str:
+
+    """ Class.method (or module.function) of the first frame outside the database plumbing """
+
+    frame = sys._getframe(2)
+
+    while frame is not None:
+
+        module = frame.f_globals.get("__name__", "")
+        instance = frame.f_locals.get("self")
+
+        if instance is not None and type(instance).__name__.endswith("Repository"):
+            return f"{type(instance).__name__}.{frame.f_code.co_name}"
+
+        if module not in PLUMBING_MODULES:
+            return f"{module}.{frame.f_code.co_name}"
+
+        frame = frame.f_back
+
+    return "unknown"
+
+
+def statement_text(query) -> str:
+
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", errors="replace")
+    elif not isinstance(query, str):
+        # psycopg2.sql composables need a connection to render; their repr is close enough for a log
+        query = repr(query)
+
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def is_select(statement: str) -> bool:
+    return statement[:7].upper() == "SELECT "
+
+
+def explain_analyze(cur, query, params) -> str:
+
+    # a plain cursor on the same connection, so named (streaming) cursors can be explained too;
+    # the savepoint keeps a failed EXPLAIN from aborting the caller's transaction
+    try:
+        with cur.connection.cursor() as explain:
+            explain.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            try:
+                explain.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + explain.mogrify(query, params))
+                plan = "\n".join(row[0] for row in explain.fetchall())
+            except Exception as e:
+                explain.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                plan = f"EXPLAIN failed: {e}"
+            explain.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        return plan
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+
+
+query_instrumentation = QueryInstrumentation()
@@ -0,0 +1,90 @@
+import bisect
+import threading
+
+from typing import Iterable, List
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> None:
+
+        self.name = name
+        self.help_text = help_text
+        self.__buckets = tuple(buckets)
+        self.__counts = [0] * (len(self.__buckets) + 1)
+        self.__sum = 0.0
+        self.__count = 0
+        self.__lock = threading.Lock()
+
+    def observe(self, value: float, count: int = 1) -> None:
+
+        index = bisect.bisect_left(self.__buckets, value)
+
+        with self.__lock:
+            self.__counts[index] += count
+            self.__sum += value * count
+            self.__count += count
+
+    def observe_many(self, values: List[float]) -> None:
+
+        # one lock round per reel rather than one per image
+        indexes = [bisect.bisect_left(self.__buckets, value) for value in values]
+
+        with self.__lock:
+            for index in indexes:
+                self.__counts[index] += 1
+            self.__sum += sum(values)
+            self.__count += len(values)
+
+    def snapshot(self) -> dict:
+
+        with self.__lock:
+            counts = list(self.__counts)
+            total = self.__sum
+            count = self.__count
+
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.__buckets + ("+Inf",), counts):
+            running += bucket_count
+            cumulative.append((str(bound), running))
+
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+    def prometheus(self, labels: str) -> List[str]:
+
+        snapshot = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+
+        for le, count in snapshot["buckets"]:
+            lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {count}')
+
+        lines.append(f"{self.name}_sum{{{labels}}} {snapshot['sum']}")
+        lines.append(f"{self.name}_count{{{labels}}} {snapshot['count']}")
+
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str) -> None:
+
+        self.name = name
+        self.help_text = help_text
+        self.__value = 0.0
+        self.__lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self.__lock:
+            self.__value += amount
+
+    @property
+    def value(self) -> float:
+        return self.__value
+
+    def prometheus(self, labels: str) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter",
+                f"{self.name}{{{labels}}} {self.__value}"]
@@ -0,0 +1,471 @@
+import argparse
+import bisect
+import json
+import math
+import time
+
+from datetime import datetime
+from itertools import accumulate, chain
+from operator import itemgetter
+from typing import Iterable, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STRATEGY_FFD = "ffd"
+STRATEGY_BFD = "bfd"
+STRATEGIES = (STRATEGY_FFD, STRATEGY_BFD)
+
+GROUP_CENSUS_YEAR = "census_year"
+GROUP_SCAN_MONTH = "scan_month"
+GROUPINGS = (None, GROUP_CENSUS_YEAR, GROUP_SCAN_MONTH)
+
+# DEFAULT.TB.SNOWBALL.STORAGE is in decimal terabytes, the way devices are sold
+BYTES_PER_TB = 1000 ** 4
+
+DEFAULT_SNOWBALL_NAME_FORMAT = "snowball_{number:04d}"
+
+
+# the packers run on NumPy arrays when it's installed and on plain lists otherwise
+if np is not None:
+
+    def _array(values) -> "np.ndarray":
+        return np.asarray(values, dtype=np.int64)
+
+    def _descending_order(sizes):
+        return np.argsort(-sizes, kind="stable")
+
+    def _take(values, order):
+        return values[order]
+
+    def _negate(values):
+        return -values
+
+    def _cumsum(values):
+        return np.cumsum(values)
+
+    def _search_left(values, value, lo: int = 0) -> int:
+        return lo + int(np.searchsorted(values[lo:], value, side="left"))
+
+    def _search_right(values, value) -> int:
+        return int(np.searchsorted(values, value, side="right"))
+
+    def _concat(parts):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _positions(count: int):
+        return np.arange(count)
+
+    def _to_list(values) -> list:
+        return values.tolist()
+
+else:
+
+    def _array(values) -> list:
+        return [int(value) for value in values]
+
+    def _descending_order(sizes):
+        return sorted(range(len(sizes)), key=sizes.__getitem__, reverse=True)
+
+    def _take(values, order):
+        return [values[index] for index in order]
+
+    def _negate(values):
+        return [-value for value in values]
+
+    def _cumsum(values):
+        return list(accumulate(values))
+
+    def _search_left(values, value, lo: int = 0) -> int:
+        return bisect.bisect_left(values, value, lo)
+
+    def _search_right(values, value) -> int:
+        return bisect.bisect_right(values, value)
+
+    def _concat(parts):
+        return list(chain.from_iterable(parts))
+
+    def _positions(count: int):
+        return list(range(count))
+
+    def _to_list(values) -> list:
+        return list(values)
+
+
+def _fill_ranges(sizes, negated, free: int) -> Tuple[List[Tuple[int, int]], int]:
+
+    """
+    The (start, stop) runs of sizes (largest first) that a first fit scan would put
+    into one bin with free bytes, and the bytes they use. Whole runs are found with
+    a cumulative sum instead of trying one size at a time.
+    """
+
+    ranges = []
+    used = 0
+    count = len(sizes)
+    start = _search_left(negated, -free)
+
+    while start < count:
+
+        # the run can't be longer than free // sizes[start] by much, so don't sum the whole tail
+        window = min(count - start, int(free // max(int(sizes[start]), 1)) * 2 + 64)
+        totals = _cumsum(sizes[start:start + window])
+        taken = _search_right(totals, free)
+
+        ranges.append((start, start + taken))
+        used = used + int(totals[taken - 1])
+        free = free - int(totals[taken - 1])
+
+        start = _search_left(negated, -free, start + taken)
+
+    return ranges, used
+
+
+def _without_ranges(values, ranges: List[Tuple[int, int]]):
+
+    kept = []
+    previous = 0
+
+    for start, stop in ranges:
+        kept.append(values[previous:start])
+        previous = stop
+
+    kept.append(values[previous:])
+
+    return _concat(kept)
+
+
+def first_fit_decreasing(sizes, free: List[int], capacity: int) -> Tuple[list, List[int]]:
+
+    """
+    sizes must be sorted largest first and none larger than capacity. free is the
+    space left in each existing bin, in the order they are tried. Returns the bin
+    of each size and the space left per bin, new bins numbered after existing ones.
+
+    First fit decreasing fills bins one after another: a bin ends up with exactly
+    what a greedy scan of the still unplaced sizes puts in it, so each bin is one
+    _fill_ranges pass rather than one search per size.
+    """
+
+    bins = _array([-1] * len(sizes))
+    pending = _positions(len(sizes))
+    pending_sizes = sizes
+    negated = _negate(sizes)
+    free = list(free)
+    index = 0
+
+    while len(pending):
+
+        if index == len(free):
+            free.append(capacity)
+
+        ranges, used = _fill_ranges(pending_sizes, negated, free[index])
+
+        if ranges:
+
+            placed = _concat([pending[start:stop] for start, stop in ranges])
+
+            if np is not None:
+                bins[placed] = index
+            else:
+                for position in placed:
+                    bins[position] = index
+
+            free[index] = free[index] - used
+            pending = _without_ranges(pending, ranges)
+            pending_sizes = _without_ranges(pending_sizes, ranges)
+            negated = _without_ranges(negated, ranges)
+
+        index = index + 1
+
+    return _to_list(bins), free
+
+
+def best_fit_decreasing(sizes, free: List[int], capacity: int) -> Tuple[list, List[int]]:
+
+    """
+    Same contract as first_fit_decreasing, but each size goes to the bin it leaves
+    the least space in. Every placement depends on the one before, so this walks
+    the sizes one at a time over a sorted list of bin free space.
+    """
+
+    sizes = _to_list(sizes)
+    free = list(free)
+    smallest = sizes[-1] if sizes else 0
+
+    # bins that can't take even the smallest size are never looked at again
+    open_bins = sorted((space, index) for index, space in enumerate(free) if space >= smallest)
+    spaces = [space for space, _ in open_bins]
+    owners = [index for _, index in open_bins]
+    bins = []
+
+    for size in sizes:
+
+        position = bisect.bisect_left(spaces, size)
+
+        if position == len(spaces):
+            index = len(free)
+            free.append(capacity - size)
+        else:
+            index = owners.pop(position)
+            spaces.pop(position)
+            free[index] = free[index] - size
+
+        if free[index] >= smallest:
+            position = bisect.bisect_left(spaces, free[index])
+            spaces.insert(position, free[index])
+            owners.insert(position, index)
+
+        bins.append(index)
+
+    return bins, free
+
+
+PACKERS = {
+    STRATEGY_FFD: first_fit_decreasing,
+    STRATEGY_BFD: best_fit_decreasing
+}
+
+
+class SnowballPacker:
+
+    """
+    Assigns snowball ready reels to snowballs by their total image bytes.
+
+    A snowball holds storage_tb, filled to at most fill_threshold of it (both
+    default to PickerSettings). Partially filled snowballs are topped up, fullest
+    first, before new ones are opened. Reels are placed largest first, into the
+    first snowball they fit (ffd) or the one they leave least space in (bfd).
+
+    group_by keeps census years or scan months together: each group is packed on
+    its own, and an existing snowball is only topped up by the group it already holds.
+
+    plan() only computes; run() loads from SnowballRepository, plans and, unless
+    dry_run, writes all the assignments in one transaction.
+    """
+
+    def __init__(self,
+                 strategy: str = STRATEGY_FFD,
+                 group_by: str = None,
+                 storage_tb: float = None,
+                 fill_threshold: float = None,
+                 snowball_name_format: str = DEFAULT_SNOWBALL_NAME_FORMAT,
+                 repository=None) -> None:
+
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {STRATEGIES}, got {strategy!r}")
+
+        if group_by not in GROUPINGS:
+            raise ValueError(f"group_by must be one of {GROUPINGS}, got {group_by!r}")
+
+        if storage_tb is None or fill_threshold is None:
+            from config import PickerSettings
+            settings = PickerSettings()
+            storage_tb = storage_tb if storage_tb is not None else settings.default_snowball_storage
+            fill_threshold = fill_threshold if fill_threshold is not None else settings.default_fill_threshold
+
+        self.__strategy = strategy
+        self.__group_by = group_by
+        self.__fill_threshold = fill_threshold
+        self.__capacity_bytes = int(storage_tb * BYTES_PER_TB)
+        self.__usable_bytes = int(self.__capacity_bytes * fill_threshold)
+        self.__snowball_name_format = snowball_name_format
+        self.__repository = repository
+
+    @property
+    def strategy(self) -> str:
+        return self.__strategy
+
+    @property
+    def group_by(self) -> str:
+        return self.__group_by
+
+    @property
+    def fill_threshold(self) -> float:
+        return self.__fill_threshold
+
+    @property
+    def capacity_bytes(self) -> int:
+        return self.__capacity_bytes
+
+    @property
+    def usable_bytes(self) -> int:
+        return self.__usable_bytes
+
+    def run(self, dry_run: bool = False) -> dict:
+
+        repository = self.__repository
+
+        if repository is None:
+            from data import SnowballRepository
+            repository = SnowballRepository()
+
+        grouped = self.__group_by is not None
+
+        plan = self.plan(repository.get_unassigned_reels(with_scan_key=grouped),
+                         repository.get_snowballs(),
+                         repository.get_snowball_scan_keys() if grouped else (),
+                         repository.get_unique_snowballs())
+
+        if not dry_run:
+            repository.assign_reels_to_snowballs(plan["assignments"])
+
+        plan["report"]["dry_run"] = dry_run
+
+        return plan
+
+    def plan(self,
+             reels: Iterable,
+             snowballs: Iterable,
+             snowball_scan_keys: Iterable = (),
+             snowball_names: Iterable[str] = ()) -> dict:
+
+        """
+        reels are get_unassigned_reels() rows (reel, bytes and, when grouping, the scan key),
+        snowballs are get_snowballs() rows (snowball, bytes_used). Returns the assignments,
+        in assign_reels_to_snowball's shape, the reels too big for any snowball and a report.
+        """
+
+        started = time.perf_counter()
+        usable = self.__usable_bytes
+
+        group_key = self.__group_key()
+        groups = {}
+        oversized = []
+        reels_considered = 0
+
+        for reel in reels:
+
+            reels_considered = reels_considered + 1
+            size = int(reel["bytes"])
+
+            if size > usable:
+                oversized.append(reel["reel"])
+                continue
+
+            identifiers, sizes = groups.setdefault(group_key(reel), ([], []))
+            identifiers.append(reel["reel"])
+            sizes.append(size)
+
+        snowball_groups = {}
+        for row in snowball_scan_keys:
+            snowball_groups.setdefault(row["snowball"], set()).add(group_key(row))
+
+        # fullest first, so partially filled snowballs are completed before emptier ones
+        existing = sorted(((row["snowball"], int(row["bytes_used"])) for row in snowballs
+                           if usable - int(row["bytes_used"]) > 0), key=lambda snowball: -snowball[1])
+
+        taken_names = set(snowball_names).union(row[0] for row in existing)
+        next_number = 1
+        assignments = []
+        new_snowballs_lower_bound = 0
+
+        for key in sorted(groups):
+
+            identifiers, sizes = groups[key]
+
+            if self.__group_by is None:
+                eligible = existing
+            else:
+                eligible = [snowball for snowball in existing if snowball_groups.get(snowball[0]) == {key}]
+
+            sizes = _array(sizes)
+            order = _descending_order(sizes)
+            bins, free = PACKERS[self.__strategy](_take(sizes, order), [usable - used for _, used in eligible], usable)
+
+            contents = [[] for _ in free]
+            totals = [0] * len(free)
+            sorted_sizes = _to_list(_take(sizes, order))
+
+            for position, index, size in zip(_to_list(order), bins, sorted_sizes):
+                contents[index].append(identifiers[position])
+                totals[index] = totals[index] + size
+
+            free_existing = sum(usable - used for _, used in eligible)
+            new_snowballs_lower_bound = new_snowballs_lower_bound + max(
+                math.ceil((sum(sorted_sizes) - free_existing) / usable), 0)
+
+            for index, assigned in enumerate(contents):
+
+                if not assigned:
+                    continue
+
+                if index < len(eligible):
+                    name, bytes_before = eligible[index]
+                else:
+                    while self.__snowball_name_format.format(number=next_number) in taken_names:
+                        next_number = next_number + 1
+                    name, bytes_before = self.__snowball_name_format.format(number=next_number), 0
+                    taken_names.add(name)
+
+                assignments.append({
+                    "snowball": name,
+                    "total_bytes": totals[index],
+                    "reels": assigned,
+                    "new": index >= len(eligible),
+                    "group": key,
+                    "bytes_before": bytes_before,
+                    "fill": (bytes_before + totals[index]) / self.__capacity_bytes
+                })
+
+        return {
+            "assignments": assignments,
+            "oversized_reels": oversized,
+            "report": self.__report(assignments, reels_considered, len(oversized), len(groups),
+                                    new_snowballs_lower_bound, time.perf_counter() - started)
+        }
+
+    def __group_key(self):
+
+        if self.__group_by == GROUP_CENSUS_YEAR:
+            return itemgetter("census_year")
+
+        if self.__group_by == GROUP_SCAN_MONTH:
+            return itemgetter("census_year", "year_scanned", "month_number_scanned")
+
+        return lambda row: None
+
+    def __report(self, assignments: list, reels_considered: int, reels_oversized: int, groups: int,
+                 new_snowballs_lower_bound: int, seconds: float) -> dict:
+
+        new = [assignment for assignment in assignments if assignment["new"]]
+        topped_up = [assignment for assignment in assignments if not assignment["new"]]
+        new_fills = [assignment["total_bytes"] / self.__usable_bytes for assignment in new]
+
+        return {
+            "date_planned": str(datetime.now()),
+            "strategy": self.__strategy,
+            "group_by": self.__group_by,
+            "groups": groups,
+            "vectorised": np is not None,
+            "snowball_capacity_bytes": self.__capacity_bytes,
+            "usable_capacity_bytes": self.__usable_bytes,
+            "fill_threshold": self.__fill_threshold,
+            "reels_considered": reels_considered,
+            "reels_assigned": sum(len(assignment["reels"]) for assignment in assignments),
+            "reels_oversized": reels_oversized,
+            "bytes_assigned": sum(assignment["total_bytes"] for assignment in assignments),
+            "snowballs_topped_up": len(topped_up),
+            "bytes_topped_up": sum(assignment["total_bytes"] for assignment in topped_up),
+            "new_snowballs": len(new),
+            "new_snowballs_lower_bound": new_snowballs_lower_bound,
+            # bytes in new snowballs over what the new snowballs could have held under the threshold
+            "new_snowball_efficiency": sum(new_fills) / len(new_fills) if new_fills else None,
+            "new_snowball_min_fill": min(new_fills) if new_fills else None,
+            "pack_seconds": seconds
+        }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Assign snowball ready reels to snowballs")
+    parser.add_argument("--strategy", choices=STRATEGIES, default=STRATEGY_FFD)
+    parser.add_argument("--group-by", choices=[grouping for grouping in GROUPINGS if grouping])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    plan = SnowballPacker(args.strategy, args.group_by).run(args.dry_run)
+
+    print(json.dumps(plan["report"], indent=2))
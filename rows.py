@@ -0,0 +1,172 @@
+import keyword
+
+from collections import namedtuple
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+ROW_DICT = "dict"
+ROW_RECORD = "record"
+ROW_NAMEDTUPLE = "namedtuple"
+ROW_TUPLE = "tuple"
+ROW_SCALAR = "scalar"
+ROW_STYLES = (ROW_DICT, ROW_RECORD, ROW_NAMEDTUPLE, ROW_TUPLE, ROW_SCALAR)
+
+
+class RowRecord(Mapping):
+
+    """
+    Base for the __slots__ record classes built per result shape.
+    Reads like the dicts repositories return (record["id"], .get, .items) as well
+    as by attribute (record.id), without a dict per row. It is not a dict: it has
+    no room for new keys and json needs to_dict(), so it is opt-in per repository.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def copy(self) -> "RowRecord":
+        return self._make(tuple(getattr(self, name) for name in self.__slots__))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    # the generated classes can't be found by name, so pickle rebuilds them from the slot names
+    def __reduce__(self):
+        return (rebuild_record, (self.__slots__, tuple(getattr(self, name) for name in self.__slots__)))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+def column_names(description, names: Sequence[str] = None) -> tuple:
+
+    # names overrides cursor.description, e.g. for SELECT * from a view
+    names = names if names is not None else [column[0] for column in description]
+
+    result = []
+
+    for index, name in enumerate(names):
+        if not name.isidentifier() or keyword.iskeyword(name) or name.startswith("_") or name in result:
+            name = f"column_{index}"
+        result.append(name)
+
+    return tuple(result)
+
+
+@lru_cache(maxsize=256)
+def record_class(names: tuple) -> type:
+
+    # one generated assignment statement fills every slot straight from the row tuple
+    targets = ", ".join(f"record.{name}" for name in names) + ("," if len(names) == 1 else "")
+    source = (f"def _make(row):\n"
+              f"    record = _new(cls)\n"
+              f"    {targets} = row\n"
+              f"    return record\n")
+
+    cls = type("Row", (RowRecord,), {"__slots__": names})
+    namespace = {"_new": object.__new__, "cls": cls}
+    exec(source, namespace)
+    cls._make = staticmethod(namespace["_make"])
+
+    return cls
+
+
+@lru_cache(maxsize=256)
+def dict_factory(keys: tuple) -> Callable:
+
+    # a generated dict display is cheaper per row than dict(zip(keys, row))
+    items = ", ".join(f"{key!r}: row[{index}]" for index, key in enumerate(keys))
+    namespace = {}
+    exec(f"def _make(row):\n    return {{{items}}}\n", namespace)
+
+    return namespace["_make"]
+
+
+def rebuild_record(names: tuple, values: tuple) -> RowRecord:
+    return record_class(names)._make(values)
+
+
+@lru_cache(maxsize=256)
+def namedtuple_class(names: tuple) -> type:
+    return namedtuple("Row", names)
+
+
+def row_factory(description, style: str = ROW_DICT, names: Sequence[str] = None) -> Optional[Callable]:
+
+    """ Builds the row -> object function once per result; None means rows are used as they are """
+
+    if style == ROW_TUPLE:
+        return None
+
+    if style == ROW_DICT:
+        return dict_factory(tuple(names if names is not None else [column[0] for column in description]))
+
+    if style == ROW_SCALAR:
+        return lambda row: row[0]
+
+    if style == ROW_NAMEDTUPLE:
+        return namedtuple_class(column_names(description, names))._make
+
+    if style == ROW_RECORD:
+        return record_class(column_names(description, names))._make
+
+    raise ValueError(f"Unknown row style: {style}, expected one of {ROW_STYLES}")
+
+
+def map_rows(rows: Iterable, description, style: str = ROW_DICT, names: Sequence[str] = None) -> List:
+
+    factory = row_factory(description, style, names)
+
+    if factory is None:
+        return list(rows)
+
+    return list(map(factory, rows))
+
+
+def fetch_all(cur, style: str = ROW_DICT, names: Sequence[str] = None) -> List:
+    return map_rows(cur.fetchall(), cur.description, style, names)
+
+
+def fetch_one(cur, style: str = ROW_DICT, names: Sequence[str] = None):
+
+    row = cur.fetchone()
+
+    if row is None:
+        return None
+
+    factory = row_factory(cur.description, style, names)
+
+    return row if factory is None else factory(row)
+
+
+def iter_rows(cur, style: str = ROW_DICT, names: Sequence[str] = None) -> Iterator:
+
+    """ For named (streaming) cursors, whose description is only known after the first fetch """
+
+    factory = None
+    rows = iter(cur)
+
+    for row in rows:
+
+        if factory is None:
+            factory = row_factory(cur.description, style, names) or (lambda value: value)
+
+        yield factory(row)
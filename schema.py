@@ -0,0 +1,257 @@
+import argparse
+
+import data
+
+from typing import List, Tuple
+from psycopg2 import sql as pgsql
+from data import create_scan_partition, getcursor, SCAN_PARTITION_KEY
+
+
+class PartitionMigrationError(Exception):
+    pass
+
+
+class PartitionMigration:
+
+    """
+    One-off migration of reels and images to tables range partitioned on
+    (census_year, year_scanned, month_number_scanned), one partition per scan folder.
+
+    images gains the three key columns (copied from its reel) so both tables prune
+    to the same slice, and reset_crawl can truncate a month instead of deleting it.
+    Runs in a single transaction; the original tables are kept as *_unpartitioned
+    unless drop_unpartitioned is set. Columns, defaults, check constraints and
+    non-unique indexes carry over; the migration refuses to run (and changes
+    nothing) while any image has no reel to take its scan key from, while any
+    reel has a null scan key column (the new primary key includes them), or while
+    either table has a unique index other than its primary key, since a
+    partitioned table can't enforce one that leaves out the partition key.
+    """
+
+    def __init__(self, drop_unpartitioned: bool = False) -> None:
+        self.__drop_unpartitioned = drop_unpartitioned
+
+    def run(self) -> List[Tuple[int, int, int]]:
+
+        with getcursor() as cur:
+
+            if data.schema_is_partitioned(cur):
+                return []
+
+            self.__check_null_scan_keys(cur)
+            self.__check_orphaned_images(cur)
+            self.__check_unique_indexes(cur)
+
+            views = self.__dependent_views(cur)
+
+            for schema_name, view_name, is_materialized, _ in reversed(views):
+                kind = "MATERIALIZED VIEW" if is_materialized else "VIEW"
+                cur.execute(pgsql.SQL("DROP " + kind + " {}.{}").format(
+                    pgsql.Identifier(schema_name), pgsql.Identifier(view_name)))
+
+            cur.execute("ALTER TABLE images RENAME TO images_unpartitioned")
+            cur.execute("ALTER TABLE reels RENAME TO reels_unpartitioned")
+
+            self.__create_reels(cur)
+            self.__create_images(cur)
+
+            cur.execute("SELECT DISTINCT census_year, year_scanned, month_number_scanned FROM reels_unpartitioned")
+            scan_keys = [tuple(row) for row in cur.fetchall()]
+
+            for census_year, year_scanned, month_scanned in scan_keys:
+                for table in ("reels", "images"):
+                    create_scan_partition(cur, table, census_year, year_scanned, month_scanned)
+
+            # a row for a scan folder with no partition of its own still has somewhere to go;
+            # null keys never get here, the primary key makes the key columns NOT NULL
+            cur.execute("CREATE TABLE reels_default PARTITION OF reels DEFAULT")
+            cur.execute("CREATE TABLE images_default PARTITION OF images DEFAULT")
+
+            self.__copy_rows(cur)
+            self.__move_sequence(cur)
+
+            cur.execute("""
+                ALTER TABLE images ADD CONSTRAINT images_reel_scan_fkey
+                FOREIGN KEY (reel_id, census_year, year_scanned, month_number_scanned)
+                REFERENCES reels (id, census_year, year_scanned, month_number_scanned)
+            """)
+            cur.execute("CREATE INDEX images_reel_id_idx ON images (reel_id)")
+            cur.execute("CREATE INDEX reels_scan_identifier_idx ON reels (scan_identifier)")
+
+            for table in ("reels", "images"):
+                self.__copy_indexes(cur, table)
+
+            for schema_name, view_name, is_materialized, definition in views:
+                kind = "MATERIALIZED VIEW" if is_materialized else "VIEW"
+                cur.execute(pgsql.SQL("CREATE " + kind + " {}.{} AS ").format(
+                    pgsql.Identifier(schema_name), pgsql.Identifier(view_name)) + pgsql.SQL(definition))
+
+            if self.__drop_unpartitioned:
+                cur.execute("DROP TABLE images_unpartitioned")
+                cur.execute("DROP TABLE reels_unpartitioned")
+
+        data._partitioned_schema = None
+        data._known_partitions.update(scan_keys)
+
+        return scan_keys
+
+    def __dependent_views(self, cur) -> List[tuple]:
+
+        # views and materialized views reference the old tables by oid, so they are
+        # saved, dropped and recreated against the partitioned tables
+        cur.execute("""
+            SELECT DISTINCT v.oid, n.nspname, v.relname, v.relkind = 'm', pg_get_viewdef(v.oid)
+            FROM pg_depend d
+            INNER JOIN pg_rewrite r ON r.oid = d.objid
+            INNER JOIN pg_class v ON v.oid = r.ev_class
+            INNER JOIN pg_namespace n ON n.oid = v.relnamespace
+            WHERE d.refobjid IN (to_regclass('reels'), to_regclass('images'))
+            AND v.oid NOT IN (to_regclass('reels'), to_regclass('images'))
+            ORDER BY v.oid
+        """)
+
+        return [row[1:] for row in cur.fetchall()]
+
+    def __check_null_scan_keys(self, cur) -> None:
+
+        # the copy would fail on the first such reel, after the tables had been swapped
+        null_key = pgsql.SQL(" OR ").join(pgsql.SQL("{} IS NULL").format(pgsql.Identifier(name))
+                                          for name in SCAN_PARTITION_KEY)
+        cur.execute(pgsql.SQL("SELECT count(*), (array_agg(id ORDER BY id))[1:10] FROM reels WHERE {}")
+                    .format(null_key))
+        count, sample = cur.fetchone()
+
+        if count:
+            raise PartitionMigrationError(f"{count} reels have a null census_year, year_scanned or "
+                                          f"month_number_scanned (first reel ids: {sample}); "
+                                          f"fill in or delete them before migrating")
+
+    def __check_orphaned_images(self, cur) -> None:
+
+        # an image without a reel has no scan key, so there is no partition to copy it to
+        cur.execute("""
+            SELECT count(*), (array_agg(i.id ORDER BY i.id))[1:10]
+            FROM images i LEFT JOIN reels r ON r.id = i.reel_id
+            WHERE r.id IS NULL
+        """)
+        count, sample = cur.fetchone()
+
+        if count:
+            raise PartitionMigrationError(f"{count} images have no matching reel (first image ids: {sample}); "
+                                          f"delete or re-point them before migrating")
+
+    def __check_unique_indexes(self, cur) -> None:
+
+        cur.execute("""
+            SELECT indexrelid::regclass::text FROM pg_index
+            WHERE indrelid IN (to_regclass('reels'), to_regclass('images'))
+            AND indisunique AND NOT indisprimary
+        """)
+        unique_indexes = [row[0] for row in cur.fetchall()]
+
+        if unique_indexes:
+            raise PartitionMigrationError(f"Unique indexes {unique_indexes} can't be carried over to the "
+                                          f"partitioned tables without the partition key columns")
+
+    def __copy_indexes(self, cur, table: str) -> None:
+
+        # the primary key is replaced by one that includes the partition key; every other index
+        # is rebuilt under a generated name, since the old one still belongs to *_unpartitioned
+        cur.execute("""
+            SELECT pg_get_indexdef(indexrelid) FROM pg_index
+            WHERE indrelid = to_regclass(%s) AND NOT indisprimary
+            ORDER BY indexrelid
+        """, (f"{table}_unpartitioned",))
+
+        for (definition,) in cur.fetchall():
+            method_and_columns = definition[definition.index(" USING "):]
+            cur.execute(pgsql.SQL("CREATE INDEX ON {}").format(pgsql.Identifier(table)) + pgsql.SQL(method_and_columns))
+
+    def __create_reels(self, cur) -> None:
+
+        # INCLUDING ALL but indexes: the old primary key on id alone can't exist on a partitioned table
+        cur.execute("""
+            CREATE TABLE reels (
+                LIKE reels_unpartitioned INCLUDING ALL EXCLUDING INDEXES,
+                CONSTRAINT reels_scan_pkey PRIMARY KEY (id, census_year, year_scanned, month_number_scanned)
+            ) PARTITION BY RANGE (census_year, year_scanned, month_number_scanned)
+        """)
+
+    def __create_images(self, cur) -> None:
+
+        key_columns = [pgsql.SQL("{} {} NOT NULL").format(pgsql.Identifier(name), pgsql.SQL(data_type))
+                       for name, data_type in self.__key_types(cur)]
+
+        cur.execute(pgsql.SQL("""
+            CREATE TABLE images (
+                LIKE images_unpartitioned INCLUDING ALL EXCLUDING INDEXES,
+                {},
+                CONSTRAINT images_scan_pkey PRIMARY KEY (id, census_year, year_scanned, month_number_scanned)
+            ) PARTITION BY RANGE (census_year, year_scanned, month_number_scanned)
+        """).format(pgsql.SQL(", ").join(key_columns)))
+
+    def __key_types(self, cur) -> List[Tuple[str, str]]:
+
+        cur.execute("""
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_attribute a
+            WHERE a.attrelid = to_regclass('reels_unpartitioned') AND a.attname = ANY(%s)
+        """, (list(SCAN_PARTITION_KEY),))
+
+        types = dict(cur.fetchall())
+
+        return [(name, types[name]) for name in SCAN_PARTITION_KEY]
+
+    def __copy_rows(self, cur) -> None:
+
+        reel_columns = pgsql.SQL(", ").join(pgsql.Identifier(name) for name in self.__columns(cur, "reels_unpartitioned"))
+
+        cur.execute(pgsql.SQL("INSERT INTO reels ({0}) SELECT {0} FROM reels_unpartitioned").format(reel_columns))
+
+        image_columns = self.__columns(cur, "images_unpartitioned")
+        key_columns = pgsql.SQL(", ").join(pgsql.Identifier(name) for name in SCAN_PARTITION_KEY)
+
+        cur.execute(pgsql.SQL("""
+            INSERT INTO images ({}, {})
+            SELECT {}, {}
+            FROM images_unpartitioned i INNER JOIN reels_unpartitioned r ON r.id = i.reel_id
+        """).format(pgsql.SQL(", ").join(pgsql.Identifier(name) for name in image_columns),
+                    key_columns,
+                    pgsql.SQL(", ").join(pgsql.Identifier("i", name) for name in image_columns),
+                    pgsql.SQL(", ").join(pgsql.Identifier("r", name) for name in SCAN_PARTITION_KEY)))
+
+    def __columns(self, cur, table: str) -> List[str]:
+
+        cur.execute("""
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+        """, (table,))
+
+        return [row[0] for row in cur.fetchall()]
+
+    def __move_sequence(self, cur) -> None:
+
+        # the id defaults still point at the serial sequences, which would be dropped
+        # with the old tables unless ownership moves across
+        for table in ("reels", "images"):
+
+            cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (f"{table}_unpartitioned",))
+            sequence = cur.fetchone()[0]
+
+            if sequence is None:
+                continue
+
+            cur.execute(pgsql.SQL("ALTER SEQUENCE {} OWNED BY {}.id").format(
+                pgsql.SQL(sequence), pgsql.Identifier(table)))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Partition reels and images by scan folder")
+    parser.add_argument("--drop-unpartitioned", action="store_true")
+    args = parser.parse_args()
+
+    created = PartitionMigration(args.drop_unpartitioned).run()
+
+    print(f"Created {len(created)} scan folder partitions")
@@ -0,0 +1,154 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import config as app_config
+
+# the baseline schema the application was written against, before any migration
+BASELINE_SCHEMA = """
+create table system_events(id serial primary key, message text, host text, severity text, type text,
+                           date timestamp, success bool, process text, detail text);
+create table crawl_status(id serial primary key, census_year int, month_scanned int, year_scanned int,
+                          date_completed timestamp);
+create table crawl_operations(id serial primary key, crawl_status_id int references crawl_status(id),
+                              date_crawled timestamp, reels_parsed int, images_parsed int, crawl_time interval);
+create table reels(id serial primary key, census_year int, month_name_scanned text, month_number_scanned int,
+                   year_scanned int, scan_identifier text, snowball_export_date timestamp, move_flag bool,
+                   target_snowball text);
+create table images(id serial primary key, reel_id int references reels(id), filename text, filesize bigint,
+                    image_filepath text);
+create materialized view mvw_snowballreadyreels as
+    select r.scan_identifier, sum(i.filesize) total_image_bytes
+    from reels r join images i on i.reel_id = r.id
+    where r.target_snowball is null
+    group by r.scan_identifier;
+create view vw_1960scanmanifest as
+    select r.scan_identifier, r.month_name_scanned || r.year_scanned scanned_period,
+           r.scan_identifier reel_location, count(i.id) image_count
+    from reels r left join images i on i.reel_id = r.id
+    where r.census_year = 1960
+    group by 1, 2, 3;
+"""
+
+TEST_SCHEMA = f"ips_test_{os.getpid()}"
+
+
+def pytest_configure(config):
+
+    # every settings class reads config.env_file at call time; point it at a throwaway file
+    settings_dir = config.rootpath / ".pytest_cache"
+    os.makedirs(settings_dir, exist_ok=True)
+    settings_file = os.path.join(settings_dir, f"test-{os.getpid()}.env")
+
+    with open(settings_file, "w", encoding="utf-8") as f:
+        f.write("[database]\n")
+        f.write(f"PGSQL.HOST = {os.environ.get('IPS_TEST_PGHOST', 'localhost')}\n")
+        f.write(f"PGSQL.PORT = {os.environ.get('IPS_TEST_PGPORT', '5432')}\n")
+        f.write(f"PGSQL.USER = {os.environ.get('IPS_TEST_PGUSER', 'postgres')}\n")
+        f.write(f"PGSQL.DATABASE = {os.environ.get('IPS_TEST_PGDATABASE', 'postgres')}\n")
+        f.write(f"PGSQL.SCHEMA = {TEST_SCHEMA}\n")
+        f.write("[crawler]\n")
+        f.write("DEFAULT.REEL.BATCH.SIZE = 0\n")
+        f.write("BASE.REEL.LOCATION = /tmp\n")
+        f.write("EXPORT.JSON.DATA = false\n")
+        f.write("ENABLE.EMAIL.NOTIFICATIONS = false\n")
+        for census_year in (1960, 1970, 1980, 1990):
+            f.write(f"{census_year}.target.extensions = .jpg\n")
+        f.write("[picker]\n")
+        f.write("DEFAULT.TB.SNOWBALL.STORAGE = 80\n")
+        f.write("DEFAULT.FILL.THRESHOLD = 0.95\n")
+
+    app_config.env_file = settings_file
+
+
+def make_reel(scan_dir: str, scan_identifier: str, frames: int, frame_bytes: int = 10,
+              extension: str = ".jpg") -> str:
+
+    """ One reel directory with sparse frame files; returns the reel path """
+
+    frames_dir = os.path.join(scan_dir, scan_identifier, "frames")
+    os.makedirs(frames_dir, exist_ok=True)
+
+    for frame_number in range(frames):
+        with open(os.path.join(frames_dir, f"{frame_number:08d}{extension}"), "wb") as f:
+            f.truncate(frame_bytes)
+
+    return os.path.join(scan_dir, scan_identifier)
+
+
+def sample_reel(scan_identifier: str, frames: int = 3, census_year: int = 1960, scan_folder=(3, 2022)) -> dict:
+
+    """ A reel as ReelCrawler hands it to the repositories, without touching the filesystem """
+
+    from datetime import date
+    from crawler.models import ParsedImages
+
+    month, year = scan_folder
+    images = ParsedImages(f"/isilon/{census_year}/{year}/{scan_identifier}/frames")
+
+    for frame_number in range(frames):
+        images.append(f"{frame_number:08d}.jpg", 100 + frame_number)
+
+    return {"census_year": census_year, "scan_identifier": scan_identifier, "scan_month": month,
+            "scan_year": year, "scan_month_name": date(year, month, 1).strftime("%b"),
+            "reel_filepath": f"/isilon/{census_year}/{year}/{scan_identifier}", "parsed_images": images}
+
+
+@pytest.fixture
+def database():
+
+    """ The data module connected to an empty baseline schema; skipped without IPS_TEST_PGHOST """
+
+    if not os.environ.get("IPS_TEST_PGHOST"):
+        pytest.skip("set IPS_TEST_PGHOST (and IPS_TEST_PGPORT/USER/DATABASE) to run database tests")
+
+    import psycopg2
+    import data
+
+    settings = app_config.DatabaseSettings()
+
+    with psycopg2.connect(host=settings.host, port=settings.port, user=settings.user,
+                          dbname=settings.database) as con:
+        with con.cursor() as cur:
+            cur.execute(f"drop schema if exists {TEST_SCHEMA} cascade")
+            cur.execute(f"create schema {TEST_SCHEMA}")
+            cur.execute(f"set search_path to {TEST_SCHEMA}")
+            cur.execute(BASELINE_SCHEMA)
+    con.close()
+
+    reset_data_module(data)
+
+    yield data
+
+    reset_data_module(data)
+
+    with psycopg2.connect(host=settings.host, port=settings.port, user=settings.user,
+                          dbname=settings.database) as con:
+        with con.cursor() as cur:
+            cur.execute(f"drop schema if exists {TEST_SCHEMA} cascade")
+    con.close()
+
+
+@pytest.fixture
+def migrated_database(database):
+
+    """ database after schema.PartitionMigration has partitioned reels and images """
+
+    from schema import PartitionMigration
+
+    PartitionMigration().run()
+
+    yield database
+
+
+def reset_data_module(data) -> None:
+
+    # module level caches outlive a schema; start each test from nothing
+    data.connection_pool.closeall()
+    data.lookup_cache.clear()
+    data._partitioned_schema = None
+    data._known_partitions.clear()
@@ -0,0 +1,69 @@
+from conftest import make_reel
+from crawler.checkpoint import CrawlCheckpoint
+from crawler.parameters import CrawlEngineParameters
+from crawler.service import ReelCrawler
+
+
+def reel(scan_identifier: str) -> dict:
+    return {"scan_identifier": scan_identifier, "parsed_images": [1, 2, 3]}
+
+
+def test_checkpoint_survives_a_restart(tmp_path):
+
+    path = str(tmp_path / "1960.checkpoint.jsonl")
+
+    CrawlCheckpoint(path, 1960, (3, 2022)).record([reel("R1"), reel("R2")])
+    reloaded = CrawlCheckpoint(path, 1960, (3, 2022))
+
+    assert reloaded.committed == {"R1", "R2"}
+    assert reloaded.is_committed("R1")
+    assert not reloaded.is_committed("R3")
+    assert reloaded.skipped_reels == []
+
+
+def test_checkpoint_ignores_other_scan_folders_and_torn_lines(tmp_path):
+
+    path = str(tmp_path / "1960.checkpoint.jsonl")
+
+    CrawlCheckpoint(path, 1960, (4, 2022)).record([reel("OTHER")])
+    CrawlCheckpoint(path, 1960, (3, 2022)).record([reel("R1")])
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"census_year": 1960, "scan_fol')
+
+    assert CrawlCheckpoint(path, 1960, (3, 2022)).committed == {"R1"}
+
+
+def test_cleared_checkpoint_starts_over(tmp_path):
+
+    path = str(tmp_path / "1960.checkpoint.jsonl")
+    checkpoint = CrawlCheckpoint(path, 1960, (3, 2022))
+    checkpoint.record([reel("R1")])
+    checkpoint.skip("R1")
+    checkpoint.clear()
+
+    assert checkpoint.committed == set()
+    assert checkpoint.skipped_reels == []
+    assert CrawlCheckpoint(path, 1960, (3, 2022)).committed == set()
+
+
+def test_resumed_crawl_skips_committed_reels(tmp_path):
+
+    def parameters():
+        return CrawlEngineParameters(1960, str(tmp_path / "isilon"), (3, 2022),
+                                     checkpoint_dir=str(tmp_path / "checkpoints"))
+
+    for reel_number in range(4):
+        make_reel(parameters().scan_dir, f"1960-R{reel_number:04d}", 2)
+
+    crawler = ReelCrawler(parameters())
+    results = crawler.run_crawl()
+    crawler.commit_reels([next(results)["reel"], next(results)["reel"]])
+    results.close()
+
+    resumed = ReelCrawler(parameters())
+    rest = [result["reel"]["scan_identifier"] for result in resumed.run_crawl()]
+
+    assert len(rest) == 2
+    assert set(rest).isdisjoint(resumed.checkpoint.skipped_reels)
+    assert len(resumed.checkpoint.skipped_reels) == 2
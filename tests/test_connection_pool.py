@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+
+def test_pool_waits_for_a_free_slot(database):
+
+    from psycopg2.pool import PoolError
+
+    pool = database.ConnectionPool(1, 1, user=database.PG_USER, database=database.PG_DATABASE,
+                                   host=database.PG_HOST, port=database.PG_PORT)
+    con = pool.getconn()
+
+    with pytest.raises(PoolError):
+        pool.getconn(timeout=0.05)
+
+    pool.putconn(con)
+    pool.putconn(pool.getconn(timeout=0.05))
+
+    assert pool.stats()["checkouts"] == 2
+    assert pool.in_use == 0
+    pool.closeall()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_starts_from_an_empty_pool(database):
+
+    pool = database.connection_pool
+    held = [pool.getconn() for _ in range(pool.maxconn)]
+
+    read, write = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        # every slot is taken in the parent; the child must still get a connection of its own
+        try:
+            os.close(read)
+            fresh = pool.stats()
+            con = pool.getconn(timeout=5)
+            with con.cursor() as cur:
+                cur.execute("SELECT 1")
+            pool.putconn(con)
+            ok = fresh["in_use"] == 0 and fresh["checkouts"] == 0 and not fresh["initialised"]
+            os.write(write, b"ok" if ok else repr(fresh).encode())
+        except BaseException as ex:
+            os.write(write, repr(ex).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write)
+    os.waitpid(pid, 0)
+    result = os.read(read, 4096)
+    os.close(read)
+
+    # the child left the parent's sessions alone
+    for con in held:
+        with con.cursor() as cur:
+            cur.execute("SELECT 1")
+        pool.putconn(con)
+
+    assert result == b"ok"
+    assert pool.in_use == 0
@@ -1 +1,165 @@
+import os
 
+import pytest
+
+from conftest import make_reel
+from crawler.parameters import CrawlEngineParameters, STAT_DEFERRED, STAT_INLINE, STAT_NONE
+from crawler.service import STAT_CHUNK_SIZE, ReelCrawler
+
+SCAN_FOLDER = (3, 2022)
+
+
+def crawl_parameters(isilon_root, **kwargs) -> CrawlEngineParameters:
+    return CrawlEngineParameters(1960, str(isilon_root), SCAN_FOLDER, **kwargs)
+
+
+def scan_tree(isilon_root, reels: int = 6, frames: int = 3) -> str:
+
+    scan_dir = crawl_parameters(isilon_root).scan_dir
+
+    for reel_number in range(reels):
+        make_reel(scan_dir, f"1960-R{reel_number:04d}", frames + reel_number)
+
+    return scan_dir
+
+
+def crawled(crawler: ReelCrawler) -> dict:
+    return {result["reel"]["scan_identifier"]: result["reel"] for result in crawler.run_crawl()}
+
+
+def test_concurrent_crawl_matches_serial_crawl(tmp_path):
+
+    scan_tree(tmp_path)
+
+    serial = crawled(ReelCrawler(crawl_parameters(tmp_path)))
+    concurrent = crawled(ReelCrawler(crawl_parameters(tmp_path, max_workers=4)))
+
+    assert len(serial) == 6
+    assert serial.keys() == concurrent.keys()
+
+    for scan_identifier, reel in serial.items():
+        assert reel["parsed_images"].to_list() == concurrent[scan_identifier]["parsed_images"].to_list()
+
+
+def test_ordered_concurrent_crawl_keeps_listing_order(tmp_path):
+
+    scan_dir = scan_tree(tmp_path, reels=12)
+    listing = [entry.name for entry in os.scandir(scan_dir)]
+
+    results = ReelCrawler(crawl_parameters(tmp_path, max_workers=4, ordered_results=True)).run_crawl()
+
+    assert [result["reel"]["scan_identifier"] for result in results] == listing
+
+
+def test_unordered_concurrent_crawl_yields_every_reel_once(tmp_path):
+
+    scan_tree(tmp_path, reels=12)
+
+    results = ReelCrawler(crawl_parameters(tmp_path, max_workers=4, ordered_results=False)).run_crawl()
+    scan_identifiers = [result["reel"]["scan_identifier"] for result in results]
+
+    assert sorted(scan_identifiers) == [f"1960-R{reel_number:04d}" for reel_number in range(12)]
+
+
+def test_concurrent_crawl_stops_at_reel_batch_size(tmp_path):
+
+    scan_tree(tmp_path, reels=10)
+
+    reels = crawled(ReelCrawler(crawl_parameters(tmp_path, max_workers=4, reel_batch_size=3)))
+
+    assert len(reels) == 3
+
+
+def test_concurrent_crawl_skips_reel_that_fails_to_parse(tmp_path):
+
+    scan_dir = scan_tree(tmp_path, reels=4)
+    os.makedirs(os.path.join(scan_dir, "1960-BROKEN"))
+
+    reels = crawled(ReelCrawler(crawl_parameters(tmp_path, max_workers=4)))
+
+    assert "1960-BROKEN" not in reels
+    assert len(reels) == 4
+
+
+def test_manifest_skips_reels_committed_by_the_previous_run(tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    manifest_dir = str(tmp_path / "manifests")
+
+    crawler = ReelCrawler(crawl_parameters(tmp_path / "isilon", manifest_dir=manifest_dir))
+    crawler.commit_reels([result["reel"] for result in crawler.run_crawl()])
+
+    rerun = ReelCrawler(crawl_parameters(tmp_path / "isilon", manifest_dir=manifest_dir))
+
+    assert crawled(rerun) == {}
+    assert rerun.manifest.skipped == 6
+
+
+def test_manifest_rescans_reels_when_consumer_dies_before_commit(tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    manifest_dir = str(tmp_path / "manifests")
+
+    crawler = ReelCrawler(crawl_parameters(tmp_path / "isilon", manifest_dir=manifest_dir))
+    results = crawler.run_crawl()
+    next(results)
+    next(results)
+    # the consumer goes away without ever committing what it was handed
+    results.close()
+
+    rerun = ReelCrawler(crawl_parameters(tmp_path / "isilon", manifest_dir=manifest_dir))
+
+    assert len(crawled(rerun)) == 6
+    assert rerun.manifest.skipped == 0
+
+
+def test_manifest_only_records_the_committed_reels(tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    manifest_dir = str(tmp_path / "manifests")
+
+    crawler = ReelCrawler(crawl_parameters(tmp_path / "isilon", manifest_dir=manifest_dir))
+    reels = [result["reel"] for result in crawler.run_crawl()]
+    crawler.commit_reels(reels[:2])
+
+    rerun = ReelCrawler(crawl_parameters(tmp_path / "isilon", manifest_dir=manifest_dir))
+
+    assert crawled(rerun).keys() == {reel["scan_identifier"] for reel in reels[2:]}
+
+
+def test_manifest_never_records_a_truncated_reel(tmp_path):
+
+    scan_tree(tmp_path / "isilon", reels=2, frames=5)
+    manifest_dir = str(tmp_path / "manifests")
+
+    crawler = ReelCrawler(crawl_parameters(tmp_path / "isilon", manifest_dir=manifest_dir, image_batch_size=2))
+    crawler.commit_reels([result["reel"] for result in crawler.run_crawl()])
+
+    assert len(crawler.manifest) == 0
+
+
+def test_stat_modes_agree_on_images_and_sizes(tmp_path):
+
+    scan_dir = crawl_parameters(tmp_path).scan_dir
+    # more frames than one deferred stat chunk, with sizes that differ per frame
+    frames_dir = os.path.join(make_reel(scan_dir, "1960-R0001", 0), "frames")
+    for frame_number in range(STAT_CHUNK_SIZE + 40):
+        with open(os.path.join(frames_dir, f"{frame_number:08d}.jpg"), "wb") as f:
+            f.truncate(frame_number)
+
+    inline = crawled(ReelCrawler(crawl_parameters(tmp_path, stat_mode=STAT_INLINE)))["1960-R0001"]
+    deferred = crawled(ReelCrawler(crawl_parameters(tmp_path, stat_mode=STAT_DEFERRED, stat_workers=4)))["1960-R0001"]
+    unsized = crawled(ReelCrawler(crawl_parameters(tmp_path, stat_mode=STAT_NONE)))["1960-R0001"]
+
+    by_name = {image.filename: image.filesize for image in inline["parsed_images"]}
+
+    assert len(by_name) == STAT_CHUNK_SIZE + 40
+    assert {image.filename: image.filesize for image in deferred["parsed_images"]} == by_name
+    assert sorted(unsized["parsed_images"].filenames) == sorted(by_name)
+    assert unsized["parsed_images"].total_bytes is None
+
+
+def test_unknown_stat_mode_is_rejected(tmp_path):
+
+    with pytest.raises(ValueError):
+        crawl_parameters(tmp_path, stat_mode="lazy")
@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+from events import OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, SystemEventSink
+
+
+class RecordingRepository:
+
+    def __init__(self, failures: int = 0) -> None:
+        self.batches = []
+        self.records = []
+        self.failures = failures
+        self.release = threading.Event()
+        self.release.set()
+
+    def add_records(self, rows) -> None:
+        self.release.wait()
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database went away")
+        self.batches.append([row[0] for row in rows])
+
+    def add_record(self, message, severity, event_type, process, detail, success=True) -> int:
+        self.records.append(message)
+        return len(self.records)
+
+
+def emit(sink: SystemEventSink, message: str) -> None:
+    sink.emit(message, "INFO", "test", "pytest", "")
+
+
+def test_events_are_written_in_batches():
+
+    repository = RecordingRepository()
+    sink = SystemEventSink(repository, batch_size=3, flush_interval=5.0)
+
+    for number in range(7):
+        emit(sink, f"event {number}")
+
+    assert sink.flush()
+    sink.close()
+
+    assert sum(repository.batches, []) == [f"event {number}" for number in range(7)]
+    assert all(len(batch) <= 3 for batch in repository.batches)
+    assert sink.events_written == 7
+
+
+def test_sync_event_is_written_after_buffered_ones():
+
+    repository = RecordingRepository()
+    sink = SystemEventSink(repository, flush_interval=5.0)
+
+    emit(sink, "before")
+    assert sink.emit("fatal", "ERROR", "test", "pytest", "", sync=True) == 1
+    sink.close()
+
+    assert repository.batches == [["before"]]
+    assert repository.records == ["fatal"]
+
+
+@pytest.mark.parametrize("overflow, kept", [
+    (OVERFLOW_DROP_OLDEST, ["event 2", "event 3"]),
+    (OVERFLOW_DROP_NEWEST, ["event 0", "event 1"]),
+])
+def test_full_buffer_drops_per_policy(overflow, kept):
+
+    repository = RecordingRepository()
+    # the writer is held until every event has been emitted
+    repository.release.clear()
+    sink = SystemEventSink(repository, batch_size=100, flush_interval=5.0, buffer_size=2, overflow=overflow)
+
+    for number in range(4):
+        emit(sink, f"event {number}")
+
+    repository.release.set()
+    sink.flush()
+    sink.close()
+
+    assert sum(repository.batches, []) == kept
+    assert sink.events_dropped == 2
+
+
+def test_unknown_overflow_policy_is_rejected():
+
+    with pytest.raises(ValueError):
+        SystemEventSink(RecordingRepository(), overflow="spill")
+
+
+def test_failed_batch_is_retried():
+
+    repository = RecordingRepository(failures=1)
+    sink = SystemEventSink(repository, batch_size=2, flush_interval=0.05, overflow=OVERFLOW_BLOCK)
+
+    emit(sink, "a")
+    emit(sink, "b")
+
+    assert sink.flush(timeout=5.0)
+    sink.close()
+
+    assert sum(repository.batches, []) == ["a", "b"]
+    assert sink.write_errors == 1
+
+
+def test_sink_writes_to_system_events(database):
+
+    sink = SystemEventSink(batch_size=2, flush_interval=5.0)
+
+    for number in range(3):
+        emit(sink, f"event {number}")
+
+    assert sink.flush()
+    sink.close()
+
+    rows = database.SystemEventsRepository().get_all_records()
+    assert sorted(row["message"] for row in rows) == ["event 0", "event 1", "event 2"]
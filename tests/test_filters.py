@@ -0,0 +1,75 @@
+import pytest
+
+from conftest import make_reel
+from crawler.filters import CrawlFilter
+from crawler.parameters import CrawlEngineParameters
+from crawler.service import ReelCrawler
+
+
+def test_exact_names_are_excluded():
+
+    crawl_filter = CrawlFilter(exclusion_filters=["1960-R0001"])
+
+    assert crawl_filter.is_excluded("1960-R0001")
+    assert not crawl_filter.is_excluded("1960-R00011")
+    assert crawl_filter.counters["reels_excluded_by_name"] == 1
+    assert crawl_filter.counters["reels_accepted"] == 1
+
+
+@pytest.mark.parametrize("pattern, excluded, kept", [
+    ("glob:test-*", "test-reel", "reel-test"),
+    ("re:.*_OLD$", "1960-R0001_OLD", "1960-R0001_OLDER"),
+    ("prefix:tmp", "tmp1960", "1960tmp"),
+])
+def test_exclusion_patterns(pattern, excluded, kept):
+
+    crawl_filter = CrawlFilter(exclusion_patterns=[pattern])
+
+    assert crawl_filter.is_excluded(excluded)
+    assert not crawl_filter.is_excluded(kept)
+    assert crawl_filter.counters["reels_excluded_by_pattern"] == 1
+
+
+def test_patterns_of_every_kind_combine():
+
+    crawl_filter = CrawlFilter(exclusion_patterns=["glob:a*", "re:b\\d+", "prefix:c"])
+
+    assert [crawl_filter.is_excluded(name) for name in ("a1", "b12", "c", "d")] == [True, True, True, False]
+
+
+def test_unknown_pattern_kind_is_rejected():
+
+    with pytest.raises(ValueError):
+        CrawlFilter(exclusion_patterns=["suffix:x"])
+
+
+def test_extensions_match_case_insensitively():
+
+    crawl_filter = CrawlFilter(extension_filters=[".JPG", ".tif"])
+
+    assert crawl_filter.is_image("00000001.jpg")
+    assert crawl_filter.is_image("00000001.TIF")
+    assert not crawl_filter.is_image("00000001.jpg.txt")
+    assert not crawl_filter.is_image("thumbs.db")
+
+
+def test_crawl_applies_filters_and_counts_images(tmp_path):
+
+    prms = CrawlEngineParameters(1960, str(tmp_path), (3, 2022), exclusion_filters=["1960-R0001"],
+                                 exclusion_patterns=["glob:test-*"], extension_filters=[".jpg"])
+
+    for scan_identifier in ("1960-R0001", "1960-R0002", "test-reel"):
+        make_reel(prms.scan_dir, scan_identifier, 3)
+    make_reel(prms.scan_dir, "1960-R0002", 2, extension=".txt")
+
+    crawler = ReelCrawler(prms)
+    reels = [result["reel"]["scan_identifier"] for result in crawler.run_crawl()]
+
+    assert reels == ["1960-R0002"]
+    assert crawler.crawl_filter.counters == {
+        "reels_accepted": 1,
+        "reels_excluded_by_name": 1,
+        "reels_excluded_by_pattern": 1,
+        "images_accepted": 3,
+        "images_rejected": 2
+    }
@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from conftest import make_reel
+from crawler.ingest import IngestPipelineError, ReelIngestPipeline, ingest_crawl
+from crawler.parameters import CrawlEngineParameters
+from crawler.service import ReelCrawler
+
+
+class RecordingRepository:
+
+    def __init__(self, fail_after_batches: int = None) -> None:
+        self.batches = []
+        self.fail_after_batches = fail_after_batches
+
+    def add_reels_and_images(self, reels) -> None:
+        if self.fail_after_batches is not None and len(self.batches) == self.fail_after_batches:
+            raise RuntimeError("database went away")
+        self.batches.append([reel["scan_identifier"] for reel in reels])
+
+
+def crawler_for(tmp_path, reels: int = 6) -> ReelCrawler:
+
+    prms = CrawlEngineParameters(1960, str(tmp_path / "isilon"), (3, 2022),
+                                 manifest_dir=str(tmp_path / "manifests"),
+                                 checkpoint_dir=str(tmp_path / "checkpoints"))
+
+    for reel_number in range(reels):
+        make_reel(prms.scan_dir, f"1960-R{reel_number:04d}", 2)
+
+    return ReelCrawler(prms)
+
+
+def test_pipeline_writes_every_reel_in_batches():
+
+    repository = RecordingRepository()
+    committed = []
+
+    with ReelIngestPipeline(repository, batch_size=2, on_commit=committed.append) as pipeline:
+        for reel_number in range(5):
+            pipeline.submit({"scan_identifier": f"R{reel_number}", "parsed_images": [1, 2]})
+
+    assert sorted(sum(repository.batches, [])) == [f"R{reel_number}" for reel_number in range(5)]
+    assert all(len(batch) <= 2 for batch in repository.batches)
+    assert pipeline.reels_written == 5
+    assert pipeline.images_written == 10
+    assert len(committed) == pipeline.batches_written
+
+
+def test_writer_failure_is_raised_on_the_crawl_thread():
+
+    with pytest.raises(IngestPipelineError):
+        with ReelIngestPipeline(RecordingRepository(fail_after_batches=0)) as pipeline:
+            for reel_number in range(500):
+                pipeline.submit({"scan_identifier": f"R{reel_number}", "parsed_images": []})
+
+
+class FailingCrawler:
+
+    def __init__(self) -> None:
+        self.failed = threading.Event()
+
+    def commit_reels(self, reels) -> None:
+        pass
+
+    def run_crawl(self):
+        for reel_number in range(3):
+            yield {"reel": {"scan_identifier": f"R{reel_number}", "parsed_images": []}}
+        self.failed.set()
+        raise OSError("isilon mount went stale")
+
+
+class FailingAfterCrawlRepository:
+
+    def __init__(self, crawler: FailingCrawler) -> None:
+        self.crawler = crawler
+
+    def add_reels_and_images(self, reels) -> None:
+        # fail only once the crawl has failed, so no submit() can see this error first
+        self.crawler.failed.wait(5)
+        raise RuntimeError("database went away")
+
+
+def test_crawler_error_is_not_hidden_by_a_writer_failure():
+
+    crawler = FailingCrawler()
+
+    # both fail; the caller must still see why the crawl stopped
+    with pytest.raises(OSError, match="stale"):
+        ingest_crawl(crawler, ReelIngestPipeline(FailingAfterCrawlRepository(crawler)))
+
+
+def test_ingest_records_only_committed_reels(tmp_path):
+
+    crawler = crawler_for(tmp_path)
+    repository = RecordingRepository()
+
+    totals = ingest_crawl(crawler, ReelIngestPipeline(repository, batch_size=2))
+
+    assert totals["reels_parsed"] == 6
+    assert len(crawler.manifest) == 6
+    assert len(crawler.checkpoint.committed) == 6
+
+
+def test_failed_ingest_leaves_uncommitted_reels_for_the_next_run(tmp_path):
+
+    crawler = crawler_for(tmp_path)
+    repository = RecordingRepository(fail_after_batches=1)
+
+    with pytest.raises(IngestPipelineError):
+        # a one reel queue keeps the crawl from running far ahead of the writer
+        ingest_crawl(crawler, ReelIngestPipeline(repository, batch_size=2, queue_size=1))
+
+    committed = set(repository.batches[0])
+
+    rerun = crawler_for(tmp_path)
+    rerun_repository = RecordingRepository()
+    ingest_crawl(rerun, ReelIngestPipeline(rerun_repository))
+
+    rescanned = set(sum(rerun_repository.batches, []))
+
+    assert rescanned == {f"1960-R{reel_number:04d}" for reel_number in range(6)} - committed
+    assert set(rerun.checkpoint.skipped_reels) == committed
+    assert all(rerun.manifest.get(scan_identifier) is not None for scan_identifier in committed)
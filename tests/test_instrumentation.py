@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT, sample_reel
+
+
+@pytest.fixture
+def instrumented(database):
+
+    from instrumentation import query_instrumentation
+
+    query_instrumentation.reset()
+    query_instrumentation.enable(slow_query_seconds=3600)
+
+    yield query_instrumentation
+
+    query_instrumentation.disable()
+    query_instrumentation.reset()
+
+
+def test_instrumentation_does_not_import_the_crawler():
+
+    probe = "import instrumentation, sys; print(sorted(m for m in sys.modules if m.split('.')[0] == 'crawler'))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_statements_are_charged_to_their_repository_method(instrumented, database):
+
+    database.ReelRepository().add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002")])
+    assert database.ReelRepository().record_count() == 2
+
+    callers = instrumented.snapshot()["callers"]
+
+    assert callers["ReelRepository.record_count"]["calls"] == 1
+    assert callers["ReelRepository.record_count"]["rows"] == 1
+    assert callers["ReelRepository.record_count"]["latency"]["count"] == 1
+
+
+def test_streaming_cursor_rows_are_counted_on_close(instrumented, database):
+
+    database.ReelRepository().add_reels_and_images([sample_reel(f"1960-R{number:04d}") for number in range(5)])
+
+    assert len(list(database.ReelRepository().iter_all_records(itersize=2))) == 5
+
+    # an abandoned stream is charged only the rows it fetched
+    stream = database.ReelRepository().iter_scan_identifiers(itersize=2)
+    next(stream)
+    stream.close()
+
+    callers = instrumented.snapshot()["callers"]
+
+    assert callers["ReelRepository.iter_all_records"]["rows"] == 5
+    assert callers["ReelRepository.iter_scan_identifiers"]["rows"] == 1
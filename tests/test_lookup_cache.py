@@ -0,0 +1,121 @@
+from conftest import sample_reel
+from data import LookupCache
+
+
+def test_cache_hits_until_invalidated():
+
+    cache = LookupCache()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return "value"
+
+    assert cache.get_or_load(("reel_by_identifier", "R1"), loader) == "value"
+    assert cache.get_or_load(("reel_by_identifier", "R1"), loader) == "value"
+    cache.invalidate("reel_by_identifier", "R1")
+    cache.get_or_load(("reel_by_identifier", "R1"), loader)
+
+    assert len(loads) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_missing_values_are_cached_too():
+
+    cache = LookupCache()
+    loads = []
+
+    for _ in range(3):
+        assert cache.get_or_load(("crawl_status", 1), lambda: loads.append(1)) is None
+
+    assert len(loads) == 1
+
+
+def test_missing_values_can_be_left_uncached():
+
+    cache = LookupCache()
+    loads = []
+
+    for _ in range(3):
+        assert cache.get_or_load(("crawl_status", 1), lambda: loads.append(1), cache_absent=False) is None
+
+    assert len(loads) == 3
+    assert cache.get_or_load(("crawl_status", 1), lambda: "found", cache_absent=False) == "found"
+    assert cache.get_or_load(("crawl_status", 1), lambda: "reloaded", cache_absent=False) == "found"
+
+
+def test_namespace_invalidation_and_lru_eviction():
+
+    cache = LookupCache(max_entries=2)
+
+    cache.get_or_load(("a", 1), lambda: 1)
+    cache.get_or_load(("a", 2), lambda: 2)
+    cache.get_or_load(("b", 1), lambda: 3)
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.get_or_load(("a", 1), lambda: "reloaded") == "reloaded"
+
+    cache.invalidate("b")
+    assert cache.get_or_load(("b", 1), lambda: "reloaded") == "reloaded"
+
+
+def test_expired_entries_are_reloaded():
+
+    cache = LookupCache(ttl=0)
+
+    cache.get_or_load(("a", 1), lambda: 1)
+
+    assert cache.get_or_load(("a", 1), lambda: 2) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_load_overlapping_an_invalidation_is_not_cached():
+
+    cache = LookupCache()
+
+    def stale_loader():
+        # a write lands while the read is in flight
+        cache.invalidate("reel_by_identifier", "R1")
+        return "stale"
+
+    assert cache.get_or_load(("reel_by_identifier", "R1"), stale_loader) == "stale"
+    assert cache.get_or_load(("reel_by_identifier", "R1"), lambda: "fresh") == "fresh"
+
+
+def test_repository_writes_invalidate_cached_lookups(database):
+
+    reels = database.ReelRepository()
+    status = database.CrawlStatusRepository()
+
+    assert reels.get_filters_by_scan(3, 2022, 1960) == []
+    assert reels.get_reel_by_identifier("1960-R0001") == []
+    assert status.get_crawl_status(1960, 3, 2022) is None
+
+    reels.add_reels_and_images([sample_reel("1960-R0001")])
+    status.add_crawl_status(1960, 3, 2022)
+
+    assert reels.get_filters_by_scan(3, 2022, 1960) == ["1960-R0001"]
+    assert reels.get_reel_by_identifier("1960-R0001")[0].scan_identifier == "1960-R0001"
+    assert status.get_crawl_status(1960, 3, 2022)["census_year"] == 1960
+
+    status.reset_crawl(3, 2022, 1960)
+
+    assert reels.get_filters_by_scan(3, 2022, 1960) == []
+    assert status.get_crawl_status(1960, 3, 2022) is None
+
+
+def test_crawl_status_added_by_another_process_is_seen(database):
+
+    status = database.CrawlStatusRepository()
+
+    assert status.get_crawl_status(1960, 3, 2022) is None
+
+    # written by another crawler process, so this process's cache is never told
+    with database.getcursor() as cur:
+        cur.execute("INSERT INTO crawl_status (census_year, month_scanned, year_scanned) VALUES (1960, 3, 2022)")
+
+    status.add_crawl_operation(1960, 3, 2022, "2022-04-01", 1, 3, "0:00:01")
+
+    with database.getcursor() as cur:
+        cur.execute("SELECT count(*) FROM crawl_status WHERE census_year = 1960")
+        assert cur.fetchone()[0] == 1
@@ -0,0 +1,53 @@
+import json
+
+from conftest import make_reel
+from crawler.metrics import Counter, Histogram
+from crawler.parameters import CrawlEngineParameters
+from crawler.service import ReelCrawler
+
+
+def test_histogram_buckets_are_cumulative():
+
+    histogram = Histogram("latency", "Latency", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5, count=2)
+    histogram.observe_many([5.0, 0.01])
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot["buckets"] == [("0.1", 2), ("1.0", 4), ("+Inf", 5)]
+    assert snapshot["count"] == 5
+    assert abs(snapshot["sum"] - 6.06) < 1e-9
+
+
+def test_prometheus_text_carries_labels():
+
+    histogram = Histogram("ips_latency", "Latency", buckets=(1.0,))
+    histogram.observe(0.5)
+    counter = Counter("ips_total", "Total")
+    counter.inc(3)
+
+    assert 'ips_latency_bucket{census_year="1960",le="1.0"} 1' in histogram.prometheus('census_year="1960"')
+    assert counter.prometheus('census_year="1960"')[-1] == 'ips_total{census_year="1960"} 3.0'
+
+
+def test_crawl_writes_metrics_snapshots(tmp_path):
+
+    prms = CrawlEngineParameters(1960, str(tmp_path / "isilon"), (3, 2022), metrics_dir=str(tmp_path / "metrics"))
+
+    for reel_number in range(3):
+        make_reel(prms.scan_dir, f"1960-R{reel_number:04d}", 4)
+
+    crawler = ReelCrawler(prms)
+    list(crawler.run_crawl())
+
+    with open(crawler.metrics.json_path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+
+    assert snapshot["reels_total"] == 3
+    assert snapshot["images_total"] == 12
+    assert snapshot["histograms"]["image_stat_seconds"]["count"] == 12
+    assert snapshot["histograms"]["consumer_wait_seconds"]["count"] == 3
+
+    with open(crawler.metrics.prometheus_path, encoding="utf-8") as f:
+        assert 'ips_crawler_reels_total{census_year="1960",scan_folder="03-Mar-22"} 3.0' in f.read()
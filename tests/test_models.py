@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from crawler.models import ImageRecord, ParsedImages
+
+
+def test_parsed_images_builds_paths_and_records_on_demand():
+
+    images = ParsedImages("/isilon/1960/reel/frames")
+    images.append("00000001.jpg", 10)
+    images.extend(["00000002.jpg", "00000003.jpg"], [20, 30])
+
+    assert len(images) == 3
+    assert images.total_bytes == 60
+    assert images[1].filepath == os.path.join("/isilon/1960/reel/frames", "00000002.jpg")
+    assert [image["filesize"] for image in images] == [10, 20, 30]
+    assert images.to_list()[2] == {"filename": "00000003.jpg",
+                                   "filepath": os.path.join("/isilon/1960/reel/frames", "00000003.jpg"),
+                                   "filesize": 30}
+
+
+def test_parsed_images_without_sizes_reads_none():
+
+    images = ParsedImages("/frames", sizes_collected=False)
+    images.extend(["a.jpg", "b.jpg"])
+
+    assert images.total_bytes is None
+    assert [image.filesize for image in images] == [None, None]
+    assert images[0]["filesize"] is None
+    assert list(images.rows(7)) == [(7, "a.jpg", None, os.path.join("/frames", "a.jpg")),
+                                    (7, "b.jpg", None, os.path.join("/frames", "b.jpg"))]
+
+
+def test_rows_follow_images_column_order_with_extra_columns():
+
+    images = ParsedImages("/frames")
+    images.append("a.jpg", 5)
+
+    assert list(images.rows(3, (1960, 2022, 3))) == [(3, "a.jpg", 5, os.path.join("/frames", "a.jpg"), 1960, 2022, 3)]
+
+
+def test_image_record_reads_like_the_old_image_dict():
+
+    record = ImageRecord("a.jpg", "/frames/a.jpg", 5)
+
+    assert record["filename"] == "a.jpg"
+    assert json.dumps(record.to_dict())
+
+    with pytest.raises(KeyError):
+        record["reel_id"]
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from conftest import make_reel
+from crawler.checkpoint import CrawlCheckpoint
+from crawler.orchestrator import crawl_scan_folder
+from crawler.parameters import CrawlEngineParameters, CrawlOrchestratorParameters
+
+SCAN_FOLDER = (3, 2022)
+
+
+def scan_task(isilon_root, tmp_path, **kwargs) -> dict:
+
+    task = {
+        "census_year": 1960,
+        "isilon_root": str(isilon_root),
+        "scan_folder": SCAN_FOLDER,
+        "reel_workers": None,
+        "manifest_dir": str(tmp_path / "manifests"),
+        "checkpoint_dir": str(tmp_path / "checkpoints"),
+        "metrics_dir": None,
+        "persist_data": True,
+        "known_reel_index": False,
+        "known_reel_bloom_error_rate": None,
+        "staging_dir": None,
+        "run_id": "test"
+    }
+    task.update(kwargs)
+
+    return task
+
+
+def scan_tree(isilon_root, reels: int = 4) -> str:
+
+    scan_dir = CrawlEngineParameters(1960, str(isilon_root), SCAN_FOLDER).scan_dir
+
+    for reel_number in range(reels):
+        make_reel(scan_dir, f"1960-R{reel_number:04d}", 3)
+
+    return scan_dir
+
+
+def test_dry_run_leaves_no_manifest_behind(database, tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    task = scan_task(tmp_path / "isilon", tmp_path, persist_data=False)
+
+    assert crawl_scan_folder(task)["reels_parsed"] == 4
+    assert not os.path.exists(task["manifest_dir"])
+
+    # nothing was saved, so nothing may be skipped the next time round
+    assert crawl_scan_folder(task)["reels_parsed"] == 4
+
+
+
+def test_persisted_crawl_records_manifest(database, tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    task = scan_task(tmp_path / "isilon", tmp_path)
+
+    assert crawl_scan_folder(task)["reels_parsed"] == 4
+    assert os.listdir(task["manifest_dir"]) == ["1960_03-Mar-22.manifest.json"]
+    assert database.ImageRepository().record_count() == 12
+
+
+def test_reset_crawl_lets_an_incremental_crawl_ingest_the_folder_again(database, tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    task = scan_task(tmp_path / "isilon", tmp_path, checkpoint_dir=None)
+
+    assert crawl_scan_folder(task)["reels_parsed"] == 4
+
+    database.CrawlStatusRepository().reset_crawl(3, 2022, 1960, manifest_dir=task["manifest_dir"])
+    assert database.ImageRepository().record_count() == 0
+
+    # nothing on disk changed, so only the cleared manifest lets the reels through
+    assert crawl_scan_folder(task)["reels_parsed"] == 4
+    assert database.ImageRepository().record_count() == 12
+
+
+def test_reset_crawl_drops_an_interrupted_crawls_checkpoint(database, tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    task = scan_task(tmp_path / "isilon", tmp_path, manifest_dir=None)
+
+    # an interrupted crawl left two reels in its checkpoint
+    checkpoint_path = os.path.join(task["checkpoint_dir"], CrawlCheckpoint.checkpoint_file_name(1960, "03-Mar-22"))
+    CrawlCheckpoint(checkpoint_path, 1960, SCAN_FOLDER).record(
+        [{"scan_identifier": f"1960-R{reel_number:04d}", "parsed_images": []} for reel_number in range(2)])
+
+    database.CrawlStatusRepository().reset_crawl(3, 2022, 1960, checkpoint_dir=task["checkpoint_dir"])
+
+    assert not os.path.exists(checkpoint_path)
+    assert crawl_scan_folder(task)["reels_parsed"] == 4
+
+
+@pytest.mark.parametrize("limits", [{"max_processes": 0}, {"default_mount_limit": 0},
+                                    {"mount_limits": {"/isilon/1960": 0}}])
+def test_limits_that_could_never_schedule_a_folder_are_rejected(limits):
+
+    with pytest.raises(ValueError):
+        CrawlOrchestratorParameters(**limits)
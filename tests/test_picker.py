@@ -0,0 +1,131 @@
+import pytest
+
+from conftest import sample_reel
+from picker import GROUP_CENSUS_YEAR, STRATEGY_BFD, STRATEGY_FFD, SnowballPacker
+
+# one decimal terabyte, all of it usable
+USABLE = 1000 ** 4
+
+
+def packer(strategy: str = STRATEGY_FFD, **kwargs) -> SnowballPacker:
+    return SnowballPacker(strategy, storage_tb=1, fill_threshold=1.0, **kwargs)
+
+
+def reel(identifier: str, fraction: float, census_year: int = 1960) -> dict:
+    return {"reel": identifier, "bytes": int(USABLE * fraction), "census_year": census_year,
+            "year_scanned": 2022, "month_number_scanned": 3}
+
+
+def placements(plan: dict) -> dict:
+    return {identifier: assignment["snowball"] for assignment in plan["assignments"]
+            for identifier in assignment["reels"]}
+
+
+class RecordingRepository:
+
+    def __init__(self, reels, snowballs=()):
+        self.reels = reels
+        self.snowballs = list(snowballs)
+        self.writes = []
+
+    def get_unassigned_reels(self, with_scan_key=False):
+        return self.reels
+
+    def get_snowballs(self):
+        return self.snowballs
+
+    def get_snowball_scan_keys(self):
+        return []
+
+    def get_unique_snowballs(self):
+        return [snowball["snowball"] for snowball in self.snowballs]
+
+    def assign_reels_to_snowballs(self, assignments):
+        self.writes.append(list(assignments))
+
+
+@pytest.mark.parametrize("strategy", [STRATEGY_FFD, STRATEGY_BFD])
+def test_reels_fill_the_fewest_snowballs(strategy):
+
+    reels = [reel(f"R{number}", fraction) for number, fraction in enumerate((0.5, 0.4, 0.3, 0.3, 0.2, 0.2, 0.1))]
+
+    plan = packer(strategy).plan(reels, [])
+
+    assert len(plan["assignments"]) == 2
+    assert sorted(assignment["total_bytes"] for assignment in plan["assignments"]) == [USABLE, USABLE]
+    assert plan["report"]["new_snowballs_lower_bound"] == 2
+    assert plan["report"]["new_snowball_efficiency"] == 1.0
+
+
+def test_first_fit_and_best_fit_choose_different_snowballs():
+
+    # the 0.8 reel can't top up the existing snowball, so it opens one with 0.2 left;
+    # the 0.2 reel then fits both: first fit takes the existing one, best fit the exact fit
+    reels = [reel("big", 0.8), reel("small", 0.2)]
+    snowballs = [{"snowball": "snowball_0001", "bytes_used": USABLE - int(USABLE * 0.3)}]
+
+    first_fit = placements(packer(STRATEGY_FFD).plan(reels, snowballs, snowball_names=["snowball_0001"]))
+    best_fit = placements(packer(STRATEGY_BFD).plan(reels, snowballs, snowball_names=["snowball_0001"]))
+
+    assert first_fit == {"big": "snowball_0002", "small": "snowball_0001"}
+    assert best_fit == {"big": "snowball_0002", "small": "snowball_0002"}
+
+
+def test_oversized_reels_are_reported_not_assigned():
+
+    plan = packer().plan([reel("huge", 1.5), reel("fits", 0.5)], [])
+
+    assert plan["oversized_reels"] == ["huge"]
+    assert placements(plan) == {"fits": "snowball_0001"}
+
+
+def test_groups_only_top_up_their_own_snowballs():
+
+    reels = [reel("R1960", 0.1, 1960), reel("R1970", 0.1, 1970)]
+    snowballs = [{"snowball": "snowball_0001", "bytes_used": int(USABLE * 0.5)}]
+    scan_keys = [{"snowball": "snowball_0001", "census_year": 1960, "year_scanned": 2022,
+                  "month_number_scanned": 3}]
+
+    plan = packer(group_by=GROUP_CENSUS_YEAR).plan(reels, snowballs, scan_keys, ["snowball_0001"])
+
+    assert placements(plan) == {"R1960": "snowball_0001", "R1970": "snowball_0002"}
+
+
+def test_dry_run_writes_nothing_and_a_run_writes_once():
+
+    reels = [reel(f"R{number}", 0.4) for number in range(5)]
+
+    dry = RecordingRepository(reels)
+    assert packer(repository=dry).run(dry_run=True)["report"]["dry_run"] is True
+    assert dry.writes == []
+
+    live = RecordingRepository(reels)
+    plan = packer(repository=live).run()
+
+    # every assignment goes to the repository in a single call, so it lands in one transaction
+    assert live.writes == [plan["assignments"]]
+    assert len(plan["assignments"]) == 3
+
+
+def test_re_delivered_reel_is_packed_once(database):
+
+    repository = database.ReelRepository()
+    repository.add_reels_and_images([sample_reel("1960-R0001", scan_folder=(3, 2022)),
+                                     sample_reel("1960-R0002", scan_folder=(3, 2022))])
+    # the same reel delivered again under a later scan folder
+    repository.add_reels_and_images([sample_reel("1960-R0001", scan_folder=(4, 2022))])
+
+    with database.getcursor() as cur:
+        cur.execute("REFRESH MATERIALIZED VIEW mvw_snowballreadyreels")
+
+    snowballs = database.SnowballRepository()
+    unassigned = snowballs.get_unassigned_reels(with_scan_key=True)
+
+    assert sorted(row["reel"] for row in unassigned) == ["1960-R0001", "1960-R0002"]
+    assert {row["reel"]: row["month_number_scanned"] for row in unassigned}["1960-R0001"] == 3
+
+    plan = SnowballPacker(STRATEGY_FFD, GROUP_CENSUS_YEAR, storage_tb=1, fill_threshold=1.0).run()
+
+    assert plan["report"]["reels_assigned"] == 2
+    assert snowballs.get_unique_snowballs() == ["snowball_0001"]
+    assert {row["target_snowball"] for row in repository.get_all_records()} == {"snowball_0001"}
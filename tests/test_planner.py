@@ -0,0 +1,109 @@
+import os
+
+from datetime import date, datetime
+
+from crawler.planner import CrawlPlanner
+
+TODAY = date(2022, 6, 15)
+COMPLETED = datetime(2022, 1, 10)
+BEFORE_COMPLETION = datetime(2022, 1, 1).timestamp()
+AFTER_COMPLETION = datetime(2022, 2, 1).timestamp()
+
+
+class StatusRepository:
+
+    def __init__(self, history: dict, last_crawl=(1, 2021)) -> None:
+        self.history = history
+        self.last_crawl = last_crawl
+
+    def get_crawl_history(self, census_year: int) -> dict:
+        return self.history
+
+    def get_last_crawl(self, census_year: int):
+        return self.last_crawl
+
+
+def month_folder(isilon_root, scan_year: int, month: int, mtime: float = BEFORE_COMPLETION) -> str:
+
+    path = os.path.join(str(isilon_root), "1960", str(scan_year), date(scan_year, month, 1).strftime("%m-%b-%y"))
+    os.makedirs(path, exist_ok=True)
+    os.utime(path, (mtime, mtime))
+
+    return path
+
+
+def age_year(isilon_root, scan_year: int, mtime: float = BEFORE_COMPLETION) -> None:
+    os.utime(os.path.join(str(isilon_root), "1960", str(scan_year)), (mtime, mtime))
+
+
+def planned(planner: CrawlPlanner, isilon_root) -> list:
+    return [prms.scan_folder for prms in planner.plan({1960: str(isilon_root)})]
+
+
+def test_recheck_completed_is_off_by_default(tmp_path):
+
+    month_folder(tmp_path, 2021, 3)
+    month_folder(tmp_path, 2021, 4)
+    age_year(tmp_path, 2021)
+
+    planner = CrawlPlanner(StatusRepository({(3, 2021): COMPLETED, (4, 2021): COMPLETED}), today=TODAY)
+
+    assert planned(planner, tmp_path) == []
+    assert planner.skipped == [{"census_year": 1960, "scan_folder": (None, 2021),
+                                "reason": "year directory unchanged since last completed crawl"}]
+
+
+def test_unfinished_and_new_folders_are_planned(tmp_path):
+
+    month_folder(tmp_path, 2021, 3)
+    month_folder(tmp_path, 2021, 4)
+    month_folder(tmp_path, 2021, 5)
+    age_year(tmp_path, 2021, AFTER_COMPLETION)
+
+    history = {(3, 2021): COMPLETED, (4, 2021): None}
+    planner = CrawlPlanner(StatusRepository(history, last_crawl=(3, 2021)), today=TODAY)
+
+    assert planned(planner, tmp_path) == [(4, 2021), (5, 2021)]
+
+
+def test_current_month_and_folders_before_history_are_skipped(tmp_path):
+
+    month_folder(tmp_path, 2021, 1)
+    month_folder(tmp_path, 2021, 2)
+    month_folder(tmp_path, 2022, 5)
+    month_folder(tmp_path, 2022, 6)
+    month_folder(tmp_path, 2020, 12)
+
+    planner = CrawlPlanner(StatusRepository({}, last_crawl=(1, 2021)), today=TODAY)
+
+    assert planned(planner, tmp_path) == [(2, 2021), (5, 2022)]
+    reasons = {tuple(skip["scan_folder"]): skip["reason"] for skip in planner.skipped}
+    assert reasons[(None, 2020)] == "before crawl history"
+    assert reasons[(1, 2021)] == "before crawl history"
+    assert reasons[(6, 2022)] == "current month is still being filled"
+
+
+def test_recheck_completed_replans_only_modified_folders(tmp_path):
+
+    month_folder(tmp_path, 2021, 3)
+    month_folder(tmp_path, 2021, 4, AFTER_COMPLETION)
+    age_year(tmp_path, 2021)
+
+    history = {(3, 2021): COMPLETED, (4, 2021): COMPLETED}
+    planner = CrawlPlanner(StatusRepository(history, last_crawl=(3, 2021)), today=TODAY, recheck_completed=True)
+
+    # the year directory looks unchanged, but a completed month inside it was not
+    assert planned(planner, tmp_path) == [(4, 2021)]
+
+
+def test_folder_skipped_as_the_current_month_is_planned_after_the_year_rolls_over(tmp_path):
+
+    month_folder(tmp_path, 2021, 11)
+    month_folder(tmp_path, 2021, 12)
+    age_year(tmp_path, 2021, datetime(2021, 12, 1).timestamp())
+
+    # November completed on Dec 2, when 12-Dec-21 was still the current month
+    history = {(11, 2021): datetime(2021, 12, 2)}
+    planner = CrawlPlanner(StatusRepository(history, last_crawl=(11, 2021)), today=date(2022, 1, 5))
+
+    assert planned(planner, tmp_path) == [(12, 2021)]
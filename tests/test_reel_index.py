@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+from conftest import sample_reel
+from crawler import reel_index
+from crawler.reel_index import BloomFilter, KnownReelIndex, SortedIdentifiers
+
+
+def identifiers(count: int):
+    # a generator, so nothing can lean on the input being a list
+    return (f"1960-R{number:05d}" for number in range(count - 1, -1, -1))
+
+
+def test_sorted_identifiers_are_packed_in_order_without_repeats():
+
+    stored = SortedIdentifiers.build(["b", "a", "c", "a", "b"], run_size=2)
+
+    assert list(stored) == [b"a", b"b", b"c"]
+    assert len(stored) == 3
+    assert b"b" in stored
+    assert b"d" not in stored
+    assert b"" not in stored
+
+
+def test_sorted_identifiers_merge_keeps_order():
+
+    stored = SortedIdentifiers.build(["a", "c", "e"]).merge([b"d", b"b", b"c"])
+
+    assert list(stored) == [b"a", b"b", b"c", b"d", b"e"]
+
+
+def test_empty_index_contains_nothing():
+
+    for sorted_storage in (True, False):
+        index = KnownReelIndex(sorted_storage=sorted_storage, bloom_error_rate=0.01)
+        assert len(index) == 0
+        assert "1960-R00000" not in index
+
+
+@pytest.mark.parametrize("sorted_storage", [True, False])
+@pytest.mark.parametrize("bloom_error_rate", [None, 0.01])
+def test_index_built_from_a_generator(sorted_storage, bloom_error_rate):
+
+    index = KnownReelIndex(identifiers(1000), sorted_storage=sorted_storage, bloom_error_rate=bloom_error_rate)
+
+    assert len(index) == 1000
+    assert all(identifier in index for identifier in identifiers(1000))
+    assert "1960-R01000" not in index
+    assert "1960-X00001" not in index
+
+
+def test_sorted_index_built_from_several_runs(monkeypatch):
+
+    monkeypatch.setattr(reel_index, "SORTED_RUN_SIZE", 7)
+    index = KnownReelIndex(identifiers(100))
+
+    assert len(index) == 100
+    assert all(identifier in index for identifier in identifiers(100))
+
+
+def test_sorted_index_is_smaller_than_the_identifiers():
+
+    index = KnownReelIndex(identifiers(10000))
+
+    assert index.size_bytes < sum(len(identifier) + 8 for identifier in identifiers(10000)) + 1
+
+
+@pytest.mark.parametrize("sorted_storage", [True, False])
+def test_added_identifiers_are_found_before_and_after_a_merge(monkeypatch, sorted_storage):
+
+    monkeypatch.setattr(reel_index, "SORTED_MERGE_THRESHOLD", 5)
+    index = KnownReelIndex(["1960-R00000"], sorted_storage=sorted_storage, bloom_error_rate=0.01)
+
+    index.add("1960-N00000")
+    assert "1960-N00000" in index
+
+    index.add_many(f"1960-N{number:05d}" for number in range(1, 10))
+    # re-adding a stored identifier must not count it twice
+    index.add("1960-R00000")
+
+    assert len(index) == 11
+    assert all(f"1960-N{number:05d}" in index for number in range(10))
+    assert "1960-N00010" not in index
+
+
+def test_len_while_the_writer_thread_adds(monkeypatch):
+
+    monkeypatch.setattr(reel_index, "SORTED_MERGE_THRESHOLD", 50)
+    index = KnownReelIndex(identifiers(100))
+
+    def writer():
+        for batch in range(200):
+            index.add_many(f"1960-N{batch:03d}-{number:02d}" for number in range(20))
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    # counting pending identifiers used to race the writer's set updates and merges
+    while thread.is_alive():
+        len(index)
+    thread.join()
+
+    assert len(index) == 100 + 200 * 20
+
+
+def test_bloom_filter_has_no_false_negatives():
+
+    bloom = BloomFilter(1000, 0.01)
+
+    for identifier in identifiers(1000):
+        bloom.add(identifier)
+
+    assert all(identifier in bloom for identifier in identifiers(1000))
+    assert all(identifier.encode("utf-8") in bloom for identifier in identifiers(1000))
+    assert sum(f"1970-R{number:05d}" in bloom for number in range(10000)) < 500
+
+
+def test_load_streams_scan_identifiers_from_reels(database):
+
+    database.ReelRepository().add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002")])
+
+    index = KnownReelIndex.load(bloom_error_rate=0.01)
+
+    assert len(index) == 2
+    assert "1960-R0001" in index
+    assert "1960-R0003" not in index
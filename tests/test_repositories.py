@@ -1 +1,154 @@
+import pytest
 
+from conftest import sample_reel
+
+
+@pytest.fixture(params=["unpartitioned", "partitioned"])
+def schema(request):
+
+    # every repository test runs against the baseline tables and the migrated ones
+    if request.param == "partitioned":
+        return request.getfixturevalue("migrated_database")
+
+    return request.getfixturevalue("database")
+
+
+def image_rows_in_database(data):
+    with data.getcursor() as cur:
+        cur.execute("SELECT reel_id, filename, filesize, image_filepath FROM images ORDER BY id")
+        return [tuple(row) for row in cur.fetchall()]
+
+
+@pytest.mark.parametrize("method", ["copy", "values"])
+def test_image_load_methods_store_the_same_rows(schema, method):
+
+    reel = sample_reel("1960-R0001", 0)
+    # COPY text format has to escape these; VALUES passes them as parameters
+    for filename in ("tab\there.jpg", "new\nline.jpg", "back\\slash.jpg", "plain.jpg"):
+        reel["parsed_images"].append(filename, len(filename))
+
+    repository = schema.ReelRepository()
+    repository.image_load_method = method
+    reel_id = repository.add_reels_and_images([reel])[0]
+
+    assert image_rows_in_database(schema) == list(reel["parsed_images"].rows(reel_id))
+
+
+def test_image_repository_adds_records_with_either_method(schema):
+
+    reel_id = schema.ReelRepository().add_reels_and_images([sample_reel("1960-R0001", 0)])[0]
+    images = schema.ImageRepository()
+
+    images.add_records(reel_id, sample_reel("1960-R0001", 2)["parsed_images"])
+    images.image_load_method = "values"
+    images.add_records(reel_id, [{"filename": "c.jpg", "filesize": 7, "filepath": "/c.jpg"}])
+
+    assert [row[1:3] for row in image_rows_in_database(schema)] == [("00000000.jpg", 100), ("00000001.jpg", 101),
+                                                                     ("c.jpg", 7)]
+
+
+def test_reel_batches_return_ids_in_input_order(schema):
+
+    reels = [sample_reel(f"1960-R{reel_number:04d}", reel_number % 3) for reel_number in range(7)]
+
+    reel_ids = schema.ReelRepository().add_reels_and_images(reels, batch_size=3)
+
+    stored = {row["id"]: row["scan_identifier"] for row in schema.ReelRepository().get_all_records()}
+    assert [stored[reel_id] for reel_id in reel_ids] == [reel["scan_identifier"] for reel in reels]
+    assert schema.ImageRepository().record_count() == sum(reel_number % 3 for reel_number in range(7))
+
+
+def test_duplicate_scan_identifiers_are_rejected(schema):
+
+    with pytest.raises(ValueError):
+        schema.ReelRepository().add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0001")])
+
+
+def test_failed_batch_rolls_back_the_whole_call(schema):
+
+    broken = sample_reel("1960-R0002")
+    broken["parsed_images"] = [{"filename": "a.jpg", "filesize": "not a size", "filepath": "/a.jpg"}]
+
+    with pytest.raises(ValueError):
+        schema.ReelRepository().add_reels_and_images([sample_reel("1960-R0001"), broken], batch_size=1)
+
+    assert schema.ReelRepository().record_count() == 0
+    assert schema.ImageRepository().record_count() == 0
+
+
+def test_streaming_readers_return_every_row(schema):
+
+    reels = [sample_reel(f"1960-R{reel_number:04d}", 2) for reel_number in range(5)]
+    schema.ReelRepository().add_reels_and_images(reels)
+
+    # an itersize smaller than the result forces several round trips on the named cursor
+    identifiers = list(schema.ReelRepository().iter_scan_identifiers(itersize=2))
+    images = list(schema.ImageRepository().iter_all_records(itersize=3))
+
+    assert sorted(identifiers) == [reel["scan_identifier"] for reel in reels]
+    assert len(images) == 10
+    assert len(schema.ReelRepository().get_all_records()) == 5
+
+
+def test_abandoned_stream_returns_its_connection(schema):
+
+    schema.ReelRepository().add_reels_and_images([sample_reel(f"1960-R{n:04d}", 1) for n in range(5)])
+
+    for _ in range(schema.DEFAULT_POOL_MAX_CONNECTIONS + 1):
+        stream = schema.ReelRepository().iter_scan_identifiers(itersize=1)
+        next(stream)
+        stream.close()
+
+    assert schema.ReelRepository().record_count() == 5
+
+
+def test_prepared_lookups_prepare_once_per_connection(schema):
+
+    schema.lookup_cache.enabled = False
+    try:
+        status = schema.CrawlStatusRepository()
+        status.add_crawl_status(1960, 3, 2022)
+
+        with schema.getcursor() as cur:
+            for _ in range(3):
+                schema.execute_prepared(cur, "test_status", "SELECT id FROM crawl_status WHERE census_year = %s",
+                                        (1960,))
+                assert cur.fetchone() is not None
+            cur.execute("SELECT count(*) FROM pg_prepared_statements WHERE name = 'test_status'")
+            assert cur.fetchone()[0] == 1
+
+        assert status.get_crawl_status(1960, 3, 2022)["month_scanned"] == 3
+        assert status.get_crawl_status(1960, 4, 2022) is None
+    finally:
+        schema.lookup_cache.enabled = True
+
+
+def test_prepared_statement_with_a_literal_percent(schema):
+
+    schema.ReelRepository().add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1970-R0001")])
+    sql = "SELECT count(*) FROM reels WHERE scan_identifier LIKE '1960-%%' AND census_year = %s"
+
+    with schema.getcursor() as cur:
+        schema.execute_prepared(cur, "test_percent", sql, (1960,))
+        assert cur.fetchone()[0] == 1
+
+    with pytest.raises(ValueError, match="literal % as %%"):
+        schema.numbered_placeholders("SELECT 1 FROM reels WHERE scan_identifier LIKE '1960-%' AND census_year = %s")
+
+
+def test_prepared_statement_is_prepared_again_after_discard(schema):
+
+    sql = "SELECT count(*) FROM reels WHERE census_year = %s"
+
+    with schema.getcursor() as cur:
+        schema.execute_prepared(cur, "test_discard", sql, (1960,))
+        cur.execute("DEALLOCATE ALL")
+
+    # the statement the server lost fails once, then the connection prepares it afresh
+    with pytest.raises(Exception):
+        with schema.getcursor() as cur:
+            schema.execute_prepared(cur, "test_discard", sql, (1960,))
+
+    with schema.getcursor() as cur:
+        schema.execute_prepared(cur, "test_discard", sql, (1960,))
+        assert cur.fetchone()[0] == 0
@@ -0,0 +1,86 @@
+import json
+import pickle
+
+import pytest
+
+from rows import (ROW_DICT, ROW_NAMEDTUPLE, ROW_RECORD, ROW_SCALAR, ROW_TUPLE, fetch_one, iter_rows, map_rows,
+                  record_class)
+
+DESCRIPTION = [("id",), ("scan_identifier",), ("target_snowball",)]
+ROWS = [(1, "1960-R0001", None), (2, "1960-R0002", "snowball_0001")]
+
+
+class FakeCursor:
+
+    def __init__(self, rows, description=DESCRIPTION):
+        self.__rows = list(rows)
+        self.description = description
+
+    def fetchone(self):
+        return self.__rows.pop(0) if self.__rows else None
+
+    def __iter__(self):
+        return iter(self.__rows)
+
+
+def test_default_rows_are_plain_dicts():
+
+    rows = map_rows(ROWS, DESCRIPTION)
+
+    assert rows == [{"id": 1, "scan_identifier": "1960-R0001", "target_snowball": None},
+                    {"id": 2, "scan_identifier": "1960-R0002", "target_snowball": "snowball_0001"}]
+    assert all(type(row) is dict for row in rows)
+    # callers add their own keys and serialise rows as they are
+    rows[0]["bytes"] = 10
+    assert json.loads(json.dumps(rows))[0]["bytes"] == 10
+
+
+def test_names_override_the_description():
+
+    rows = map_rows(ROWS, DESCRIPTION, ROW_DICT, ("reel_id", "reel", "snowball"))
+
+    assert rows[1] == {"reel_id": 2, "reel": "1960-R0002", "snowball": "snowball_0001"}
+
+
+def test_other_styles():
+
+    assert map_rows(ROWS, DESCRIPTION, ROW_TUPLE) == ROWS
+    assert map_rows(ROWS, DESCRIPTION, ROW_SCALAR) == [1, 2]
+    assert map_rows(ROWS, DESCRIPTION, ROW_NAMEDTUPLE)[1].scan_identifier == "1960-R0002"
+
+    with pytest.raises(ValueError):
+        map_rows(ROWS, DESCRIPTION, "object")
+
+
+def test_records_read_like_dicts_and_pickle():
+
+    record = map_rows(ROWS, DESCRIPTION, ROW_RECORD)[1]
+
+    assert record["scan_identifier"] == record.scan_identifier == "1960-R0002"
+    assert record.get("missing") is None
+    assert dict(record.items()) == record.to_dict()
+    assert pickle.loads(pickle.dumps(record)) == record
+
+    with pytest.raises(KeyError):
+        record["bytes"] = 10
+
+
+def test_record_classes_are_shared_per_column_set():
+    assert record_class(("id", "scan_identifier")) is record_class(("id", "scan_identifier"))
+
+
+def test_map_rows_leaves_the_garbage_collector_alone():
+
+    import gc
+
+    assert gc.isenabled()
+    map_rows(ROWS, DESCRIPTION, ROW_RECORD)
+    assert gc.isenabled()
+
+
+def test_fetch_one_and_iter_rows():
+
+    assert fetch_one(FakeCursor(ROWS))["id"] == 1
+    assert fetch_one(FakeCursor([])) is None
+    assert list(iter_rows(FakeCursor(ROWS), ROW_SCALAR)) == [1, 2]
+    assert list(iter_rows(FakeCursor(ROWS), ROW_TUPLE)) == ROWS
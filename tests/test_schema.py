@@ -0,0 +1,125 @@
+import pytest
+
+from conftest import sample_reel
+from schema import PartitionMigration, PartitionMigrationError
+
+
+def scalar(data, sql, prms=None):
+    with data.getcursor() as cur:
+        cur.execute(sql, prms)
+        return cur.fetchone()[0]
+
+
+def test_unmigrated_schema_still_ingests(database):
+
+    reels = database.ReelRepository()
+    images = database.ImageRepository()
+
+    reel_ids = reels.add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002")])
+    single_id = reels.add_reel_and_images(sample_reel("1960-R0003", 2))
+    images.add_records(single_id, sample_reel("unused", 1)["parsed_images"])
+    images.add_record(reel_ids[0], "extra.jpg", 5, "/isilon/extra.jpg")
+
+    assert images.record_count() == 3 + 3 + 2 + 1 + 1
+
+    with database.getcursor() as cur:
+        assert not database.schema_is_partitioned(cur)
+
+
+def test_migration_partitions_existing_rows(database):
+
+    repository = database.ReelRepository()
+    repository.add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002", scan_folder=(4, 2022))])
+
+    created = PartitionMigration().run()
+
+    assert sorted(created) == [(1960, 2022, 3), (1960, 2022, 4)]
+    assert scalar(database, "SELECT count(*) FROM images_1960_2022_03") == 3
+    assert scalar(database, "SELECT count(*) FROM reels_1960_2022_04") == 1
+    assert scalar(database, "SELECT count(*) FROM vw_1960scanmanifest") == 2
+
+    # the id sequences carry on past the copied rows
+    new_ids = repository.add_reels_and_images([sample_reel("1960-R0003")])
+    assert new_ids[0] > max(row["id"] for row in repository.get_all_records() if row["scan_identifier"] != "1960-R0003")
+
+
+def test_migration_keeps_constraints_and_indexes(database):
+
+    with database.getcursor() as cur:
+        cur.execute("ALTER TABLE reels ADD CONSTRAINT reels_month_check CHECK (month_number_scanned BETWEEN 1 AND 12)")
+        cur.execute("CREATE INDEX images_filename_idx ON images (filename)")
+
+    PartitionMigration().run()
+
+    assert scalar(database, "SELECT count(*) FROM pg_constraint WHERE conrelid = to_regclass('reels') "
+                            "AND contype = 'c'") == 1
+    assert scalar(database, "SELECT count(*) FROM pg_indexes WHERE tablename = 'images' "
+                            "AND indexdef LIKE '%(filename)'") == 1
+
+
+def test_migration_refuses_orphaned_images(database):
+
+    with database.getcursor() as cur:
+        cur.execute("INSERT INTO images (reel_id, filename, filesize, image_filepath) VALUES (NULL, 'a', 1, '/a')")
+
+    with pytest.raises(PartitionMigrationError, match="1 images have no matching reel"):
+        PartitionMigration().run()
+
+    database._partitioned_schema = None
+
+    with database.getcursor() as cur:
+        assert not database.schema_is_partitioned(cur)
+
+    assert scalar(database, "SELECT count(*) FROM images") == 1
+
+
+def test_migration_refuses_reels_without_a_scan_key(database):
+
+    database.ReelRepository().add_reels_and_images([sample_reel("1960-R0001")])
+
+    with database.getcursor() as cur:
+        cur.execute("INSERT INTO reels (census_year, scan_identifier) VALUES (1960, '1960-R0002')")
+
+    with pytest.raises(PartitionMigrationError, match="1 reels have a null"):
+        PartitionMigration().run()
+
+    database._partitioned_schema = None
+
+    with database.getcursor() as cur:
+        assert not database.schema_is_partitioned(cur)
+
+    assert scalar(database, "SELECT count(*) FROM reels") == 2
+
+
+def test_reset_crawl_empties_one_scan_folder(migrated_database):
+
+    data = migrated_database
+    reels = data.ReelRepository()
+    status = data.CrawlStatusRepository()
+
+    reels.add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002", scan_folder=(4, 2022))])
+    status.add_crawl_operation(1960, 3, 2022, "2022-05-01", 1, 3, "1 second")
+
+    status.reset_crawl(3, 2022, 1960)
+
+    assert [row["scan_identifier"] for row in reels.get_all_records()] == ["1960-R0002"]
+    assert data.ImageRepository().record_count() == 3
+    assert status.get_crawl_status(1960, 3, 2022) is None
+
+    # the scan folder can be crawled again straight away
+    reels.add_reels_and_images([sample_reel("1960-R0001")])
+    assert scalar(data, "SELECT count(*) FROM images_1960_2022_03") == 3
+
+
+def test_snapshot_counts_on_both_schemas(database):
+
+    database.ReelRepository().add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002", 2)])
+    database.CrawlStatusRepository().add_crawl_operation(1960, 3, 2022, "2022-05-01", 2, 5, "1 second")
+
+    database.SnapshotRepository().populate_crawl_image_counts()
+    assert [row["crawl_count"] for row in database.SnapshotRepository().get_crawl_counts()] == [5]
+
+    PartitionMigration().run()
+
+    database.SnapshotRepository().populate_crawl_image_counts("full")
+    assert [row["crawl_count"] for row in database.SnapshotRepository().get_crawl_counts()] == [5]
@@ -0,0 +1,98 @@
+import psycopg2
+
+import config as app_config
+
+from conftest import TEST_SCHEMA, sample_reel
+
+
+def counts(data) -> dict:
+    return {(row["census_year"], row["year_scanned"], row["month_scanned"]): row["crawl_count"]
+            for row in data.SnapshotRepository().get_crawl_counts()}
+
+
+def crawl_folder(data, scan_folder, reels) -> None:
+
+    month, year = scan_folder
+    data.ReelRepository().add_reels_and_images([sample_reel(identifier, frames, scan_folder=scan_folder)
+                                                for identifier, frames in reels])
+    data.CrawlStatusRepository().add_crawl_operation(1960, month, year, "2022-05-01", len(reels), 0, "1 second")
+
+
+def test_incremental_refresh_recounts_only_queued_folders(database):
+
+    snapshot = database.SnapshotRepository()
+
+    crawl_folder(database, (3, 2022), [("1960-R0001", 3)])
+    assert snapshot.populate_crawl_image_counts()["mode"] == "full"
+    assert counts(database) == {(1960, 2022, 3): 3}
+
+    # a change that bypasses crawl_operations is only seen by a full refresh
+    with database.getcursor() as cur:
+        cur.execute("DELETE FROM images WHERE filename = '00000000.jpg'")
+
+    crawl_folder(database, (4, 2022), [("1960-R0002", 2)])
+
+    assert snapshot.populate_crawl_image_counts()["mode"] == "incremental"
+    assert counts(database) == {(1960, 2022, 3): 3, (1960, 2022, 4): 2}
+
+    snapshot.populate_crawl_image_counts("full")
+    assert counts(database) == {(1960, 2022, 3): 2, (1960, 2022, 4): 2}
+
+
+def test_operation_committed_after_a_later_one_is_not_skipped(database):
+
+    snapshot = database.SnapshotRepository()
+
+    reel_id = database.ReelRepository().add_reels_and_images([sample_reel("1960-R0001", 3, scan_folder=(3, 2022))])[0]
+    crawl_status_id = database.CrawlStatusRepository().add_crawl_status(1960, 3, 2022)
+    snapshot.populate_crawl_image_counts()
+
+    # the March operation takes the lower id but is still uncommitted while April's commits
+    settings = app_config.DatabaseSettings()
+    slow = psycopg2.connect(host=settings.host, port=settings.port, user=settings.user, dbname=settings.database,
+                            options=f"-c search_path={TEST_SCHEMA}")
+    with slow.cursor() as cur:
+        cur.execute("INSERT INTO images (reel_id, filename, filesize, image_filepath) VALUES (%s, 'late.jpg', 1, '/late')",
+                    (reel_id,))
+        cur.execute("""
+            INSERT INTO crawl_operations (crawl_status_id, date_crawled, reels_parsed, images_parsed, crawl_time)
+            VALUES (%s, '2022-05-01', 1, 1, '1 second')
+        """, (crawl_status_id,))
+        database.mark_image_counts_dirty(cur, 1960, 2022, 3)
+
+    crawl_folder(database, (4, 2022), [("1960-R0002", 2)])
+    snapshot.populate_crawl_image_counts()
+    assert counts(database) == {(1960, 2022, 3): 3, (1960, 2022, 4): 2}
+
+    slow.commit()
+    slow.close()
+
+    snapshot.populate_crawl_image_counts()
+    assert counts(database) == {(1960, 2022, 3): 4, (1960, 2022, 4): 2}
+
+
+def test_reels_added_without_a_crawl_operation_are_queued(database):
+
+    snapshot = database.SnapshotRepository()
+    snapshot.populate_crawl_image_counts()
+
+    database.ReelRepository().add_reels_and_images([sample_reel("1960-R0001", 3, scan_folder=(3, 2022))])
+    database.ReelRepository().add_reel_and_images(sample_reel("1960-R0002", 2, scan_folder=(4, 2022)))
+
+    assert snapshot.populate_crawl_image_counts()["mode"] == "incremental"
+    assert counts(database) == {(1960, 2022, 3): 3, (1960, 2022, 4): 2}
+
+
+def test_reset_crawl_drops_the_folder_from_the_counts(migrated_database):
+
+    data = migrated_database
+    crawl_folder(data, (3, 2022), [("1960-R0001", 3)])
+    crawl_folder(data, (4, 2022), [("1960-R0002", 2)])
+    data.SnapshotRepository().populate_crawl_image_counts()
+
+    data.CrawlStatusRepository().reset_crawl(3, 2022, 1960)
+    # crawled again before the next refresh, so only the queued mark can tell it changed
+    crawl_folder(data, (3, 2022), [("1960-R0003", 1)])
+
+    data.SnapshotRepository().populate_crawl_image_counts()
+    assert counts(data) == {(1960, 2022, 3): 1, (1960, 2022, 4): 2}
@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+from conftest import sample_reel
+from test_orchestrator import scan_task, scan_tree
+from crawler import staging
+from crawler.orchestrator import crawl_scan_folder
+from crawler.staging import (CrawlStagingStore, iter_known_reels_snapshot, staged_exclusion_filters,
+                             sync_staging_store, write_known_reels_snapshot)
+
+SCAN_FOLDER = (3, 2022)
+
+
+def staging_store(tmp_path) -> CrawlStagingStore:
+    return CrawlStagingStore(str(tmp_path / "staging" / "1960_03-Mar-22.staging.sqlite3"), 1960, SCAN_FOLDER)
+
+
+def write_snapshot(staging_dir, rows) -> None:
+
+    os.makedirs(staging_dir, exist_ok=True)
+
+    with open(os.path.join(staging_dir, staging.KNOWN_REELS_SNAPSHOT), "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write("\t".join(str(value) for value in row) + "\n")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+
+    """ Fails the test if anything asks the connection pool for a Postgres connection """
+
+    import data
+
+    def refuse(*args, **kwargs):
+        raise AssertionError("staged crawl touched Postgres")
+
+    monkeypatch.setattr(data.connection_pool, "getconn", refuse)
+
+
+def test_staging_a_reel_twice_is_a_no_op(tmp_path):
+
+    store = staging_store(tmp_path)
+    store.add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002")])
+    store.add_reels_and_images([sample_reel("1960-R0001")])
+
+    batches = list(store.iter_unsynced_reels(batch_size=1))
+
+    assert sorted(store.staged_identifiers()) == ["1960-R0001", "1960-R0002"]
+    assert [len(batch) for batch in batches] == [1, 1]
+    assert batches[0][0]["parsed_images"].to_list() == sample_reel("1960-R0001")["parsed_images"].to_list()
+
+    store.close()
+
+
+def test_missing_snapshot_reads_as_empty(tmp_path):
+    assert list(iter_known_reels_snapshot(str(tmp_path))) == []
+
+
+def test_staged_filters_come_from_the_snapshot_folder_and_the_store(tmp_path):
+
+    staging_dir = str(tmp_path / "staging")
+    write_snapshot(staging_dir, [(1960, 3, 2022, "1960-R0001"), (1960, 4, 2022, "1960-R0009"),
+                                 (1970, 3, 2022, "1970-R0001")])
+
+    store = staging_store(tmp_path)
+    store.add_reels_and_images([sample_reel("1960-R0002")])
+
+    assert staged_exclusion_filters(store, staging_dir) == ["1960-R0001", "1960-R0002"]
+
+    store.close()
+
+
+def test_staged_crawl_never_touches_postgres(offline, tmp_path):
+
+    scan_tree(tmp_path / "isilon")
+    staging_dir = str(tmp_path / "staging")
+    # R0000 is already in this folder, R0001 was ingested under another folder
+    write_snapshot(staging_dir, [(1960, 3, 2022, "1960-R0000"), (1960, 5, 2021, "1960-R0001")])
+
+    task = scan_task(tmp_path / "isilon", tmp_path, staging_dir=staging_dir, known_reel_index=True,
+                     run_id="staged-offline")
+    result = crawl_scan_folder(task)
+
+    assert result["reels_parsed"] == 2
+    assert result["known_reels_skipped"] == 1
+
+    store = CrawlStagingStore.open(os.path.join(staging_dir, "1960_03-Mar-22.staging.sqlite3"))
+    assert sorted(store.staged_identifiers()) == ["1960-R0002", "1960-R0003"]
+    assert store.pending_counts() == {"reels": 2, "crawl_operations": 1}
+    store.close()
+
+
+def test_staging_store_is_closed_when_the_crawl_fails(offline, monkeypatch, tmp_path):
+
+    closed = []
+    close = CrawlStagingStore.close
+
+    def record_close(store):
+        closed.append(store.staging_path)
+        close(store)
+
+    def fail(store, staging_dir):
+        raise RuntimeError("crawl failed")
+
+    monkeypatch.setattr(CrawlStagingStore, "close", record_close)
+    monkeypatch.setattr(staging, "staged_exclusion_filters", fail)
+
+    scan_tree(tmp_path / "isilon")
+    task = scan_task(tmp_path / "isilon", tmp_path, staging_dir=str(tmp_path / "staging"))
+
+    with pytest.raises(RuntimeError):
+        crawl_scan_folder(task)
+
+    assert len(closed) == 1
+
+
+def test_sync_is_idempotent_and_feeds_the_snapshot(database, tmp_path):
+
+    store = staging_store(tmp_path)
+    store.add_reels_and_images([sample_reel("1960-R0001"), sample_reel("1960-R0002")])
+    store.add_crawl_operation("2022-03-01 00:00:00", 2, 6, "0:00:01")
+
+    first = sync_staging_store(store)
+    second = sync_staging_store(store)
+
+    assert (first["reels_synced"], first["images_synced"], first["crawl_operations_synced"]) == (2, 6, 1)
+    assert (second["reels_synced"], second["crawl_operations_synced"]) == (0, 0)
+    assert database.ImageRepository().record_count() == 6
+
+    staging_dir = str(tmp_path / "staging")
+
+    assert write_known_reels_snapshot(staging_dir) == 2
+    assert sorted(iter_known_reels_snapshot(staging_dir)) == [(1960, 3, 2022, "1960-R0001"),
+                                                              (1960, 3, 2022, "1960-R0002")]
+
+    store.close()